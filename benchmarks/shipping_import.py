@@ -0,0 +1,91 @@
+"""
+Tiempo de importación de core/shipping.py.
+
+Cada medición corre en un proceso nuevo (sin nada en caché de módulos),
+después de `django.setup()`, y se informa la mediana de varias corridas.
+
+  - "GIS de Django": lo que la versión anterior importaba a nivel de módulo
+    (django.contrib.gis.geos y .measure, que cargan GEOS y GDAL).
+  - "numpy" y "scipy.spatial": lo que ahora se importa recién al usar las
+    funciones vectorizadas o armar el índice de depósitos.
+  - "core.shipping": el módulo actual.
+
+Con `--ref` también se mide `import core.shipping` en otra revisión (por
+ejemplo la anterior a sacar GEOS), en un `git worktree` temporal. Hace falta
+que GEOS/GDAL carguen (GDAL_LIBRARY_PATH / GEOS_LIBRARY_PATH en los settings
+si no están en el path del sistema).
+
+Uso:
+    DJANGO_SETTINGS_MODULE=djecommerce.settings.development python benchmarks/shipping_import.py [--runs 7] [--ref REV]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = [
+    ('GIS de Django (antes)', 'import django.contrib.gis.geos, django.contrib.gis.measure'),
+    ('numpy', 'import numpy'),
+    ('scipy.spatial', 'import scipy.spatial'),
+    ('core.shipping (ahora)', 'import core.shipping'),
+]
+
+SNIPPET = """
+import time, django
+django.setup()
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(statement, runs, cwd=ROOT):
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', SNIPPET.format(statement=statement)],
+            cwd=cwd, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr else 'error'
+            return None, error
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings), None
+
+
+def measure_ref(ref, runs):
+    """`import core.shipping` en la revisión `ref`, desde un worktree temporal."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tree = os.path.join(tmp, 'tree')
+        subprocess.run(['git', 'worktree', 'add', '--detach', '-q', tree, ref], cwd=ROOT, check=True)
+        try:
+            return measure('import core.shipping', runs, cwd=tree)
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', tree], cwd=ROOT, check=True)
+
+
+def report(label, median, error):
+    if error:
+        print(f"{label:28} no se pudo importar: {error}")
+    else:
+        print(f"{label:28} {median * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--ref', help='Revisión de git contra la que comparar core.shipping')
+    args = parser.parse_args()
+
+    for label, statement in TARGETS:
+        report(label, *measure(statement, args.runs))
+    if args.ref:
+        report(f"core.shipping ({args.ref})", *measure_ref(args.ref, args.runs))
+
+
+if __name__ == '__main__':
+    main()
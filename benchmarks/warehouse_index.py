@@ -0,0 +1,86 @@
+"""
+Benchmark del índice de depósitos (core/warehouses.py).
+
+Compara el KD-tree contra la fuerza bruta (matriz Haversine completa) con
+10.000 depósitos y 100.000 direcciones al azar dentro de Argentina. La
+fuerza bruta se mide sobre una muestra y se extrapola, porque la matriz
+completa serían 10^9 distancias.
+
+Uso:
+    python benchmarks/warehouse_index.py [--depots 10000] [--addresses 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.warehouses import Warehouse, WarehouseIndex, EARTH_RADIUS_KM  # noqa: E402
+
+# Rectángulo aproximado de Argentina continental
+LON_RANGE = (-73.5, -53.6)
+LAT_RANGE = (-55.0, -21.8)
+
+
+def random_points(rng, n):
+    return rng.uniform(*LON_RANGE, n), rng.uniform(*LAT_RANGE, n)
+
+
+def haversine_matrix(lons1, lats1, lons2, lats2):
+    lon1, lat1 = np.radians(lons1)[:, None], np.radians(lats1)[:, None]
+    lon2, lat2 = np.radians(lons2)[None, :], np.radians(lats2)[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--depots', type=int, default=10_000)
+    parser.add_argument('--addresses', type=int, default=100_000)
+    parser.add_argument('--sample', type=int, default=2_000,
+                        help='Direcciones usadas para medir la fuerza bruta')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    depot_lons, depot_lats = random_points(rng, args.depots)
+    lons, lats = random_points(rng, args.addresses)
+    depots = [Warehouse(f'D{i}', f'Depósito {i}', lon, lat)
+              for i, (lon, lat) in enumerate(zip(depot_lons, depot_lats))]
+
+    start = time.perf_counter()
+    index = WarehouseIndex(depots)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    nearest, distances = index.nearest_many(lons, lats)
+    batch = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for lon, lat in zip(lons[:1000], lats[:1000]):
+        index.nearest(lon, lat)
+    single = (time.perf_counter() - start) / 1000
+
+    sample = min(args.sample, args.addresses)
+    start = time.perf_counter()
+    brute = haversine_matrix(lons[:sample], lats[:sample], depot_lons, depot_lats)
+    brute_nearest = brute.argmin(axis=1)
+    brute_time = (time.perf_counter() - start) * args.addresses / sample
+
+    # Con coordenadas al azar los empates son prácticamente imposibles; se
+    # compara la distancia para no depender del orden en caso de empate
+    brute_km = brute[np.arange(sample), brute_nearest]
+    max_error = np.abs(brute_km - distances[:sample]).max()
+
+    print(f"{args.depots} depósitos x {args.addresses} direcciones")
+    print(f"  armado del índice:          {build * 1000:8.1f} ms")
+    print(f"  KD-tree, lote completo:     {batch * 1000:8.1f} ms ({args.addresses / batch:,.0f} direcciones/s)")
+    print(f"  KD-tree, de a una:          {single * 1e6:8.1f} µs por dirección")
+    print(f"  fuerza bruta (extrapolado): {brute_time * 1000:8.1f} ms")
+    print(f"  diferencia máxima vs fuerza bruta: {max_error:.6f} km")
+
+
+if __name__ == '__main__':
+    main()
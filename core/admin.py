@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from import_export.admin import ImportExportModelAdmin
 from import_export import resources
-from .models import Item, OrderItem, Order, Payment, Category, Label
+from .models import Item, ItemTombstone, OrderItem, Order, Payment, Category, Label, ShippingZone, WebhookNotification
 
 # --- Resources para import/export ---
 
@@ -64,6 +64,12 @@ class ItemAdmin(ImportExportModelAdmin):
         js = ('js/admin_image_preview.js',)
 
 
+@admin.register(ItemTombstone)
+class ItemTombstoneAdmin(admin.ModelAdmin):
+    list_display = ('slug', 'item_id', 'deleted_at')
+    search_fields = ('slug',)
+
+
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('user', 'item', 'quantity', 'ordered')
@@ -82,5 +88,21 @@ class OrderAdmin(ImportExportModelAdmin):
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
-    list_display = ('mercadopago_id', 'user', 'amount', 'timestamp')
+    list_display = ('mercadopago_id', 'user', 'amount', 'status', 'timestamp')
+    list_filter = ('status',)
     search_fields = ('mercadopago_id', 'user__username')
+
+
+@admin.register(WebhookNotification)
+class WebhookNotificationAdmin(admin.ModelAdmin):
+    list_display = ('payment_id', 'topic', 'status', 'attempts', 'received_at', 'locked_until', 'processed_at')
+    list_filter = ('status', 'topic')
+    search_fields = ('payment_id',)
+    readonly_fields = ('payload', 'received_at', 'processed_at')
+
+
+@admin.register(ShippingZone)
+class ShippingZoneAdmin(admin.ModelAdmin):
+    list_display = ('zip_code', 'city', 'province', 'warehouse_code', 'distance_km', 'shipping_cost')
+    list_filter = ('province', 'warehouse_code')
+    search_fields = ('zip_code', 'city')
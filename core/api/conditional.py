@@ -0,0 +1,47 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """ETag fuerte a partir de las partes que identifican una representación."""
+    raw = '|'.join(str(part) for part in parts)
+    return quote_etag(hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32])
+
+
+class ConditionalGetMixin:
+    """
+    Agrega ETag / Last-Modified a un GET de DRF y responde 304 cuando el
+    cliente ya tiene la versión actual.
+
+    Las vistas implementan `get_validators()`, que debe ser barato (la
+    versión del catálogo, o un values_list de una fila) y devolver
+    `(etag, last_modified)` (last_modified puede ser None),
+    o None si no aplica (por ejemplo un slug inexistente). El 304 se decide
+    antes de llamar a `get()` de la vista, así que no se serializa nada.
+    El ETag calculado queda en `self.etag` para usarlo en claves de caché.
+    """
+    etag = None
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+
+        self.etag, last_modified = validators
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        not_modified = get_conditional_response(request, etag=self.etag, last_modified=timestamp)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = self.etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
@@ -0,0 +1,42 @@
+from urllib.parse import parse_qs, urlparse
+
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class ItemCursorPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) para el catálogo.
+
+    Ordena por `id`, que es único y estable, así que cada página es un
+    `WHERE id > <último id> ORDER BY id LIMIT n` que usa el índice primario
+    sin importar qué tan lejos esté la página.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = 'id'
+
+    def get_paginated_response(self, data):
+        next_link = self.get_next_link()
+        return Response({
+            'next': next_link,
+            'next_cursor': self._cursor_from_link(next_link),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['next_cursor'] = {
+            'type': 'string',
+            'nullable': True,
+        }
+        return response_schema
+
+    def _cursor_from_link(self, link):
+        """Extrae el token del cursor del link, para clientes que no usan URLs completas."""
+        if not link:
+            return None
+        values = parse_qs(urlparse(link).query).get(self.cursor_query_param)
+        return values[0] if values else None
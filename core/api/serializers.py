@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from core.models import Item, UserProfile, Order, OrderItem
+from django.urls import reverse
+from core.models import Category, Item, UserProfile, Order, OrderItem
+from core.thumbnails import DEFAULT_WIDTH
 
 User = get_user_model()
 
@@ -43,11 +45,30 @@ class UserSerializer(serializers.ModelSerializer):
 
         return instance
 
+class CategorySerializer(serializers.ModelSerializer):
+    image_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Category
+        fields = (
+            'id',
+            'title',
+            'slug',
+            'description',
+            'image_url',
+        )
+
+    def get_image_url(self, obj):
+        if obj.image:
+            return obj.image.url
+        return None
+
 class ItemSerializer(serializers.ModelSerializer):
     category_display = serializers.CharField(source='get_category_display', read_only=True)
     label_display = serializers.CharField(source='get_label_display', read_only=True)
     image_url = serializers.SerializerMethodField()
     preview_image_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
     video_url = serializers.SerializerMethodField()
 
     class Meta:
@@ -65,6 +86,7 @@ class ItemSerializer(serializers.ModelSerializer):
             'description',
             'image_url',
             'preview_image_url',
+            'thumbnail_url',
             'video_url',
         )
 
@@ -81,14 +103,43 @@ class ItemSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
     
+    def get_thumbnail_url(self, obj):
+        """Miniatura para listas; `v` cambia cuando cambia el producto, así el cliente puede cachearla."""
+        if not (obj.preview_image or obj.image):
+            return None
+        url = reverse('product-thumbnail', kwargs={'slug': obj.slug})
+        return f"{url}?w={DEFAULT_WIDTH}&v={int(obj.updated_at.timestamp())}"
+
     def get_video_url(self, obj):
         """Retorna la URL del video del producto."""
         if obj.video:
             return obj.video.url
         return None
 
+class CartItemSerializer(serializers.ModelSerializer):
+    """Versión reducida del producto para las líneas del carrito."""
+    preview_image_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Item
+        fields = (
+            'id',
+            'title',
+            'slug',
+            'price',
+            'discount_price',
+            'preview_image_url',
+        )
+
+    def get_preview_image_url(self, obj):
+        if obj.preview_image:
+            return obj.preview_image.url
+        elif obj.image:
+            return obj.image.url
+        return None
+
 class OrderItemSerializer(serializers.ModelSerializer):
-    item = ItemSerializer()
+    item = CartItemSerializer()
     final_price = serializers.SerializerMethodField()
 
     class Meta:
@@ -118,7 +169,18 @@ class OrderSerializer(serializers.ModelSerializer):
         )
 
     def get_order_items(self, obj):
-        return OrderItemSerializer(obj.items.all(), many=True).data
+        # Con la orden de get_active_order(with_lines=True) las líneas ya vienen
+        # prefetcheadas junto con su producto y su total
+        return OrderItemSerializer(obj.items.all(), many=True, context=self.context).data
 
     def get_total(self, obj):
         return obj.get_total()
+
+
+class CartChangeSerializer(serializers.Serializer):
+    slug = serializers.SlugField()
+    delta = serializers.IntegerField(min_value=-999, max_value=999)
+
+
+class CartBatchSerializer(serializers.Serializer):
+    items = CartChangeSerializer(many=True, allow_empty=False, max_length=100)
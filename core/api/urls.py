@@ -2,6 +2,11 @@ from django.urls import path
 from .views import (
     ItemListView, 
     ItemDetailView, 
+    ItemChangesView,
+    ItemThumbnailView,
+    CategoryListView,
+    CatalogCacheStatsView,
+    ShippingQuotesView,
     UserDetailView, 
     AddToCartView, 
     OrderDetailView, 
@@ -9,18 +14,25 @@ from .views import (
     GoogleLogin,
     GitHubLogin,
     RemoveSingleItemView,
-    RemoveItemView
+    RemoveItemView,
+    CartBatchView
 )
 
 urlpatterns = [
     path('auth/google/', GoogleLogin.as_view(), name='google_login'),
     path('auth/github/', GitHubLogin.as_view(), name='github_login'),
     path('products/', ItemListView.as_view(), name='product-list'),
+    path('products/changes/', ItemChangesView.as_view(), name='product-changes'),
     path('products/<slug>/', ItemDetailView.as_view(), name='product-detail'),
+    path('products/<slug>/thumbnail/', ItemThumbnailView.as_view(), name='product-thumbnail'),
+    path('categories/', CategoryListView.as_view(), name='category-list'),
+    path('catalog/cache-stats/', CatalogCacheStatsView.as_view(), name='catalog-cache-stats'),
+    path('shipping/quotes/', ShippingQuotesView.as_view(), name='shipping-quotes'),
     path('user/', UserDetailView.as_view(), name='user-detail'),
     path('add-to-cart/', AddToCartView.as_view(), name='add-to-cart'),
     path('remove-single-item/', RemoveSingleItemView.as_view(), name='remove-single-item'),
     path('remove-item/', RemoveItemView.as_view(), name='remove-item'),
+    path('cart/batch/', CartBatchView.as_view(), name='cart-batch'),
     path('order-summary/', OrderDetailView.as_view(), name='order-summary'),
     path('checkout/', PaymentAPIView.as_view(), name='checkout'),
 ]
@@ -1,15 +1,20 @@
 from rest_framework.generics import ListAPIView, RetrieveAPIView, RetrieveUpdateAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework import status
-from django.shortcuts import get_object_or_404
-from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from PIL import UnidentifiedImageError
 from django.conf import settings
 
-from core.models import Item, Order, OrderItem, Payment
-from core.services import MercadoPagoService
-from .serializers import ItemSerializer, UserSerializer, OrderSerializer
+from core import cart, catalog_cache, checkout, quotes, sync, thumbnails, zones
+from core.models import Category, Item, UserProfile, effective_price
+from core.services import MercadoPagoUnavailable, get_mercadopago_service
+from .conditional import ConditionalGetMixin, make_etag
+from .pagination import ItemCursorPagination
+from .serializers import CartBatchSerializer, CategorySerializer, ItemSerializer, UserSerializer, OrderSerializer
 
 from allauth.socialaccount.providers.google.views import GoogleOAuth2Adapter
 from allauth.socialaccount.providers.github.views import GitHubOAuth2Adapter
@@ -26,17 +31,234 @@ class GitHubLogin(SocialLoginView):
     client_class = OAuth2Client
     callback_url = "http://127.0.0.1:8000/accounts/github/login/callback/"
 
-class ItemListView(ListAPIView):
+class ItemListView(ConditionalGetMixin, ListAPIView):
+    """
+    Catálogo paginado por cursor.
+
+    Filtros opcionales por query string:
+        category: slug de la categoría
+        label: id de la etiqueta
+        min_price / max_price: rango sobre el precio final (con descuento si existe)
+        on_discount: "true" para traer solo productos con descuento
+    """
     permission_classes = [AllowAny]
-    queryset = Item.objects.all()
     serializer_class = ItemSerializer
+    pagination_class = ItemCursorPagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = Item.objects.all()
+
+        category = params.get('category')
+        if category:
+            queryset = queryset.filter(category__slug=category)
+
+        label = params.get('label')
+        if label:
+            queryset = queryset.filter(label_id=self._parse_number('label', label, int))
+
+        min_price = params.get('min_price')
+        max_price = params.get('max_price')
+        if min_price or max_price:
+            # Misma expresión que el índice funcional de Item, así la base lo puede usar
+            queryset = queryset.alias(final_price=effective_price())
+            if min_price:
+                queryset = queryset.filter(final_price__gte=self._parse_number('min_price', min_price, float))
+            if max_price:
+                queryset = queryset.filter(final_price__lte=self._parse_number('max_price', max_price, float))
+
+        if params.get('on_discount', '').lower() in ('1', 'true', 'yes'):
+            queryset = queryset.filter(discount_price__gt=0)
+
+        return queryset
+
+    def get_validators(self):
+        # El token se toma antes de leer el catálogo (ver core/sync.py)
+        self.sync_token = sync.current_token()
+        # La versión del catálogo cambia con cualquier alta, baja o edición
+        # (signals y CatalogQuerySet.update), así que no hace falta recorrer
+        # el catálogo filtrado: cada página sigue siendo un keyset por id. Sin
+        # Last-Modified, porque saberlo requeriría un MAX sobre todo el filtro
+        etag = make_etag('items', self.request.build_absolute_uri(), catalog_cache.get_catalog_version())
+        return etag, None
 
-class ItemDetailView(RetrieveAPIView):
+    def list(self, request, *args, **kwargs):
+        # La URL completa incluye host, filtros y cursor, que es lo que cambia el
+        # payload; la clave ya lleva la versión del catálogo
+        payload = catalog_cache.cached(
+            'items',
+            request.build_absolute_uri(),
+            lambda: super(ItemListView, self).list(request, *args, **kwargs).data,
+        )
+        if not request.query_params.get(self.paginator.cursor_query_param):
+            # La primera página entrega el punto de partida para /products/changes/
+            payload = {**payload, 'sync_token': self.sync_token}
+        return Response(payload)
+
+    def _parse_number(self, name, value, cast):
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            raise ValidationError({name: f"Valor inválido: {value}"})
+
+class ItemDetailView(ConditionalGetMixin, RetrieveAPIView):
     permission_classes = [AllowAny]
     queryset = Item.objects.all()
     serializer_class = ItemSerializer
     lookup_field = 'slug'
 
+    def get_validators(self):
+        row = (
+            Item.objects
+            .filter(slug=self.kwargs[self.lookup_field])
+            .values_list('id', 'updated_at')
+            .first()
+        )
+        if row is None:
+            return None
+        pk, updated_at = row
+        return make_etag('item', pk, updated_at), updated_at
+
+    def retrieve(self, request, *args, **kwargs):
+        payload = catalog_cache.cached(
+            'item',
+            (kwargs[self.lookup_field], self.etag),
+            lambda: super(ItemDetailView, self).retrieve(request, *args, **kwargs).data,
+        )
+        return Response(payload)
+
+class ItemThumbnailView(ConditionalGetMixin, RetrieveAPIView):
+    """
+    Miniatura JPEG de la imagen de vista previa de un producto.
+
+    `?w=` se redondea a uno de thumbnails.THUMBNAIL_WIDTHS. La URL que arma
+    el serializer incluye `v=<updated_at>`, así que el cliente puede
+    cachearla sin revalidar; si igual revalida, el ETag evita reenviarla.
+    """
+    permission_classes = [AllowAny]
+    source_name = None
+
+    def get_validators(self):
+        row = (
+            Item.objects
+            .filter(slug=self.kwargs['slug'])
+            .values_list('preview_image', 'image', 'updated_at')
+            .first()
+        )
+        if row is None or not (row[0] or row[1]):
+            return None
+        preview_image, image, updated_at = row
+        self.source_name = preview_image or image
+        self.width = thumbnails.snap_width(self.request.query_params.get('w'))
+        return make_etag('thumbnail', self.source_name, self.width, updated_at), updated_at
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.source_name:
+            raise Http404
+        try:
+            name = thumbnails.get_thumbnail(self.source_name, self.width)
+        except (OSError, UnidentifiedImageError):
+            raise Http404
+        response = FileResponse(default_storage.open(name, 'rb'), content_type='image/jpeg')
+        response['Cache-Control'] = 'public, max-age=86400'
+        return response
+
+class ItemChangesView(APIView):
+    """
+    Delta del catálogo: GET /api/products/changes/?since=<token>
+
+    El token inicial es el `sync_token` de la primera página de /products/.
+    Devuelve los productos creados o modificados (como máximo
+    SYNC_PAGE_SIZE), los ids borrados y el token para el próximo pedido. Con
+    `more: true` hay más cambios y se pide enseguida con el token recibido.
+    Un token inválido o vencido responde 400: el cliente vuelve a bajar el
+    catálogo completo.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        since_token = request.query_params.get('since')
+        if not since_token:
+            return Response({"message": "Falta el parámetro since"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            cursor = sync.parse_token(since_token)
+        except sync.InvalidSyncToken:
+            return Response({"message": "Token de sincronización inválido o vencido"}, status=status.HTTP_400_BAD_REQUEST)
+
+        changed, deleted, token, more = sync.get_changes(cursor)
+        return Response({
+            'changed': ItemSerializer(changed, many=True, context={'request': request}).data,
+            'deleted': deleted,
+            'token': token,
+            'more': more,
+        })
+
+class CategoryListView(ConditionalGetMixin, ListAPIView):
+    """
+    Categorías activas, sin paginar (son pocas).
+
+    Category no tiene `updated_at`, así que el ETag se arma con las filas
+    mismas; la app lo usa para no volver a bajar la lista si no cambió.
+    """
+    permission_classes = [AllowAny]
+    serializer_class = CategorySerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        return Category.objects.filter(is_active=True).order_by('id')
+
+    def get_validators(self):
+        rows = self.get_queryset().values_list('id', 'title', 'slug', 'description', 'image')
+        return make_etag('categories', *rows), None
+
+class CatalogCacheStatsView(APIView):
+    """Hits/misses de la caché del catálogo en el worker que atiende el pedido."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(catalog_cache.get_stats())
+
+class ShippingQuotesView(APIView):
+    """
+    Cotizaciones de los correos: GET /api/shipping/quotes/?zip_code=&weight=&volume=
+
+    Sin `zip_code` se usa el del perfil del usuario autenticado. Devuelve el
+    costo propio de la zona y las cotizaciones de SHIPPING_PROVIDERS que
+    llegaron dentro de SHIPPING_QUOTE_BUDGET, de la más barata a la más cara.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        zip_code = request.query_params.get('zip_code')
+        if not zip_code and request.user.is_authenticated:
+            zip_code = UserProfile.objects.filter(user=request.user).values_list('zip_code', flat=True).first()
+
+        weight = self._parse_number('weight', request.query_params.get('weight', 1))
+        volume = self._parse_number('volume', request.query_params.get('volume', 0))
+        if weight <= 0 or volume < 0:
+            raise ValidationError({'weight': "El peso debe ser mayor a 0"})
+
+        zone = zones.get_zone(zip_code)
+        if zone is None:
+            return Response({"message": "No hay envíos a ese código postal"}, status=status.HTTP_404_NOT_FOUND)
+
+        results = quotes.get_shipping_quotes(weight, volume, (zone.lon, zone.lat))
+        return Response({
+            'zip_code': zone.zip_code,
+            'shipping_cost': zone.shipping_cost,
+            'quotes': [
+                {'provider': quote.provider, 'cost': quote.cost, 'days': quote.days}
+                for quote in results
+            ],
+        })
+
+    def _parse_number(self, name, value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValidationError({name: f"Valor inválido: {value}"})
+
 class UserDetailView(RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
@@ -52,66 +274,61 @@ class AddToCartView(APIView):
         if not slug:
             return Response({"message": "Invalid request"}, status=status.HTTP_400_BAD_REQUEST)
 
-        item = get_object_or_404(Item, slug=slug)
-        order_item, created = OrderItem.objects.get_or_create(
-            item=item,
-            user=request.user,
-            ordered=False
-        )
-        order_qs = Order.objects.filter(user=request.user, ordered=False)
-        if order_qs.exists():
-            order = order_qs[0]
-            # check if the order item is in the order
-            if order.items.filter(item__slug=item.slug).exists():
-                order_item.quantity += 1
-                order_item.save()
-                return Response({"message": "Cantidad actualizada"}, status=status.HTTP_200_OK)
-            else:
-                order.items.add(order_item)
-                return Response({"message": "Item agregado al carrito"}, status=status.HTTP_200_OK)
-        else:
-            ordered_date = timezone.now()
-            order = Order.objects.create(user=request.user, ordered_date=ordered_date)
-            order.items.add(order_item)
-            return Response({"message": "Item agregado al carrito"}, status=status.HTTP_200_OK)
+        try:
+            result = cart.add_item(request.user, slug)
+        except Item.DoesNotExist:
+            raise Http404
+
+        if result == cart.INCREMENTED:
+            return Response({"message": "Cantidad actualizada"}, status=status.HTTP_200_OK)
+        return Response({"message": "Item agregado al carrito"}, status=status.HTTP_200_OK)
+
+class CartBatchView(APIView):
+    """
+    Aplica varios cambios de cantidad al carrito en un solo request.
+
+    Body: {"items": [{"slug": "...", "delta": 2}, {"slug": "...", "delta": -1}]}
+    Devuelve el resultado de cada producto y el carrito resultante, con el
+    mismo formato que /order-summary/, para que el cliente reemplace lo que
+    mostró de forma optimista.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes = [(change['slug'], change['delta']) for change in serializer.validated_data['items']]
+
+        results = cart.apply_batch(request.user, changes)
+
+        order = cart.get_active_order(request.user, with_lines=True)
+        summary = OrderSerializer(order).data if order else {'order_items': [], 'total': 0}
+        return Response({**summary, 'results': results}, status=status.HTTP_200_OK)
 
 class OrderDetailView(RetrieveAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        try:
-            order = Order.objects.get(user=self.request.user, ordered=False)
-            return order
-        except Order.DoesNotExist:
-            return None
+        return cart.get_active_order(self.request.user, with_lines=True)
 
 class PaymentAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        order = Order.objects.filter(user=request.user, ordered=False).first()
+        order = cart.get_active_order(request.user, with_lines=True)
         if not order:
             return Response({"message": "No tienes una orden activa"}, status=status.HTTP_404_NOT_FOUND)
         
         try:
-            service = MercadoPagoService()
-            # Usar el email del usuario o uno de prueba si no tiene
-            payer_email = request.user.email or "test_user@test.com"
-            
-            payment_data = service.create_preference(order, payer_email)
-            
-            # Crear objeto Payment local
-            payment = Payment.objects.create(
-                mercadopago_id=payment_data["preference_id"],
-                user=request.user,
-                amount=payment_data["amount"]
-            )
-            order.payment = payment
-            order.save()
-
+            service = get_mercadopago_service()
+            payment_data = checkout.start_checkout(request.user, order, service)
             return Response(payment_data, status=status.HTTP_200_OK)
 
+        except MercadoPagoUnavailable as e:
+            return Response({"message": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except checkout.CartChanged as e:
+            return Response({"message": str(e)}, status=status.HTTP_409_CONFLICT)
         except Exception as e:
             return Response({"message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -123,19 +340,11 @@ class RemoveSingleItemView(APIView):
         if not slug:
             return Response({"message": "Invalid request"}, status=status.HTTP_400_BAD_REQUEST)
         
-        item = get_object_or_404(Item, slug=slug)
-        order = Order.objects.filter(user=request.user, ordered=False).first()
-        
-        if order and order.items.filter(item__slug=item.slug).exists():
-            order_item = OrderItem.objects.filter(item=item, user=request.user, ordered=False).first()
-            if order_item.quantity > 1:
-                order_item.quantity -= 1
-                order_item.save()
-                return Response({"message": "Cantidad reducida"}, status=status.HTTP_200_OK)
-            else:
-                order.items.remove(order_item)
-                order_item.delete()
-                return Response({"message": "Producto eliminado (era el último)"}, status=status.HTTP_200_OK)
+        result = cart.remove_single_item(request.user, slug)
+        if result == cart.DECREMENTED:
+            return Response({"message": "Cantidad reducida"}, status=status.HTTP_200_OK)
+        elif result == cart.REMOVED:
+            return Response({"message": "Producto eliminado (era el último)"}, status=status.HTTP_200_OK)
         else:
             return Response({"message": "El producto no está en el carrito"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -147,13 +356,7 @@ class RemoveItemView(APIView):
         if not slug:
             return Response({"message": "Invalid request"}, status=status.HTTP_400_BAD_REQUEST)
         
-        item = get_object_or_404(Item, slug=slug)
-        order = Order.objects.filter(user=request.user, ordered=False).first()
-        
-        if order and order.items.filter(item__slug=item.slug).exists():
-            order_item = OrderItem.objects.filter(item=item, user=request.user, ordered=False).first()
-            order.items.remove(order_item)
-            order_item.delete()
+        if cart.remove_item(request.user, slug) == cart.REMOVED:
             return Response({"message": "Producto eliminado del carrito"}, status=status.HTTP_200_OK)
         else:
             return Response({"message": "El producto no está en el carrito"}, status=status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,237 @@
+"""
+Operaciones del carrito compartidas por las vistas web y la API.
+
+Cada operación es una transacción que modifica `quantity` con F() en la
+base, así dos taps simultáneos no se pisan el incremento. Las líneas del
+carrito se buscan con `ordered=False` en la línea y en su orden: los datos
+anteriores a la migración 0016 tienen líneas de órdenes pagadas con
+`ordered=False`, y nunca deben recibir unidades nuevas. Sumar un producto
+es un INSERT ... ON CONFLICT contra `unique_active_line_per_user_item`;
+quitar una línea existente es un solo UPDATE/DELETE (con el join a la orden
+en el WHERE).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import F, Prefetch
+
+from .models import Item, Order, OrderItem
+
+# Resultados de las operaciones
+ADDED = 'added'
+INCREMENTED = 'incremented'
+DECREMENTED = 'decremented'
+REMOVED = 'removed'
+NOT_IN_CART = 'not_in_cart'
+UNKNOWN_ITEM = 'unknown_item'
+
+# El contador del carrito vive en la caché compartida (CART_COUNT_CACHE_ALIAS)
+# y se borra en cada alta o baja de línea, así que todos los workers ven el
+# cambio; el timeout es solo un límite por si se pierde una invalidación
+CART_COUNT_TIMEOUT = 60
+
+
+def get_active_order(user, with_lines=False):
+    """
+    Carrito abierto del usuario, o None.
+
+    Con `with_lines=True` trae también las líneas con su producto y el total
+    de cada una ya calculado (una consulta más), para vistas que las recorren.
+    """
+    queryset = Order.objects.filter(user=user, ordered=False).order_by('pk')
+    if with_lines:
+        queryset = queryset.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('item').with_line_totals())
+        )
+    return queryset.first()
+
+
+def _cart_count_cache():
+    return caches[getattr(settings, 'CART_COUNT_CACHE_ALIAS', 'shared')]
+
+
+def _cart_count_key(user_id):
+    return f"cart:count:{user_id}"
+
+
+def get_cart_item_count(user):
+    """Cantidad de líneas del carrito abierto; una consulta como máximo, después sale de la caché."""
+    if not user or not user.is_authenticated:
+        return 0
+
+    cache = _cart_count_cache()
+    key = _cart_count_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Order.items.through.objects.filter(order__user=user, order__ordered=False).count()
+        cache.set(key, count, CART_COUNT_TIMEOUT)
+    return count
+
+
+def invalidate_cart_item_count(user_id):
+    # Después del commit, para que una lectura concurrente no vuelva a cachear el valor viejo
+    transaction.on_commit(lambda: _cart_count_cache().delete(_cart_count_key(user_id)))
+
+
+def _active_lines(user, slug):
+    # `order__ordered=False` además de `ordered=False`: una línea de una orden
+    # ya pagada nunca cuenta como parte del carrito
+    return OrderItem.objects.filter(user=user, ordered=False, order__ordered=False, item__slug=slug)
+
+
+# Inserta la línea o, si el usuario ya la tiene abierta, le suma una unidad.
+# El ON CONFLICT usa el mismo predicado que el índice parcial
+# `unique_active_line_per_user_item` (PostgreSQL y SQLite lo requieren para
+# elegirlo). Solo se incrementa si la línea está en una orden sin pagar; si
+# no, no devuelve filas. Devuelve también el id del carrito abierto.
+_UPSERT_LINE_SQL = """
+INSERT INTO {line} ("user_id", "item_id", "ordered", "quantity")
+SELECT %s, "id", %s, 1 FROM {item} WHERE "slug" = %s
+ON CONFLICT ("user_id", "item_id") WHERE NOT "ordered"
+DO UPDATE SET "quantity" = {line}."quantity" + 1
+WHERE EXISTS (
+    SELECT 1 FROM {through} INNER JOIN {order} ON {order}."id" = {through}."order_id"
+    WHERE {through}."orderitem_id" = {line}."id" AND NOT {order}."ordered"
+)
+RETURNING "id", "quantity", (
+    SELECT "id" FROM {order} WHERE "user_id" = %s AND NOT "ordered" ORDER BY "id" LIMIT 1
+)
+"""
+
+
+def _upsert_line(user, slug):
+    """(id de la línea, cantidad, id del carrito o None), o None si no insertó ni incrementó."""
+    sql = _UPSERT_LINE_SQL.format(
+        line=connection.ops.quote_name(OrderItem._meta.db_table),
+        item=connection.ops.quote_name(Item._meta.db_table),
+        order=connection.ops.quote_name(Order._meta.db_table),
+        through=connection.ops.quote_name(Order.items.through._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, False, slug, user.pk])
+        return cursor.fetchone()
+
+
+@transaction.atomic
+def add_item(user, slug):
+    """
+    Suma una unidad del producto al carrito del usuario.
+
+    Si la línea ya existe es una sola consulta (el upsert). Una línea nueva
+    son dos: el upsert, que además trae el id del carrito, y el INSERT de la
+    relación con la orden (más el get_or_create de la orden si el usuario no
+    tenía carrito). El upsert no devuelve filas cuando el producto no existe
+    o cuando la línea en conflicto no está en el carrito: la creó otro
+    request cuya relación con la orden todavía no se ve, o quedó de una
+    orden ya pagada; esos casos se resuelven con consultas aparte.
+
+    Raises:
+        Item.DoesNotExist: si no hay producto con ese slug
+    """
+    row = _upsert_line(user, slug)
+    if row is None:
+        if _active_lines(user, slug).update(quantity=F('quantity') + 1):
+            return INCREMENTED
+        item_id = Item.objects.filter(slug=slug).values_list('pk', flat=True).first()
+        if item_id is None:
+            raise Item.DoesNotExist(f"No hay un producto con slug {slug}")
+        # La línea en conflicto quedó de una orden ya pagada con
+        # `ordered=False`: se marca como pedida y se crea la nueva
+        OrderItem.objects.filter(user=user, item_id=item_id, ordered=False).update(ordered=True)
+        row = _upsert_line(user, slug)
+
+    line_id, quantity, order_id = row
+    if quantity > 1:
+        return INCREMENTED
+    if order_id is None:
+        order_id = Order.objects.get_or_create(user=user, ordered=False)[0].pk
+
+    Order.items.through.objects.create(order_id=order_id, orderitem_id=line_id)
+    invalidate_cart_item_count(user.pk)
+    return ADDED
+
+
+@transaction.atomic
+def remove_single_item(user, slug):
+    """Resta una unidad; si era la última, quita la línea del carrito."""
+    if _active_lines(user, slug).filter(quantity__gt=1).update(quantity=F('quantity') - 1):
+        return DECREMENTED
+    return remove_item(user, slug)
+
+
+@transaction.atomic
+def remove_item(user, slug):
+    """Quita la línea completa del carrito (la relación con la orden se borra en cascada)."""
+    deleted, _ = _active_lines(user, slug).delete()
+    if not deleted:
+        return NOT_IN_CART
+    invalidate_cart_item_count(user.pk)
+    return REMOVED
+
+
+@transaction.atomic
+def apply_batch(user, changes):
+    """
+    Aplica varios cambios de cantidad al carrito en una sola transacción.
+
+    Los deltas del mismo producto se suman antes de aplicarse. Las líneas
+    existentes se bloquean y se actualizan con un UPDATE/DELETE por lote;
+    una cantidad que queda en 0 o menos quita la línea. Solo los productos
+    que todavía no están en el carrito pasan por `add_item`.
+
+    Args:
+        changes: Iterable de (slug, delta)
+
+    Returns:
+        dict slug -> resultado (ADDED, INCREMENTED, DECREMENTED, REMOVED,
+        NOT_IN_CART o UNKNOWN_ITEM)
+    """
+    deltas = {}
+    for slug, delta in changes:
+        deltas[slug] = deltas.get(slug, 0) + delta
+    deltas = {slug: delta for slug, delta in deltas.items() if delta}
+    if not deltas:
+        return {}
+
+    lines = {
+        line.item.slug: line
+        for line in OrderItem.objects
+        .select_for_update(of=('self',))
+        .select_related('item')
+        .filter(user=user, ordered=False, order__ordered=False, item__slug__in=deltas)
+    }
+
+    results = {}
+    updated = []
+    removed = []
+    for slug, line in lines.items():
+        quantity = line.quantity + deltas[slug]
+        if quantity > 0:
+            line.quantity = quantity
+            updated.append(line)
+            results[slug] = INCREMENTED if deltas[slug] > 0 else DECREMENTED
+        else:
+            removed.append(line.pk)
+            results[slug] = REMOVED
+
+    if updated:
+        OrderItem.objects.bulk_update(updated, ['quantity'])
+    if removed:
+        OrderItem.objects.filter(pk__in=removed).delete()
+        invalidate_cart_item_count(user.pk)
+
+    for slug, delta in deltas.items():
+        if slug in lines:
+            continue
+        if delta < 0:
+            results[slug] = NOT_IN_CART
+            continue
+        try:
+            results[slug] = add_item(user, slug)
+        except Item.DoesNotExist:
+            results[slug] = UNKNOWN_ITEM
+            continue
+        if delta > 1:
+            _active_lines(user, slug).update(quantity=F('quantity') + delta - 1)
+
+    return results
@@ -0,0 +1,112 @@
+"""
+Caché del catálogo (Items, Categorías y Etiquetas).
+
+Todas las claves incluyen una "versión del catálogo" global. Los signals de
+`core.models` llaman a `bump_catalog_version()` en cada alta, edición o baja,
+así que las entradas viejas dejan de leerse en el momento en que cambia algo
+y terminan expirando solas.
+
+La versión y las entradas viven en la caché `CATALOG_CACHE_ALIAS`, que por
+defecto es la compartida ('shared', DatabaseCache): una edición invalida a
+todos los workers a la vez. Con una caché por proceso (LocMemCache) solo
+se invalidaría el worker que procesó la edición y el resto serviría datos
+viejos hasta `CATALOG_CACHE_TIMEOUT`.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_KEY = 'catalog:version'
+
+_MISSING = object()
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'shared')]
+
+
+def _new_version():
+    # Basada en el reloj para que nunca vuelva a un número ya usado si la
+    # clave de versión se pierde (reinicio o desalojo de la caché)
+    return int(time.time() * 1000)
+
+
+def get_catalog_version():
+    """Devuelve la versión actual del catálogo, inicializándola si hace falta."""
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _new_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalida todo lo cacheado del catálogo pasando a una versión nueva."""
+    cache = _cache()
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        version = _new_version()
+        cache.set(VERSION_KEY, version, timeout=None)
+        return version
+
+
+def make_key(name, params=''):
+    digest = hashlib.md5(str(params).encode('utf-8')).hexdigest()
+    return f"catalog:{get_catalog_version()}:{name}:{digest}"
+
+
+def cached(name, params, producer, timeout=None):
+    """
+    Devuelve el valor cacheado para (name, params) o lo calcula con `producer`.
+
+    Args:
+        name: Tipo de entrada (ej: 'items', 'item', 'home')
+        params: Lo que distingue una entrada de otra del mismo tipo
+        producer: Callable sin argumentos que consulta la base
+        timeout: Segundos de vida; por defecto CATALOG_CACHE_TIMEOUT
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+    cache = _cache()
+    key = make_key(name, params)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _record('hits')
+        return value
+
+    _record('misses')
+    value = producer()
+    cache.set(key, value, timeout)
+    return value
+
+
+def _record(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def get_stats():
+    """Contadores de hits/misses de este proceso."""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'version': get_catalog_version(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats['hits'] = 0
+        _stats['misses'] = 0
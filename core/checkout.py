@@ -0,0 +1,137 @@
+"""
+Inicio del pago compartido por `/payment/` y `/api/checkout/`.
+
+Cada preferencia de MercadoPago queda asociada a una huella del carrito
+(líneas, cantidades, precios y envío). Si el usuario vuelve a la página de
+pago o toca dos veces el botón con el mismo carrito, se devuelve la URL de
+la preferencia que ya existe en lugar de crear otra (y otro Payment).
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import cart, zones
+from .models import Order, Payment
+
+
+def order_fingerprint(order):
+    """
+    Huella del contenido de la orden; cambia si cambia cualquier cosa que se cobra.
+
+    Usa las líneas ya traídas con `get_active_order(with_lines=True)`.
+    """
+    lines = sorted(
+        (oi.item_id, oi.quantity, round(oi.get_final_price(), 2))
+        for oi in order.items.all()
+    )
+    raw = repr((lines, round(order.shipping_cost or 0.0, 2), bool(settings.MERCADOPAGO_SANDBOX)))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _reusable(payment, fingerprint):
+    ttl = getattr(settings, 'MERCADOPAGO_PREFERENCE_TTL', 30 * 60)
+    return (
+        payment is not None
+        and payment.status == Payment.PENDING
+        and payment.fingerprint == fingerprint
+        and payment.init_point
+        and payment.timestamp >= timezone.now() - timedelta(seconds=ttl)
+    )
+
+
+# Veces que se vuelve a intentar si el carrito cambia mientras se crea la preferencia
+MAX_ATTEMPTS = 3
+
+
+class CartChanged(Exception):
+    """El carrito cambió en cada intento mientras se creaba la preferencia."""
+
+
+def _reuse(payment):
+    return {
+        "preference_id": payment.mercadopago_id,
+        "init_point": payment.init_point,
+        "amount": payment.amount,
+    }
+
+
+def _prepare(user, order):
+    """
+    Con la orden bloqueada: actualiza el envío y calcula la huella.
+
+    Returns:
+        (huella, datos de la preferencia reutilizable o None)
+    """
+    with transaction.atomic():
+        locked = Order.objects.select_for_update(of=('self',)).select_related('payment').get(pk=order.pk)
+
+        # Envío según el código postal del perfil; sin zona conocida queda el costo que ya tenía
+        shipping_cost = zones.shipping_cost_for_user(user)
+        if shipping_cost is not None and shipping_cost != locked.shipping_cost:
+            Order.objects.filter(pk=order.pk).update(shipping_cost=shipping_cost)
+            locked.shipping_cost = shipping_cost
+        order.shipping_cost = locked.shipping_cost
+
+        fingerprint = order_fingerprint(order)
+        if _reusable(locked.payment, fingerprint):
+            return fingerprint, _reuse(locked.payment)
+        return fingerprint, None
+
+
+def start_checkout(user, order, service):
+    """
+    Devuelve la preferencia de pago para la orden, reutilizando la última si el carrito no cambió.
+
+    La orden se bloquea solo para decidir y para guardar el resultado; la
+    llamada a MercadoPago se hace sin lock, así un MercadoPago lento no
+    frena las operaciones del carrito. Al guardar se vuelve a calcular la
+    huella: si el carrito cambió mientras tanto la preferencia ya no sirve
+    y se repite el proceso. Si en ese tiempo otro request del mismo usuario
+    guardó una preferencia para el mismo carrito, se devuelve esa.
+
+    Args:
+        user: Usuario que paga
+        order: Orden activa con sus líneas (`get_active_order(with_lines=True)`)
+        service: MercadoPagoService (o un fake con `create_preference`)
+
+    Returns:
+        dict con preference_id, init_point y amount
+
+    Raises:
+        CartChanged: si el carrito cambió en los MAX_ATTEMPTS intentos
+    """
+    payer_email = user.email or "test_user@test.com"
+
+    for _ in range(MAX_ATTEMPTS):
+        fingerprint, reused = _prepare(user, order)
+        if reused is not None:
+            return reused
+
+        payment_data = service.create_preference(order, payer_email)
+
+        with transaction.atomic():
+            locked = Order.objects.select_for_update(of=('self',)).select_related('payment').get(pk=order.pk)
+            current = cart.get_active_order(user, with_lines=True)
+            if current is None or current.pk != order.pk:
+                raise CartChanged("La orden ya no está activa")
+            if order_fingerprint(current) != fingerprint:
+                order = current
+                continue
+            if _reusable(locked.payment, fingerprint):
+                return _reuse(locked.payment)
+
+            payment = Payment.objects.create(
+                mercadopago_id=payment_data["preference_id"],
+                user=user,
+                amount=payment_data["amount"],
+                fingerprint=fingerprint,
+                init_point=payment_data["init_point"],
+            )
+            Order.objects.filter(pk=order.pk).update(payment=payment)
+            order.payment = payment
+            return payment_data
+
+    raise CartChanged("El carrito cambió mientras se preparaba el pago. Intentá de nuevo.")
@@ -0,0 +1,13 @@
+from django.utils.functional import SimpleLazyObject
+
+from .cart import get_cart_item_count
+
+
+def cart(request):
+    """
+    Expone `cart_item_count` a todos los templates.
+
+    Es perezoso: solo consulta si el template lo usa, y una sola vez por request.
+    """
+    user = getattr(request, 'user', None)
+    return {'cart_item_count': SimpleLazyObject(lambda: get_cart_item_count(user))}
@@ -0,0 +1,87 @@
+"""
+Dobles de MercadoPago para tests y para correr el worker sin credenciales.
+"""
+import threading
+import time
+
+
+class FakeMercadoPagoClient:
+    """
+    Responde `get_payment_info` desde un dict en memoria y crea
+    preferencias falsas con `create_preference`.
+
+    Args:
+        payments: {payment_id: respuesta} con lo que devolvería MercadoPago
+        default_status: Estado para pagos que no están en `payments`
+        latency: Segundos de espera por llamada, para simular la red
+    """
+
+    def __init__(self, payments=None, default_status='approved', latency=0.0):
+        self.payments = {str(k): v for k, v in (payments or {}).items()}
+        self.default_status = default_status
+        self.latency = latency
+        self.calls = []
+        self.preferences = []
+        self._lock = threading.Lock()
+
+    def search_payments(self, external_reference):
+        """Un pago por orden con `default_status`, salvo que `payments` tenga uno con esa referencia."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls.append(f"search:{external_reference}")
+        matches = [p for p in self.payments.values() if str(p.get('external_reference')) == str(external_reference)]
+        return matches or [{
+            'id': f"fake-{external_reference}",
+            'status': self.default_status,
+            'external_reference': str(external_reference),
+        }]
+
+    def create_preference(self, order, payer_email):
+        with self._lock:
+            self.preferences.append(order.pk)
+            preference_id = f"fake-pref-{len(self.preferences)}"
+        return {
+            "preference_id": preference_id,
+            "init_point": f"https://www.mercadopago.com.ar/checkout/v1/redirect?pref_id={preference_id}",
+            "amount": order.get_total() or 0.0,
+        }
+
+    def get_payment_info(self, payment_id):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls.append(str(payment_id))
+        return self.payments.get(str(payment_id), {'id': payment_id, 'status': self.default_status})
+
+
+class FakeShippingProvider:
+    """
+    Proveedor de envío con latencia configurable.
+
+    Args:
+        name: Nombre del proveedor
+        base_cost: Costo fijo del envío
+        cost_per_kg: Costo por kilo
+        latency: Segundos que tarda en responder
+        fail: Si es True, `get_quote` lanza una excepción
+    """
+
+    def __init__(self, name, base_cost=500.0, cost_per_kg=100.0, latency=0.0, fail=False, timeout=None):
+        self.name = name
+        self.base_cost = base_cost
+        self.cost_per_kg = cost_per_kg
+        self.latency = latency
+        self.fail = fail
+        self.timeout = timeout
+        self.calls = 0
+
+    def get_quote(self, weight, volume, destination):
+        from .quotes import Quote
+
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail:
+            raise ConnectionError(f"{self.name} no disponible")
+        return Quote(provider=self.name, cost=round(self.base_cost + weight * self.cost_per_kg, 2), days=3)
@@ -0,0 +1,71 @@
+import csv
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import shipping, warehouses, zones
+from core.models import ShippingZone
+
+DEFAULT_FILE = Path(settings.BASE_DIR) / 'fixtures' / 'shipping_zones.csv'
+
+
+class Command(BaseCommand):
+    help = 'Carga o actualiza las zonas de envío desde un CSV (zip_code, city, province, lon, lat)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=str(DEFAULT_FILE),
+                            help='CSV a cargar; por defecto fixtures/shipping_zones.csv')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = self._read(options['path'])
+        if not rows:
+            raise CommandError("El archivo no tiene zonas.")
+
+        # Distancia y costo de todas las zonas en una sola pasada vectorizada
+        distances, costs, nearest = shipping.bulk_quote([(row['lon'], row['lat']) for row in rows])
+        depots = warehouses.get_index().warehouses
+
+        objects = [
+            ShippingZone(
+                zip_code=row['zip_code'],
+                city=row['city'],
+                province=row['province'],
+                lon=row['lon'],
+                lat=row['lat'],
+                warehouse_code=depots[index].code,
+                distance_km=float(distance),
+                shipping_cost=float(cost),
+            )
+            for row, distance, cost, index in zip(rows, distances, costs, nearest)
+        ]
+        ShippingZone.objects.bulk_create(
+            objects,
+            batch_size=options['batch_size'],
+            update_conflicts=True,
+            unique_fields=['zip_code'],
+            update_fields=['city', 'province', 'lon', 'lat', 'warehouse_code', 'distance_km', 'shipping_cost'],
+        )
+        zones.reset_zone_table()
+
+        self.stdout.write(self.style.SUCCESS(f"{len(objects)} zonas de envío cargadas"))
+
+    def _read(self, path):
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                rows = []
+                for row in csv.DictReader(f):
+                    zip_code = zones.normalize_zip(row['zip_code'])
+                    if not zip_code:
+                        continue
+                    rows.append({
+                        'zip_code': zip_code,
+                        'city': row.get('city', '').strip(),
+                        'province': row.get('province', '').strip(),
+                        'lon': float(row['lon']),
+                        'lat': float(row['lat']),
+                    })
+                return rows
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f"No se pudo leer {path}: {e}")
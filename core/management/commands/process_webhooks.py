@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import webhooks
+
+
+class Command(BaseCommand):
+    help = 'Procesa las notificaciones de MercadoPago pendientes en la bandeja de entrada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Notificaciones por lote')
+        parser.add_argument('--loop', action='store_true',
+                            help='Seguir corriendo y revisar la bandeja cada --sleep segundos')
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help='Espera entre lotes cuando la bandeja está vacía')
+        parser.add_argument('--fake', action='store_true',
+                            help='Usar FakeMercadoPagoClient (aprueba todos los pagos)')
+
+    def handle(self, *args, **options):
+        client = self._get_client(options['fake'])
+
+        while True:
+            stats = webhooks.process_pending(client, batch_size=options['batch_size'])
+            if stats['notifications']:
+                self.stdout.write(
+                    f"{stats['notifications']} notificaciones, {stats['payments']} pagos, "
+                    f"{stats['approved']} aprobados, {stats['errors']} errores"
+                )
+            if not options['loop']:
+                break
+            # Si el lote vino lleno probablemente quedan más, no hace falta esperar;
+            # con errores (ej: circuito abierto) sí, para no reintentar en seguida
+            if stats['errors'] or stats['notifications'] < options['batch_size']:
+                time.sleep(options['sleep'])
+
+    def _get_client(self, fake):
+        if fake:
+            from core.fakes import FakeMercadoPagoClient
+            return FakeMercadoPagoClient()
+        from core.services import get_mercadopago_service
+        return get_mercadopago_service()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import sync
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra las bajas de productos más viejas que SYNC_TOMBSTONE_RETENTION_DAYS. '
+        'Los tokens de sincronización anteriores ya no son válidos, así que no se pierde nada.'
+    )
+
+    def handle(self, *args, **options):
+        deleted = sync.prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} bajas borradas"))
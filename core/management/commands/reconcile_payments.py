@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core import reconciliation
+
+
+class Command(BaseCommand):
+    help = 'Concilia los pagos pendientes consultando su estado en MercadoPago'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Pagos leídos y escritos por bloque')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Consultas simultáneas a MercadoPago')
+        parser.add_argument('--min-age', type=int, default=10,
+                            help='Ignorar pagos creados hace menos de estos minutos')
+        parser.add_argument('--fake', action='store_true',
+                            help='Usar FakeMercadoPagoClient en lugar de MercadoPago')
+        parser.add_argument('--fake-status', default='approved',
+                            help='Estado que devuelve el cliente falso')
+        parser.add_argument('--fake-latency', type=float, default=0.0,
+                            help='Segundos de espera por consulta del cliente falso')
+
+    def handle(self, *args, **options):
+        client = self._get_client(options)
+
+        stats = reconciliation.reconcile_pending(
+            client,
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            min_age=timedelta(minutes=options['min_age']),
+            on_chunk=self._report if options['verbosity'] > 1 else None,
+        )
+
+        self.stdout.write(self.style.SUCCESS(self._format(stats)))
+
+    def _report(self, stats):
+        self.stdout.write(self._format(stats))
+
+    def _format(self, stats):
+        elapsed = stats['elapsed']
+        rate = stats['scanned'] / elapsed if elapsed else 0.0
+        return (
+            f"{stats['scanned']} pagos en {elapsed:.1f}s ({rate:.0f}/s): "
+            f"{stats['approved']} aprobados, {stats['updated']} con otro estado, "
+            f"{stats['not_found']} sin pagos en MercadoPago, {stats['errors']} errores"
+        )
+
+    def _get_client(self, options):
+        if options['fake']:
+            from core.fakes import FakeMercadoPagoClient
+            return FakeMercadoPagoClient(
+                default_status=options['fake_status'],
+                latency=options['fake_latency'],
+            )
+        from core.services import get_mercadopago_service
+        return get_mercadopago_service()
@@ -0,0 +1,59 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from core import quotes
+from core.models import UserProfile
+from core.management.commands.load_shipping_zones import DEFAULT_FILE
+
+
+class Command(BaseCommand):
+    help = (
+        'Precarga la caché de cotizaciones de los correos para las zonas con más clientes, '
+        'en cada rango de peso.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zones-file', default=str(DEFAULT_FILE),
+                            help='CSV con columnas zip_code, lon, lat; por defecto fixtures/shipping_zones.csv')
+        parser.add_argument('--top', type=int, default=200,
+                            help='Cantidad de códigos postales a precargar')
+        parser.add_argument('--weights', type=float, nargs='+', default=list(quotes.WEIGHT_BRACKETS),
+                            help='Pesos (kg) a cotizar; por defecto el máximo de cada rango')
+
+    def handle(self, *args, **options):
+        zones = self._read_zones(options['zones_file'])
+
+        # Los códigos postales con más clientes primero; después el resto del archivo
+        ranked = [
+            row['zip_code'] for row in
+            UserProfile.objects.exclude(zip_code__isnull=True).exclude(zip_code='')
+            .values('zip_code').annotate(total=Count('id')).order_by('-total')
+            if row['zip_code'] in zones
+        ]
+        already = set(ranked)
+        ranked += [zip_code for zip_code in zones if zip_code not in already]
+        selected = ranked[:options['top']]
+
+        aggregator = quotes.QuoteAggregator(quotes.get_providers())
+        start = time.perf_counter()
+        for zip_code in selected:
+            for weight in options['weights']:
+                aggregator.get_quotes(weight, 0, zones[zip_code])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(selected)} zonas precargadas ({len(options['weights'])} rangos de peso) en {elapsed:.2f}s"
+        ))
+
+    def _read_zones(self, path):
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                return {
+                    row['zip_code'].strip(): (float(row['lon']), float(row['lat']))
+                    for row in csv.DictReader(f)
+                }
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f"No se pudo leer {path}: {e}")
@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 12:03
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_item_preview_image_item_video'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['category', 'id'], name='item_category_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['label', 'id'], name='item_label_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('discount_price__isnull', False)), fields=['id'], name='item_on_discount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('discount_price', 'price'), name='item_effective_price_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_item_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.BigIntegerField(verbose_name='ID del producto')),
+                ('slug', models.SlugField(verbose_name='Slug')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha de borrado')),
+            ],
+            options={
+                'verbose_name': 'Producto eliminado',
+                'verbose_name_plural': 'Productos eliminados',
+            },
+        ),
+    ]
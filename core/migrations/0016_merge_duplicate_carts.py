@@ -0,0 +1,88 @@
+# Generated by Django 4.2 on 2026-10-18 12:08
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def merge_duplicate_carts(apps, schema_editor):
+    """
+    Deja un solo carrito por usuario y una sola línea abierta por producto,
+    para poder crear las constraints únicas de la migración siguiente.
+    """
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    OrderLines = Order.items.through
+
+    # El add-to-cart anterior reutilizaba la línea abierta de una compra ya
+    # pagada y la agregaba al carrito nuevo. Esa línea queda en la orden
+    # pagada; el carrito recibe una copia propia con una unidad (lo que
+    # agregó el usuario después de pagar), así no se cobra lo ya pagado
+    shared = OrderLines.objects.filter(
+        order__ordered=False,
+        orderitem__ordered=False,
+        orderitem__order__ordered=True,
+    ).select_related('orderitem').distinct()
+    for row in shared:
+        line = row.orderitem
+        copy = OrderItem.objects.create(user_id=line.user_id, item_id=line.item_id, quantity=1, ordered=False)
+        OrderLines.objects.filter(pk=row.pk).update(orderitem_id=copy.pk)
+
+    # El webhook anterior marcaba la orden como pagada pero no sus líneas:
+    # se marcan, así las líneas de compras ya hechas no se toman como
+    # líneas del carrito
+    OrderItem.objects.filter(ordered=False, order__ordered=True).update(ordered=True)
+    open_lines = OrderItem.objects.filter(ordered=False)
+
+    # Líneas abiertas repetidas: se suman las cantidades en la más vieja
+    duplicated_lines = (
+        open_lines
+        .values('user_id', 'item_id')
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicated_lines:
+        lines = list(
+            open_lines
+            .filter(user_id=row['user_id'], item_id=row['item_id'])
+            .order_by('pk')
+        )
+        keep, extra = lines[0], lines[1:]
+        keep.quantity = sum(line.quantity for line in lines)
+        keep.save(update_fields=['quantity'])
+
+        order_ids = OrderLines.objects.filter(orderitem_id__in=[line.pk for line in extra]).values_list('order_id', flat=True)
+        for order_id in set(order_ids):
+            OrderLines.objects.get_or_create(order_id=order_id, orderitem_id=keep.pk)
+        OrderItem.objects.filter(pk__in=[line.pk for line in extra]).delete()
+
+    # Órdenes abiertas repetidas: las líneas pasan a la más vieja
+    duplicated_orders = (
+        Order.objects.filter(ordered=False)
+        .values('user_id')
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicated_orders:
+        orders = list(Order.objects.filter(ordered=False, user_id=row['user_id']).order_by('pk'))
+        keep, extra = orders[0], orders[1:]
+
+        line_ids = OrderLines.objects.filter(order_id__in=[order.pk for order in extra]).values_list('orderitem_id', flat=True)
+        for line_id in set(line_ids):
+            OrderLines.objects.get_or_create(order_id=keep.pk, orderitem_id=line_id)
+
+        if keep.payment_id is None:
+            keep.payment_id = next((order.payment_id for order in extra if order.payment_id), None)
+            keep.save(update_fields=['payment'])
+
+        Order.objects.filter(pk__in=[order.pk for order in extra]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_itemtombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_carts, migrations.RunPython.noop),
+    ]
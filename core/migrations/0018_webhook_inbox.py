@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-18 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_active_cart_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(blank=True, max_length=50, verbose_name='Tipo')),
+                ('payment_id', models.CharField(blank=True, db_index=True, max_length=64, verbose_name='ID de pago')),
+                ('payload', models.JSONField(verbose_name='Contenido')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('processed', 'Procesada'), ('failed', 'Fallida')], default='pending', max_length=10, verbose_name='Estado')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último error')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Recibida')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Procesada')),
+            ],
+            options={
+                'verbose_name': 'Notificación de MercadoPago',
+                'verbose_name_plural': 'Notificaciones de MercadoPago',
+            },
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(db_index=True, default='pending', max_length=20, verbose_name='Estado'),
+        ),
+        migrations.AddIndex(
+            model_name='webhooknotification',
+            index=models.Index(fields=['status', 'id'], name='webhook_status_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_webhook_inbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Huella del carrito'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='init_point',
+            field=models.URLField(blank=True, max_length=500, verbose_name='URL de pago'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_payment_preference_reuse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShippingZone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zip_code', models.CharField(max_length=10, unique=True, verbose_name='Código postal')),
+                ('city', models.CharField(blank=True, max_length=100, verbose_name='Ciudad')),
+                ('province', models.CharField(blank=True, max_length=100, verbose_name='Provincia')),
+                ('lon', models.FloatField(verbose_name='Longitud')),
+                ('lat', models.FloatField(verbose_name='Latitud')),
+                ('warehouse_code', models.CharField(blank=True, max_length=20, verbose_name='Depósito')),
+                ('distance_km', models.FloatField(verbose_name='Distancia (km)')),
+                ('shipping_cost', models.FloatField(verbose_name='Costo de envío')),
+            ],
+            options={
+                'verbose_name': 'Zona de envío',
+                'verbose_name_plural': 'Zonas de envío',
+            },
+        ),
+    ]
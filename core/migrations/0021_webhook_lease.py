@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_shippingzone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhooknotification',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Tomada hasta'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 12:48
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_webhook_lease'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='item',
+            name='item_on_discount_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='item',
+            name='item_effective_price_idx',
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('discount_price__gt', 0)), fields=['id'], name='item_on_discount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(django.db.models.functions.comparison.Coalesce(django.db.models.functions.comparison.NullIf('discount_price', models.Value(0.0)), 'price'), name='item_effective_price_idx'),
+        ),
+    ]
@@ -1,6 +1,58 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
 from django.shortcuts import reverse
+from django.utils import timezone
+
+from core import catalog_cache
+
+
+def effective_price(prefix=''):
+    """
+    Precio final de un Item: el de descuento si existe, si no el de lista.
+
+    Igual que `OrderItem.get_final_price`, un descuento en 0 no cuenta.
+    `prefix` permite usarlo desde otro modelo (ej: 'item__' desde OrderItem).
+    """
+    return Coalesce(NullIf(f'{prefix}discount_price', Value(0.0)), f'{prefix}price')
+
+
+def line_total(prefix=''):
+    """
+    Total de un OrderItem calculado en la base: cantidad por precio final.
+
+    Replica `OrderItem.get_final_price`: un descuento en 0 o nulo no cuenta.
+    `prefix` permite usarlo desde otro modelo (ej: 'items__' desde Order).
+    """
+    return ExpressionWrapper(
+        F(f'{prefix}quantity') * effective_price(f'{prefix}item__'),
+        output_field=models.FloatField(),
+    )
+
+
+class CatalogQuerySet(models.QuerySet):
+    """
+    QuerySet de los modelos del catálogo.
+
+    `update()` no dispara post_save, así que invalida la caché del catálogo
+    acá, después del commit, igual que los signals de más abajo.
+    """
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            transaction.on_commit(catalog_cache.bump_catalog_version, using=self.db)
+        return rows
+
+
+class ItemQuerySet(CatalogQuerySet):
+    def update(self, **kwargs):
+        # auto_now no se aplica en update(); sin esto los ETags y
+        # /products/changes/ no se enterarían del cambio
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
 
 class Category(models.Model):
     title = models.CharField(max_length=100)
@@ -9,6 +61,8 @@ class Category(models.Model):
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
     is_active = models.BooleanField(default=True)
 
+    objects = CatalogQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
@@ -23,6 +77,8 @@ class Label(models.Model):
     color = models.CharField(max_length=7, verbose_name='Color (Hex)', blank=True, null=True, help_text='ej: #FF5733')
     is_active = models.BooleanField(default=True, verbose_name='Activa')
 
+    objects = CatalogQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
@@ -43,6 +99,9 @@ class Item(models.Model):
     preview_image = models.ImageField(upload_to='products/previews/', blank=True, null=True, verbose_name='Imagen de Previsualización', help_text='Imagen que se mostrará en la página principal. Si está vacía, se usará la imagen principal.')
     video = models.FileField(upload_to='products/videos/', blank=True, null=True, verbose_name='Video del Producto', help_text='Video corto del producto (máximo 10 segundos)')
     currency = models.CharField(max_length=3, default='ARS', verbose_name='Moneda')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última modificación')
+
+    objects = ItemQuerySet.as_manager()
 
     def __str__(self):
         return self.title
@@ -53,6 +112,33 @@ class Item(models.Model):
     class Meta:
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
+        indexes = [
+            # Paginación por cursor (ORDER BY id) combinada con los filtros del catálogo
+            models.Index(fields=['category', 'id'], name='item_category_id_idx'),
+            models.Index(fields=['label', 'id'], name='item_label_id_idx'),
+            models.Index(fields=['id'], condition=Q(discount_price__gt=0), name='item_on_discount_idx'),
+            models.Index(effective_price(), name='item_effective_price_idx'),
+        ]
+
+
+class ItemTombstone(models.Model):
+    """Registro de un Item borrado, para que la sincronización incremental informe la baja."""
+    item_id = models.BigIntegerField(verbose_name='ID del producto')
+    slug = models.SlugField(verbose_name='Slug')
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha de borrado')
+
+    def __str__(self):
+        return f"{self.slug} ({self.item_id})"
+
+    class Meta:
+        verbose_name = 'Producto eliminado'
+        verbose_name_plural = 'Productos eliminados'
+
+
+class OrderItemQuerySet(models.QuerySet):
+    def with_line_totals(self):
+        """Anota `line_total` en cada línea para no recalcularlo en Python."""
+        return self.annotate(line_total=line_total())
 
 
 class OrderItem(models.Model):
@@ -61,6 +147,8 @@ class OrderItem(models.Model):
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    objects = OrderItemQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.quantity} x {self.item.title}"
 
@@ -73,6 +161,8 @@ class OrderItem(models.Model):
         return self.get_total_item_price()
 
     def get_final_price(self):
+        if hasattr(self, 'line_total'):
+            return self.line_total
         if self.item.discount_price:
             return self.get_total_discount_item_price()
         return self.get_total_item_price()
@@ -80,6 +170,23 @@ class OrderItem(models.Model):
     class Meta:
         verbose_name = 'Item de Orden'
         verbose_name_plural = 'Items de Orden'
+        constraints = [
+            # Una sola línea abierta por producto en el carrito de cada usuario
+            models.UniqueConstraint(
+                fields=['user', 'item'],
+                condition=Q(ordered=False),
+                name='unique_active_line_per_user_item',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'ordered', 'item'], name='orderitem_user_ordered_idx'),
+        ]
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Anota `items_total` (suma de las líneas, sin envío) con un solo aggregate."""
+        return self.annotate(items_total=Coalesce(Sum(line_total('items__')), Value(0.0)))
 
 
 class Order(models.Model):
@@ -96,25 +203,63 @@ class Order(models.Model):
     refund_granted = models.BooleanField(default=False)
     shipping_cost = models.FloatField(default=0.0)
 
+    objects = OrderQuerySet.as_manager()
+
     def __str__(self):
         return f"Order {self.pk} - {self.user.username}"
 
+    def get_items_total(self):
+        """
+        Suma de las líneas sin envío.
+
+        Usa, en este orden: la anotación de `with_totals()`, las líneas
+        prefetcheadas, o un aggregate en la base. El resultado queda guardado
+        en la instancia, así que llamarlo varias veces en un mismo request no
+        repite consultas.
+        """
+        if not hasattr(self, 'items_total'):
+            prefetched = getattr(self, '_prefetched_objects_cache', {}).get('items')
+            if prefetched is not None:
+                total = sum(order_item.get_final_price() for order_item in prefetched)
+            else:
+                total = self.items.aggregate(total=Sum(line_total()))['total']
+            self.items_total = total or 0
+        return self.items_total
+
     def get_total(self):
-        total = 0
-        for order_item in self.items.all():
-            total += order_item.get_final_price()
-        return total + self.shipping_cost
+        return self.get_items_total() + self.shipping_cost
 
     class Meta:
         verbose_name = 'Orden'
         verbose_name_plural = 'Ordenes'
+        constraints = [
+            # Un solo carrito (orden sin pedir) por usuario
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=Q(ordered=False),
+                name='unique_active_order_per_user',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'ordered'], name='order_user_ordered_idx'),
+        ]
 
 
 class Payment(models.Model):
+    PENDING = 'pending'
+    APPROVED = 'approved'
+    # Estados de MercadoPago en los que el pago todavía puede aprobarse
+    OPEN_STATUSES = (PENDING, 'in_process', 'authorized', 'in_mediation')
+
     mercadopago_id = models.CharField(max_length=128, blank=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True)
     amount = models.FloatField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Último estado informado por MercadoPago (pending, approved, rejected, ...)
+    status = models.CharField(max_length=20, default=PENDING, db_index=True, verbose_name='Estado')
+    # Huella del carrito con el que se creó la preferencia (ver core/checkout.py)
+    fingerprint = models.CharField(max_length=64, blank=True, verbose_name='Huella del carrito')
+    init_point = models.URLField(max_length=500, blank=True, verbose_name='URL de pago')
 
     def __str__(self):
         return f"Payment {self.pk} - {self.user.username if self.user else 'anon'}"
@@ -124,6 +269,64 @@ class Payment(models.Model):
         verbose_name_plural = 'Pagos'
 
 
+class WebhookNotification(models.Model):
+    """Notificación de MercadoPago tal como llegó, pendiente de procesar por el worker."""
+    PENDING = 'pending'
+    PROCESSED = 'processed'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pendiente'),
+        (PROCESSED, 'Procesada'),
+        (FAILED, 'Fallida'),
+    )
+
+    topic = models.CharField(max_length=50, blank=True, verbose_name='Tipo')
+    payment_id = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='ID de pago')
+    payload = models.JSONField(verbose_name='Contenido')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name='Estado')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')
+    last_error = models.TextField(blank=True, verbose_name='Último error')
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name='Recibida')
+    processed_at = models.DateTimeField(blank=True, null=True, verbose_name='Procesada')
+    # Un worker tomó la notificación y la está procesando hasta este momento;
+    # si el worker muere, al vencer vuelve a estar disponible
+    locked_until = models.DateTimeField(blank=True, null=True, verbose_name='Tomada hasta')
+
+    def __str__(self):
+        return f"{self.topic or 'notificación'} {self.payment_id} ({self.status})"
+
+    class Meta:
+        verbose_name = 'Notificación de MercadoPago'
+        verbose_name_plural = 'Notificaciones de MercadoPago'
+        indexes = [
+            models.Index(fields=['status', 'id'], name='webhook_status_idx'),
+        ]
+
+
+class ShippingZone(models.Model):
+    """
+    Código postal con su centroide y el costo de envío ya calculado.
+
+    Se carga desde fixtures/shipping_zones.csv con `load_shipping_zones` y
+    se consulta desde el dict en memoria de core/zones.py.
+    """
+    zip_code = models.CharField(max_length=10, unique=True, verbose_name='Código postal')
+    city = models.CharField(max_length=100, blank=True, verbose_name='Ciudad')
+    province = models.CharField(max_length=100, blank=True, verbose_name='Provincia')
+    lon = models.FloatField(verbose_name='Longitud')
+    lat = models.FloatField(verbose_name='Latitud')
+    warehouse_code = models.CharField(max_length=20, blank=True, verbose_name='Depósito')
+    distance_km = models.FloatField(verbose_name='Distancia (km)')
+    shipping_cost = models.FloatField(verbose_name='Costo de envío')
+
+    def __str__(self):
+        return f"{self.zip_code} - {self.city}"
+
+    class Meta:
+        verbose_name = 'Zona de envío'
+        verbose_name_plural = 'Zonas de envío'
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     stripe_customer_id = models.CharField(max_length=50, blank=True, null=True)
@@ -144,7 +347,7 @@ class UserProfile(models.Model):
         verbose_name = 'Perfil de Usuario'
         verbose_name_plural = 'Perfiles de Usuario'
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -155,3 +358,21 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def save_user_profile(sender, instance, **kwargs):
     instance.userprofile.save()
+
+@receiver([post_save, post_delete], sender=Item)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Label)
+def invalidate_catalog_cache(sender, **kwargs):
+    # Después del commit: si se invalidara antes, una lectura concurrente
+    # podría volver a cachear los datos viejos con la versión nueva
+    transaction.on_commit(catalog_cache.bump_catalog_version)
+
+@receiver(pre_delete, sender=Label)
+def touch_labelled_items(sender, instance, **kwargs):
+    # El SET_NULL de Item.label no pasa por save() ni por update(): se marcan
+    # los productos como modificados para que los ETags y el delta cambien
+    Item.objects.filter(label=instance).update(updated_at=timezone.now())
+
+@receiver(post_delete, sender=Item)
+def record_item_tombstone(sender, instance, **kwargs):
+    ItemTombstone.objects.create(item_id=instance.pk, slug=instance.slug)
@@ -0,0 +1,152 @@
+"""
+Caché de cotizaciones de envío por zona (geohash) y rango de peso.
+
+`QuoteAggregator` (core/quotes.py) guarda acá cada cotización de un correo
+con la clave (proveedor, geohash del destino, rango de peso). Todas las
+direcciones de una celda comparten la cotización, que se pide para el
+centro de la celda. Con la precisión por defecto (6 caracteres, ~1,2 x 0,6
+km) la diferencia contra cotizar la dirección exacta es de menos de un km.
+
+Dos niveles:
+  - L1: LRU en memoria del proceso, con TTL. Un hit no sale del proceso.
+  - L2: la caché SHIPPING_QUOTE_CACHE_ALIAS ('shared'), compartida entre
+    workers. `warm_shipping_quotes` la precarga para las zonas con más
+    clientes.
+
+El costo propio del checkout no pasa por acá: sale de la tabla de zonas por
+código postal que cada worker tiene en memoria (core/zones.py).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_MISSING = object()
+
+
+def geohash_encode(lon, lat, precision=6):
+    """Geohash de un punto (lon/lat en grados)."""
+    lon_range = [-180.0, 180.0]
+    lat_range = [-90.0, 90.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (lon, lon_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_center(geohash):
+    """Centro (lon, lat) de la celda de un geohash."""
+    lon_range = [-180.0, 180.0]
+    lat_range = [-90.0, 90.0]
+    even = True
+    for char in geohash:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lon_range if even else lat_range
+            mid = (bounds[0] + bounds[1]) / 2
+            if value >> shift & 1:
+                bounds[0] = mid
+            else:
+                bounds[1] = mid
+            even = not even
+    return (lon_range[0] + lon_range[1]) / 2, (lat_range[0] + lat_range[1]) / 2
+
+
+class LRUCache:
+    """
+    Diccionario acotado a `maxsize` entradas que descarta la menos usada,
+    y cuyas entradas vencen a los `ttl` segundos.
+    """
+
+    def __init__(self, maxsize=10_000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_local = LRUCache(
+    maxsize=getattr(settings, 'SHIPPING_QUOTE_L1_SIZE', 10_000),
+    ttl=getattr(settings, 'SHIPPING_QUOTE_L1_TTL', 300),
+)
+
+
+def _shared_cache():
+    return caches[getattr(settings, 'SHIPPING_QUOTE_CACHE_ALIAS', 'shared')]
+
+
+def zone_geohash(lon, lat):
+    return geohash_encode(lon, lat, getattr(settings, 'SHIPPING_GEOHASH_PRECISION', 6))
+
+
+def quote_key(provider_name, geohash, bracket):
+    return f"shipping:quote:{provider_name}:{geohash}:{bracket}"
+
+
+def lookup(key):
+    """Valor cacheado en L1 o, si no está, en L2 (y pasa a L1); None si no está en ninguna."""
+    value = _local.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    value = _shared_cache().get(key)
+    if value is not None:
+        _local.set(key, value)
+    return value
+
+
+def store(key, value, timeout=None):
+    """Guarda en los dos niveles; `timeout` (segundos) es el de L2."""
+    if timeout is None:
+        timeout = getattr(settings, 'SHIPPING_QUOTE_CACHE_TIMEOUT', 60 * 60)
+    _shared_cache().set(key, value, timeout)
+    _local.set(key, value)
+
+
+def clear_local_cache():
+    _local.clear()
@@ -0,0 +1,201 @@
+"""
+Cotizaciones de envío en paralelo entre varios proveedores.
+
+`QuoteAggregator` consulta a todos los proveedores a la vez en un pool de
+threads compartido por el proceso. Cada proveedor tiene su propio plazo
+(`timeout`, o SHIPPING_PROVIDER_TIMEOUT) y además hay un presupuesto total
+(SHIPPING_QUOTE_BUDGET): se devuelve lo que llegó a tiempo, así un
+proveedor lento no suma su latencia al checkout.
+
+Las cotizaciones se cachean en core/quote_cache.py (LRU del proceso más la
+caché compartida) por (proveedor, geohash del destino, rango de peso). Al
+proveedor se le pide el precio para el centro de la celda y el peso máximo
+del rango, así que cualquier paquete del mismo rango con destino en la
+misma celda puede usar la misma cotización. Por
+encima del último rango el peso se redondea hacia arriba a múltiplos de
+HEAVY_WEIGHT_STEP, nunca hacia abajo.
+
+La API lo expone en /api/shipping/quotes/ para mostrar las opciones de los
+correos antes del checkout.
+"""
+import bisect
+import logging
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+from . import quote_cache
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (kg) de los rangos de peso
+WEIGHT_BRACKETS = (0.5, 1, 2, 5, 10, 20, 30)
+
+# Paso (kg) de los rangos por encima del último de WEIGHT_BRACKETS
+HEAVY_WEIGHT_STEP = 10
+
+
+@dataclass(frozen=True)
+class Quote:
+    provider: str
+    cost: float
+    days: int = None
+
+
+def weight_bracket(weight):
+    """
+    Límite superior del rango que contiene al peso.
+
+    Por encima del último rango se redondea hacia arriba al próximo múltiplo
+    de HEAVY_WEIGHT_STEP (45 kg -> 50 kg), así un paquete pesado no se
+    cotiza ni se cachea como si pesara 30 kg.
+    """
+    if weight > WEIGHT_BRACKETS[-1]:
+        return math.ceil(weight / HEAVY_WEIGHT_STEP) * HEAVY_WEIGHT_STEP
+    return WEIGHT_BRACKETS[bisect.bisect_left(WEIGHT_BRACKETS, weight)]
+
+
+def destination_zone(destination):
+    """
+    Geohash de la celda de destino, la zona de la clave de caché.
+
+    Args:
+        destination: (lon, lat) o un objeto con `.x` / `.y`
+    """
+    lon, lat = (destination.x, destination.y) if hasattr(destination, 'x') else destination
+    return quote_cache.zone_geohash(lon, lat)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'SHIPPING_QUOTE_WORKERS', 8),
+                    thread_name_prefix='shipping-quote',
+                )
+    return _executor
+
+
+class QuoteAggregator:
+    """
+    Args:
+        providers: Objetos con `name` y `get_quote(weight, volume, destination)`
+            que devuelven un Quote (o None si no cubren el destino)
+        budget: Segundos máximos para juntar cotizaciones
+        cache_timeout: Segundos que se guarda cada cotización
+    """
+
+    def __init__(self, providers, budget=None, cache_timeout=None):
+        self.providers = list(providers)
+        self.budget = budget if budget is not None else getattr(settings, 'SHIPPING_QUOTE_BUDGET', 2.5)
+        self.cache_timeout = (
+            cache_timeout if cache_timeout is not None
+            else getattr(settings, 'SHIPPING_QUOTE_CACHE_TIMEOUT', 60 * 60)
+        )
+
+    def _deadline(self, provider):
+        return getattr(provider, 'timeout', None) or getattr(settings, 'SHIPPING_PROVIDER_TIMEOUT', 2.0)
+
+    def _cache_key(self, provider, zone, bracket):
+        return quote_cache.quote_key(provider.name, zone, bracket)
+
+    def get_quotes(self, weight, volume, destination):
+        """
+        Cotizaciones que llegaron a tiempo, de la más barata a la más cara.
+        """
+        zone = destination_zone(destination)
+        bracket = weight_bracket(weight)
+
+        quotes = []
+        to_fetch = []
+        for provider in self.providers:
+            cached = quote_cache.lookup(self._cache_key(provider, zone, bracket))
+            if cached is not None:
+                quotes.append(cached)
+            else:
+                to_fetch.append(provider)
+
+        center = quote_cache.geohash_center(zone)
+        quotes.extend(self._fetch(to_fetch, bracket, volume, center, zone))
+        return sorted(quotes, key=lambda quote: quote.cost)
+
+    def best_quote(self, weight, volume, destination):
+        quotes = self.get_quotes(weight, volume, destination)
+        return quotes[0] if quotes else None
+
+    def _fetch(self, providers, weight, volume, destination, zone):
+        if not providers:
+            return []
+
+        start = time.monotonic()
+        executor = _get_executor()
+        pending = {
+            executor.submit(provider.get_quote, weight, volume, destination): (
+                provider, start + min(self._deadline(provider), self.budget)
+            )
+            for provider in providers
+        }
+
+        quotes = []
+        while pending:
+            next_deadline = min(deadline for _, deadline in pending.values())
+            done, _ = wait(pending, timeout=max(0.0, next_deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+
+            for future in done:
+                provider, _ = pending.pop(future)
+                try:
+                    quote = future.result()
+                except Exception as e:
+                    logger.warning("Error cotizando con %s: %s", provider.name, e)
+                    continue
+                if quote is not None:
+                    quote_cache.store(self._cache_key(provider, zone, weight), quote, self.cache_timeout)
+                    quotes.append(quote)
+
+            now = time.monotonic()
+            for future, (provider, deadline) in list(pending.items()):
+                if deadline <= now:
+                    # No se espera más; si la respuesta llega después queda en
+                    # caché para la próxima consulta de la misma zona y rango
+                    del pending[future]
+                    if not future.cancel():
+                        future.add_done_callback(
+                            lambda f, p=provider: self._store_late(f, p, zone, weight)
+                        )
+                    logger.info("%s no respondió a tiempo", provider.name)
+
+        return quotes
+
+    def _store_late(self, future, provider, zone, weight):
+        try:
+            quote = future.result()
+        except Exception:
+            return
+        if quote is not None:
+            # Corre en un thread del pool: la caché compartida usa la base, y
+            # la conexión de este thread puede haber quedado vencida
+            close_old_connections()
+            quote_cache.store(self._cache_key(provider, zone, weight), quote, self.cache_timeout)
+
+
+def get_providers():
+    """Instancias de los proveedores configurados en SHIPPING_PROVIDERS."""
+    return [import_string(path)() for path in getattr(settings, 'SHIPPING_PROVIDERS', [])]
+
+
+def get_shipping_quotes(weight, volume, destination):
+    """Cotizaciones de los proveedores configurados para un paquete."""
+    return QuoteAggregator(get_providers()).get_quotes(weight, volume, destination)
@@ -0,0 +1,161 @@
+"""
+Conciliación de pagos pendientes contra MercadoPago.
+
+Cubre los webhooks que nunca llegaron: recorre los Payment pendientes que
+tienen orden, consulta en MercadoPago los pagos de esa orden (por
+`external_reference`) y aplica el resultado.
+
+El recorrido es por keyset (`pk > último`) en bloques de `chunk_size`. Por
+cada bloque las consultas a MercadoPago van en paralelo en un pool de
+threads acotado (solo red, los threads no tocan la base) y los cambios se
+escriben con unos pocos UPDATE por bloque. La aprobación usa la misma
+condición que el webhook (`status != approved`), así que correr esto a la
+vez que el worker no aprueba nada dos veces.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import cart
+from .models import Order, OrderItem, Payment
+
+logger = logging.getLogger(__name__)
+
+
+def pending_chunks(chunk_size=500, min_age=timedelta(minutes=10)):
+    """
+    Genera bloques de (payment_id, order_id, amount) de pagos que todavía
+    pueden aprobarse (`Payment.OPEN_STATUSES`).
+
+    Los pagos más nuevos que `min_age` se saltean: probablemente el usuario
+    todavía está pagando y el webhook no tuvo tiempo de llegar.
+    """
+    cutoff = timezone.now() - min_age
+    last_pk = 0
+    while True:
+        rows = list(
+            Payment.objects
+            .filter(status__in=Payment.OPEN_STATUSES, timestamp__lt=cutoff, order__isnull=False, pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'order__pk', 'amount')[:chunk_size]
+        )
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield rows
+
+
+def resolve_status(results):
+    """
+    Estado que corresponde a la orden según los pagos que devolvió la búsqueda.
+
+    Returns:
+        (status, amount) o (None, None) si no hay pagos
+    """
+    if not results:
+        return None, None
+    for result in results:
+        if result.get('status') == Payment.APPROVED:
+            return Payment.APPROVED, result.get('transaction_amount')
+    # La búsqueda viene ordenada del más nuevo al más viejo
+    return results[0].get('status') or Payment.PENDING, None
+
+
+def apply_results(resolved):
+    """
+    Escribe un bloque de resultados.
+
+    Args:
+        resolved: lista de (payment_pk, order_pk, status, amount)
+
+    Returns:
+        Cantidad de pagos aprobados por esta llamada
+    """
+    approved = {pk: amount for pk, _, status, amount in resolved if status == Payment.APPROVED}
+    others = {}
+    for pk, _, status, _ in resolved:
+        if status and status not in (Payment.APPROVED, Payment.PENDING):
+            others.setdefault(status[:20], []).append(pk)
+
+    with transaction.atomic():
+        for status, pks in others.items():
+            Payment.objects.filter(pk__in=pks).exclude(status=Payment.APPROVED).update(status=status)
+
+        if not approved:
+            return 0
+
+        # Bloquear y releer: solo se aprueban los que siguen sin aprobar
+        payments = list(
+            Payment.objects.select_for_update()
+            .filter(pk__in=approved).exclude(status=Payment.APPROVED)
+        )
+        for payment in payments:
+            payment.status = Payment.APPROVED
+            if approved[payment.pk] is not None:
+                payment.amount = approved[payment.pk]
+        Payment.objects.bulk_update(payments, ['status', 'amount'])
+
+        orders = list(
+            Order.objects
+            .filter(payment__in=payments, ordered=False)
+            .values_list('pk', 'user_id')
+        )
+        order_pks = [pk for pk, _ in orders]
+        Order.objects.filter(pk__in=order_pks).update(ordered=True, ordered_date=timezone.now())
+        OrderItem.objects.filter(order__in=order_pks).update(ordered=True)
+        for user_id in {user_id for _, user_id in orders}:
+            cart.invalidate_cart_item_count(user_id)
+
+    return len(payments)
+
+
+def reconcile_pending(client, chunk_size=500, workers=8, min_age=timedelta(minutes=10), on_chunk=None):
+    """
+    Concilia todos los pagos pendientes.
+
+    Args:
+        client: Objeto con `search_payments(external_reference)` (MercadoPagoService o un fake)
+        chunk_size: Pagos por bloque
+        workers: Consultas simultáneas a MercadoPago
+        min_age: Antigüedad mínima del pago para considerarlo
+        on_chunk: Callable opcional que recibe las estadísticas acumuladas después de cada bloque
+
+    Returns:
+        dict con scanned, approved, updated, not_found, errors y elapsed (segundos)
+    """
+    stats = {'scanned': 0, 'approved': 0, 'updated': 0, 'not_found': 0, 'errors': 0, 'elapsed': 0.0}
+    started = time.monotonic()
+
+    def lookup(row):
+        payment_pk, order_pk, _ = row
+        try:
+            return resolve_status(client.search_payments(str(order_pk)))
+        except Exception as e:
+            logger.warning("Error consultando la orden %s (pago %s): %s", order_pk, payment_pk, e)
+            return 'error', None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for rows in pending_chunks(chunk_size, min_age):
+            resolved = []
+            for (payment_pk, order_pk, _), (status, amount) in zip(rows, executor.map(lookup, rows)):
+                if status == 'error':
+                    stats['errors'] += 1
+                elif status is None:
+                    stats['not_found'] += 1
+                else:
+                    resolved.append((payment_pk, order_pk, status, amount))
+                    if status not in (Payment.APPROVED, Payment.PENDING):
+                        stats['updated'] += 1
+
+            stats['approved'] += apply_results(resolved)
+            stats['scanned'] += len(rows)
+            stats['elapsed'] = time.monotonic() - started
+            if on_chunk:
+                on_chunk(stats)
+
+    stats['elapsed'] = time.monotonic() - started
+    return stats
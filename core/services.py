@@ -1,13 +1,189 @@
+import random
+import threading
+import time
+
 import mercadopago
+import requests
 from django.conf import settings
 from django.urls import reverse
+from mercadopago.http.http_client import HttpClient
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+# Respuestas que vale la pena reintentar en un GET
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class MercadoPagoUnavailable(Exception):
+    """MercadoPago no responde o el circuito está abierto; conviene reintentar más tarde."""
+
+
+class CircuitBreaker:
+    """
+    Corta las llamadas después de `failure_threshold` fallas seguidas.
+
+    Con el circuito abierto las llamadas fallan al instante, sin ocupar el
+    worker esperando timeouts. Pasados `reset_timeout` segundos se deja pasar
+    una llamada de prueba: si funciona se cierra, si no vuelve a abrirse.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Una sola llamada de prueba; las demás siguen rechazadas hasta que termine
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+def _is_connect_error(exc):
+    """True si la conexión falló antes de enviar el request (seguro de reintentar siempre)."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    reason = exc.args[0] if exc.args else None
+    return isinstance(reason, MaxRetryError) and isinstance(reason.reason, NewConnectionError)
+
+
+class PooledHttpClient(HttpClient):
+    """
+    HttpClient del SDK que reutiliza una única `requests.Session`.
+
+    El cliente original arma una Session nueva por llamada, o sea un
+    handshake TLS cada vez. Acá las conexiones quedan abiertas (keep-alive)
+    en el pool del adapter, con timeouts de conexión y lectura explícitos.
+
+    Reintentos: los GET se reintentan ante errores de red o respuestas
+    429/5xx; los POST/PUT solo si la conexión no llegó a establecerse, para
+    no crear dos veces la misma preferencia. La espera entre intentos es
+    exponencial con jitter.
+    """
+
+    def __init__(self, connect_timeout=3.05, read_timeout=10.0, max_retries=2,
+                 backoff=0.3, pool_size=10, breaker=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        if not self.breaker.allow():
+            raise MercadoPagoUnavailable("MercadoPago no está disponible, intentá de nuevo en unos segundos.")
+
+        # El SDK manda su propio timeout (60s por defecto); se usa el nuestro
+        kwargs['timeout'] = self.timeout
+        idempotent = method.upper() in ('GET', 'DELETE')
+
+        attempt = 0
+        while True:
+            try:
+                api_result = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                if attempt < self.max_retries and (idempotent or _is_connect_error(e)):
+                    attempt += 1
+                    self._sleep(attempt)
+                    continue
+                self.breaker.record_failure()
+                raise MercadoPagoUnavailable(f"Error de conexión con MercadoPago: {e}") from e
+
+            if api_result.status_code in RETRY_STATUSES:
+                if idempotent and attempt < self.max_retries:
+                    attempt += 1
+                    self._sleep(attempt)
+                    continue
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            return self._to_response(api_result)
+
+    def _sleep(self, attempt):
+        time.sleep(random.uniform(0, self.backoff * (2 ** (attempt - 1))))
+
+    @staticmethod
+    def _to_response(api_result):
+        # Mismo formato que devuelve HttpClient.request
+        response = {"status": api_result.status_code, "response": None}
+        if api_result.status_code != 204 and api_result.content:
+            try:
+                response["response"] = api_result.json()
+            except ValueError:
+                response["response"] = None
+        return response
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_mercadopago_service():
+    """
+    Instancia de MercadoPagoService compartida por todo el proceso.
+
+    Se crea en la primera llamada; desde ahí las vistas y el worker usan la
+    misma Session (y sus conexiones abiertas) y el mismo circuit breaker.
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = MercadoPagoService(http_client=_build_http_client())
+    return _service
+
+
+def reset_mercadopago_service():
+    """Descarta la instancia compartida (tests o cambio de credenciales)."""
+    global _service
+    with _service_lock:
+        _service = None
+
+
+def _build_http_client():
+    return PooledHttpClient(
+        connect_timeout=getattr(settings, 'MERCADOPAGO_CONNECT_TIMEOUT', 3.05),
+        read_timeout=getattr(settings, 'MERCADOPAGO_READ_TIMEOUT', 10.0),
+        max_retries=getattr(settings, 'MERCADOPAGO_MAX_RETRIES', 2),
+        backoff=getattr(settings, 'MERCADOPAGO_RETRY_BACKOFF', 0.3),
+        pool_size=getattr(settings, 'MERCADOPAGO_POOL_SIZE', 10),
+        breaker=CircuitBreaker(
+            failure_threshold=getattr(settings, 'MERCADOPAGO_CIRCUIT_FAILURES', 5),
+            reset_timeout=getattr(settings, 'MERCADOPAGO_CIRCUIT_RESET', 30.0),
+        ),
+    )
+
 
 class MercadoPagoService:
-    def __init__(self):
+    def __init__(self, http_client=None):
         self.access_token = getattr(settings, 'MERCADOPAGO_ACCESS_TOKEN', None)
         if not self.access_token:
             raise ValueError("MERCADOPAGO_ACCESS_TOKEN no está configurado en settings.")
-        self.sdk = mercadopago.SDK(self.access_token)
+        self.sdk = mercadopago.SDK(self.access_token, http_client=http_client)
         self.sandbox = bool(getattr(settings, 'MERCADOPAGO_SANDBOX', False))
         self.site_url = getattr(settings, "SITE_URL", "http://127.0.0.1:8000")
 
@@ -46,8 +222,12 @@ class MercadoPagoService:
             "items": items,
             "payer": {"email": payer_email},
             "back_urls": back_urls,
+            # Permite encontrar la orden desde la notificación del pago
+            "external_reference": str(order.pk),
             # "auto_return": "approved",  # Deshabilitado temporalmente para depuración
         }
+        if order.shipping_cost:
+            preference_data["shipments"] = {"mode": "not_specified", "cost": float(order.shipping_cost)}
 
         preference_response = self.sdk.preference().create(preference_data)
         response = preference_response.get("response")
@@ -74,3 +254,14 @@ class MercadoPagoService:
         """
         payment_response = self.sdk.payment().get(payment_id)
         return payment_response.get("response", {})
+
+    def search_payments(self, external_reference):
+        """
+        Pagos asociados a una orden (por `external_reference`), del más nuevo al más viejo.
+        """
+        search_response = self.sdk.payment().search({
+            "external_reference": external_reference,
+            "sort": "date_created",
+            "criteria": "desc",
+        })
+        return (search_response.get("response") or {}).get("results", [])
@@ -1,21 +1,87 @@
-from django.contrib.gis.geos import Point
-from django.contrib.gis.measure import D
-from django.conf import settings
+from typing import NamedTuple
 
-# Ubicación del depósito central (Ejemplo: Obelisco, Buenos Aires)
-WAREHOUSE_LOCATION = Point(-58.3816, -34.6037)
+
+class Coordinate(NamedTuple):
+    """
+    Punto lon/lat en grados, con la misma interfaz `.x` / `.y` que un Point de GEOS.
+
+    Para calcular envíos no hace falta GEOS/GDAL; solo se cargan si se pasa
+    una geometría de verdad (ver `as_coordinate` y `to_point`). NumPy y el
+    índice de depósitos se importan recién en las funciones que los usan, así
+    importar el módulo (por ejemplo para los proveedores de SHIPPING_PROVIDERS)
+    no los carga.
+    """
+    x: float  # longitud
+    y: float  # latitud
+
+    @property
+    def lon(self):
+        return self.x
+
+    @property
+    def lat(self):
+        return self.y
+
+
+def as_coordinate(location):
+    """
+    Convierte una ubicación en Coordinate.
+
+    Acepta un Coordinate, cualquier objeto con `.x` / `.y` (incluido un Point
+    de GEOS), un par (lon, lat) o un texto WKT/EWKT/GeoJSON. Solo este último
+    caso importa GEOS.
+    """
+    if location is None or isinstance(location, Coordinate):
+        return location
+    if hasattr(location, 'x') and hasattr(location, 'y'):
+        return Coordinate(float(location.x), float(location.y))
+    if isinstance(location, str):
+        from django.contrib.gis.geos import GEOSGeometry
+
+        geometry = GEOSGeometry(location)
+        return Coordinate(geometry.x, geometry.y)
+    lon, lat = location
+    return Coordinate(float(lon), float(lat))
+
+
+def to_point(location, srid=4326):
+    """Point de GEOS para una ubicación; importa GEOS recién acá."""
+    from django.contrib.gis.geos import Point
+
+    coordinate = as_coordinate(location)
+    return Point(coordinate.x, coordinate.y, srid=srid)
+
+
+# Ubicación del depósito central (Ejemplo: Obelisco, Buenos Aires). Los
+# depósitos que se usan para cotizar están en settings.WAREHOUSES.
+WAREHOUSE_LOCATION = Coordinate(-58.3816, -34.6037)
+
+EARTH_RADIUS_KM = 6371
+BASE_COST = 500  # Costo base
+COST_PER_KM = 50  # Costo por km
 
 from math import radians, cos, sin, asin, sqrt
 
+def nearest_warehouse(user_location):
+    """Depósito más cercano al usuario según el índice de core.warehouses."""
+    from . import warehouses
+
+    user_location = as_coordinate(user_location)
+    warehouse, _ = warehouses.get_index().nearest(user_location.x, user_location.y)
+    return warehouse
+
+
 def calculate_distance(user_location):
     """
-    Calcula la distancia en km desde el depósito hasta el usuario usando Haversine.
+    Calcula la distancia en km desde el depósito más cercano hasta el usuario usando Haversine.
     """
     if not user_location:
         return None
+    user_location = as_coordinate(user_location)
     
     # Coordenadas del depósito
-    lon1, lat1 = WAREHOUSE_LOCATION.x, WAREHOUSE_LOCATION.y
+    warehouse = nearest_warehouse(user_location)
+    lon1, lat1 = warehouse.lon, warehouse.lat
     # Coordenadas del usuario
     lon2, lat2 = user_location.x, user_location.y
     
@@ -27,7 +93,7 @@ def calculate_distance(user_location):
     dlat = lat2 - lat1 
     a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
     c = 2 * asin(sqrt(a)) 
-    r = 6371 # Radio de la Tierra en km
+    r = EARTH_RADIUS_KM # Radio de la Tierra en km
     
     return round(c * r, 2) 
 
@@ -39,25 +105,137 @@ def calculate_shipping_cost(distance_km):
     if distance_km is None:
         return 0
     
-    base_cost = 500  # Costo base
-    cost_per_km = 50 # Costo por km
-    
-    total = base_cost + (distance_km * cost_per_km)
+    total = BASE_COST + (distance_km * COST_PER_KM)
     return round(total, 2)
 
+
+# =========================
+# VERSIONES VECTORIZADAS
+# =========================
+# Mismas fórmulas que las funciones de arriba pero sobre arrays de NumPy, para
+# cotizar muchas direcciones de una vez (reportes, re-cotizar órdenes, mapas
+# de zonas) sin un loop de Python por dirección.
+
+def _as_coords(coords):
+    """Convierte una lista de (lon, lat), Coordinates o Points en un array (N, 2) de float."""
+    import numpy as np
+
+    if len(coords) and hasattr(coords[0], 'x'):
+        coords = [(c.x, c.y) for c in coords]
+    array = np.asarray(coords, dtype=float)
+    return array.reshape(-1, 2)
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """
+    Distancia Haversine en km entre arrays de coordenadas (en grados).
+
+    Los argumentos siguen las reglas de broadcasting de NumPy: con
+    `lon1[:, None]` contra `lon2[None, :]` se obtiene la matriz completa.
+    """
+    import numpy as np
+
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    # El clip evita NaN cuando el redondeo deja `a` apenas por encima de 1
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bulk_distances(user_coords, depots=None):
+    """
+    Distancias en km desde uno o varios depósitos a N direcciones.
+
+    Args:
+        user_coords: Secuencia de (lon, lat) o de Points, o array (N, 2)
+        depots: Secuencia o array (M, 2) de depósitos; por defecto el depósito
+            registrado más cercano a cada dirección, como `calculate_distance`
+
+    Returns:
+        Array (N,) si no se pasan depósitos, o (N, M) con la distancia a cada uno,
+        redondeado a 2 decimales como `calculate_distance`.
+    """
+    import numpy as np
+
+    users = _as_coords(user_coords)
+    if depots is None:
+        distances, _ = _nearest_warehouse_distances(users)
+        return distances
+    depots = _as_coords(depots)
+    distances = haversine_km(depots[None, :, 0], depots[None, :, 1], users[:, 0, None], users[:, 1, None])
+    return np.round(distances, 2)
+
+
+def _nearest_warehouse_distances(users):
+    """(distancias, índice del depósito) al depósito registrado más cercano a cada fila de `users`."""
+    import numpy as np
+
+    from . import warehouses
+
+    index = warehouses.get_index()
+    nearest, _ = index.nearest_many(users[:, 0], users[:, 1])
+    distances = np.round(
+        haversine_km(index.lons[nearest], index.lats[nearest], users[:, 0], users[:, 1]), 2
+    )
+    return distances, nearest
+
+
+def bulk_shipping_costs(distances_km):
+    """
+    Costo de envío para un array de distancias; NaN (sin ubicación) cuesta 0.
+    """
+    import numpy as np
+
+    distances = np.asarray(distances_km, dtype=float)
+    costs = np.round(BASE_COST + distances * COST_PER_KM, 2)
+    return np.where(np.isnan(distances), 0.0, costs)
+
+
+def bulk_quote(user_coords, depots=None):
+    """
+    Cotiza N direcciones de una vez desde el depósito más cercano a cada una.
+
+    Sin `depots` se usan los depósitos registrados y el índice espacial de
+    core.warehouses (O(N log M)); con `depots` se calcula la matriz completa.
+
+    Returns:
+        (distancias, costos, índice del depósito elegido), cada uno un array (N,)
+    """
+    import numpy as np
+
+    if depots is None:
+        distances, nearest = _nearest_warehouse_distances(_as_coords(user_coords))
+    else:
+        matrix = bulk_distances(user_coords, depots)
+        nearest = matrix.argmin(axis=1)
+        distances = matrix[np.arange(len(matrix)), nearest]
+    return distances, bulk_shipping_costs(distances), nearest
+
+
 class ShippingProvider:
     """
     Clase base para proveedores de envío (Andreani, Correo Argentino, OCA)
+
+    `get_quote` devuelve un core.quotes.Quote, o None si el proveedor no
+    cubre el destino. Se llama desde los threads de QuoteAggregator, así que
+    no debe tocar la base y conviene que sus requests HTTP usen un timeout
+    no mayor a `timeout`.
     """
+    name = None
+    timeout = None  # Plazo propio en segundos; None usa SHIPPING_PROVIDER_TIMEOUT
+
     def get_quote(self, weight, volume, destination):
         raise NotImplementedError
 
 class AndreaniProvider(ShippingProvider):
+    name = 'andreani'
+
     def get_quote(self, weight, volume, destination):
         # Implementar API de Andreani
         pass
 
 class CorreoArgentinoProvider(ShippingProvider):
+    name = 'correo_argentino'
+
     def get_quote(self, weight, volume, destination):
         # Implementar API de Correo Argentino
         pass
@@ -0,0 +1,142 @@
+"""
+Sincronización incremental del catálogo para la app móvil.
+
+El token es un instante firmado. Las consultas usan `updated_at` de Item y
+`deleted_at` de ItemTombstone, ambos indexados. `updated_at` cambia con
+save(), con `Item.objects.update()` (ItemQuerySet) y cuando se borra la
+etiqueta de un producto (signal en core.models).
+
+El token se emite con `SYNC_OVERLAP` de margen hacia atrás: una transacción
+que todavía no commiteó cuando se armó la respuesta puede tener un
+`updated_at` anterior al token. El margen hace que esos cambios vuelvan a
+aparecer en el próximo delta; el cliente aplica los cambios por id, así que
+recibir un item dos veces no tiene efecto.
+
+Un delta trae como máximo SYNC_PAGE_SIZE productos. Si hay más, la
+respuesta tiene `more: true` y un token de continuación: (updated_at, id)
+del último producto enviado más el límite superior fijado en la primera
+página, así las páginas siguientes no se corren si el catálogo cambia en el
+medio. Las bajas se guardan SYNC_TOMBSTONE_RETENTION_DAYS días
+(`prune_sync_tombstones`); un token más viejo que eso ya no es válido y el
+cliente tiene que volver a bajar el catálogo completo.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Item, ItemTombstone
+
+TOKEN_SALT = 'core.sync.catalog'
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class InvalidSyncToken(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class SyncCursor:
+    """
+    Posición de un cliente en el historial del catálogo.
+
+    Args:
+        since: Se envían los cambios posteriores a este instante...
+        after_id: ...o en el mismo instante, con id mayor (continuación)
+        until: Límite superior fijado en la primera página de un delta
+    """
+    since: datetime
+    after_id: int = 0
+    until: datetime = None
+
+
+def _micros(moment):
+    return int(moment.timestamp() * 1_000_000)
+
+
+def _moment(micros):
+    return datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def make_token(moment, after_id=0, until=None):
+    if until is None:
+        return signing.dumps(_micros(moment), salt=TOKEN_SALT)
+    return signing.dumps([_micros(moment), after_id, _micros(until)], salt=TOKEN_SALT)
+
+
+def parse_token(token):
+    """
+    SyncCursor de un token.
+
+    Raises:
+        InvalidSyncToken: si la firma no es válida o el token es más viejo
+            que la retención de las bajas
+    """
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+        if isinstance(payload, list):
+            micros, after_id, until = payload
+            cursor = SyncCursor(_moment(micros), int(after_id), _moment(until))
+        else:
+            cursor = SyncCursor(_moment(payload))
+    except (signing.BadSignature, TypeError, ValueError, OverflowError):
+        raise InvalidSyncToken(token)
+
+    if cursor.since < timezone.now() - tombstone_retention():
+        raise InvalidSyncToken(token)
+    return cursor
+
+
+def current_token():
+    """Token para el estado actual; se pide antes de leer el catálogo."""
+    return make_token(timezone.now() - SYNC_OVERLAP)
+
+
+def get_changes(cursor, limit=None):
+    """
+    Una página de cambios del catálogo posteriores a `cursor`.
+
+    Returns:
+        (lista de Items creados o modificados, lista de ids borrados,
+        token para el próximo pedido, True si quedan más cambios)
+    """
+    limit = limit or getattr(settings, 'SYNC_PAGE_SIZE', 500)
+    until = cursor.until or timezone.now() - SYNC_OVERLAP
+
+    changed = list(
+        Item.objects
+        .filter(Q(updated_at__gt=cursor.since) | Q(updated_at=cursor.since, id__gt=cursor.after_id))
+        .filter(updated_at__lte=until)
+        .order_by('updated_at', 'id')[:limit + 1]
+    )
+    more = len(changed) > limit
+    if more:
+        changed = changed[:limit]
+        last = changed[-1]
+        upper = last.updated_at
+        token = make_token(last.updated_at, last.pk, until)
+    else:
+        upper = until
+        token = make_token(until)
+
+    # Las bajas del mismo tramo de tiempo que los productos enviados
+    deleted = list(
+        ItemTombstone.objects
+        .filter(deleted_at__gt=cursor.since, deleted_at__lte=upper)
+        .values_list('item_id', flat=True)
+        .distinct()
+    )
+    return changed, deleted, token, more
+
+
+def prune_tombstones():
+    """Borra las bajas más viejas que la retención; devuelve cuántas borró."""
+    deleted, _ = ItemTombstone.objects.filter(deleted_at__lt=timezone.now() - tombstone_retention()).delete()
+    return deleted
@@ -1,3 +1,1098 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import CacheHandler, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.template import RequestContext, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core import cart, catalog_cache, checkout, quote_cache, reconciliation, shipping, sync, warehouses, webhooks, zones
+from core.fakes import FakeMercadoPagoClient, FakeShippingProvider
+from core.models import Category, Item, ItemTombstone, Label, Order, OrderItem, Payment, ShippingZone, UserProfile, WebhookNotification
+from core.quotes import QuoteAggregator, weight_bracket
+from core.services import CircuitBreaker, MercadoPagoUnavailable, PooledHttpClient
+
+User = get_user_model()
+
+
+class OrderSummaryAPITests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cliente', 'cliente@test.com', 'clave')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _fill_cart(self, lines):
+        start = Item.objects.count()
+        for i in range(start, start + lines):
+            item = Item.objects.create(
+                title=f'Producto {i}',
+                slug=f'producto-{i}',
+                price=100,
+                discount_price=80 if i % 2 else None,
+                image='products/foto.jpg',
+            )
+            cart.add_item(self.user, item.slug)
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/order-summary/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_query_count_does_not_grow_with_cart_lines(self):
+        self._fill_cart(1)
+        one_line_queries, data = self._count_queries()
+        self.assertEqual(len(data['order_items']), 1)
+
+        self._fill_cart(49)
+        many_lines_queries, data = self._count_queries()
+        self.assertEqual(len(data['order_items']), 50)
+
+        self.assertEqual(one_line_queries, many_lines_queries)
+
+    def test_totals_match_line_prices(self):
+        self._fill_cart(3)
+        cart.add_item(self.user, 'producto-1')
+
+        _, data = self._count_queries()
+        line_totals = {line['item']['slug']: line['final_price'] for line in data['order_items']}
+        self.assertEqual(line_totals, {'producto-0': 100, 'producto-1': 160, 'producto-2': 100})
+        self.assertEqual(data['total'], 360)
+
+
+class ItemListAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def _item(self, slug, price, discount_price=None, **fields):
+        return Item.objects.create(
+            title=slug, slug=slug, price=price, discount_price=discount_price,
+            image='products/foto.jpg', **fields
+        )
+
+    def _slugs(self, **params):
+        response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return [item['slug'] for item in response.json()['results']]
+
+    def test_zero_discount_is_not_a_discount(self):
+        self._item('sin-descuento', 100)
+        self._item('descuento-cero', 100, discount_price=0)
+        self._item('con-descuento', 100, discount_price=40)
+
+        self.assertEqual(self._slugs(max_price=50), ['con-descuento'])
+        self.assertEqual(self._slugs(min_price=90), ['sin-descuento', 'descuento-cero'])
+        self.assertEqual(self._slugs(on_discount='true'), ['con-descuento'])
+
+    def test_next_cursor_is_stable_under_inserts(self):
+        for i in range(5):
+            self._item(f'producto-{i}', 100)
+
+        first = self.client.get('/api/products/', {'page_size': 2}).json()
+        self.assertEqual([item['slug'] for item in first['results']], ['producto-0', 'producto-1'])
+
+        # Un alta mientras el cliente pagina no repite ni saltea productos
+        self._item('nuevo', 100)
+        seen = [item['slug'] for item in first['results']]
+        cursor = first['next_cursor']
+        while cursor:
+            page = self.client.get('/api/products/', {'page_size': 2, 'cursor': cursor}).json()
+            seen += [item['slug'] for item in page['results']]
+            cursor = page['next_cursor']
+
+        self.assertEqual(seen, [f'producto-{i}' for i in range(5)] + ['nuevo'])
+
+    def test_filters(self):
+        remeras = Category.objects.create(title='Remeras', slug='remeras')
+        guantes = Category.objects.create(title='Guantes', slug='guantes')
+        oferta = Label.objects.create(title='Oferta', css_class='danger')
+        self._item('remera', 100, category=remeras, label=oferta)
+        self._item('guante', 300, discount_price=250, category=guantes)
+        self._item('vendas', 50, category=guantes)
+
+        self.assertEqual(self._slugs(category='guantes'), ['guante', 'vendas'])
+        self.assertEqual(self._slugs(label=oferta.pk), ['remera'])
+        self.assertEqual(self._slugs(min_price=100), ['remera', 'guante'])
+        self.assertEqual(self._slugs(max_price=100), ['remera', 'vendas'])
+        self.assertEqual(self._slugs(min_price=60, max_price=260), ['remera', 'guante'])
+        self.assertEqual(self._slugs(on_discount='true'), ['guante'])
+        self.assertEqual(self._slugs(category='guantes', on_discount='true'), ['guante'])
+        self.assertEqual(self.client.get('/api/products/', {'label': 'x'}).status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.label = Label.objects.create(title='Oferta', css_class='danger')
+        self.item = Item.objects.create(
+            title='Guantes', slug='guantes', price=100, label=self.label, image='products/foto.jpg'
+        )
+        Item.objects.create(title='Vendas', slug='vendas', price=50, image='products/foto.jpg')
+
+    def _edit(self, write):
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+
+    def test_list_page_is_revalidated_without_scanning_the_catalog(self):
+        first = self.client.get('/api/products/', {'page_size': 1})
+        self.assertEqual(first.status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get('/api/products/', {'page_size': 1}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertFalse([q for q in queries if 'core_item' in q['sql']])
+
+        self._edit(lambda: Item.objects.filter(slug='guantes').update(price=90))
+        changed = self.client.get('/api/products/', {'page_size': 1}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['results'][0]['price'], 90)
+
+    def test_detail_etag_and_last_modified(self):
+        first = self.client.get('/api/products/guantes/')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+
+        cached = self.client.get(
+            '/api/products/guantes/',
+            HTTP_IF_NONE_MATCH=first['ETag'], HTTP_IF_MODIFIED_SINCE=first['Last-Modified'],
+        )
+        self.assertEqual(cached.status_code, 304)
+
+        self._edit(lambda: Item.objects.filter(slug='guantes').update(title='Guantes de box'))
+        edited = self.client.get('/api/products/guantes/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(edited.status_code, 200)
+        self.assertEqual(edited.json()['title'], 'Guantes de box')
+
+    def test_deleting_a_label_changes_its_items(self):
+        detail = self.client.get('/api/products/guantes/')
+        listing = self.client.get('/api/products/')
+        before = Item.objects.get(slug='guantes').updated_at
+
+        self._edit(self.label.delete)
+
+        self.assertGreater(Item.objects.get(slug='guantes').updated_at, before)
+        response = self.client.get('/api/products/guantes/', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['label'])
+        self.assertEqual(
+            self.client.get('/api/products/', HTTP_IF_NONE_MATCH=listing['ETag']).status_code, 200
+        )
+
+
+class CatalogSyncTests(TestCase):
+    def setUp(self):
+        # Sin margen, para que los cambios recién hechos entren en el delta
+        patcher = mock.patch.object(sync, 'SYNC_OVERLAP', timedelta(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def _item(self, slug, **fields):
+        return Item.objects.create(title=slug, slug=slug, price=100, image='products/foto.jpg', **fields)
+
+    def _changes(self, token):
+        response = self.client.get('/api/products/changes/', {'since': token})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_tokens_are_signed_and_expire(self):
+        moment = timezone.now() - timedelta(days=1)
+        self.assertEqual(sync.parse_token(sync.make_token(moment)).since, moment)
+
+        token = sync.make_token(moment)
+        old = sync.make_token(timezone.now() - timedelta(days=31))
+        for invalid in (token[:-2] + 'xx', old, 'basura'):
+            with self.assertRaises(sync.InvalidSyncToken):
+                sync.parse_token(invalid)
+            response = self.client.get('/api/products/changes/', {'since': invalid})
+            self.assertEqual(response.status_code, 400)
+
+    def test_deletes_leave_tombstones(self):
+        item = self._item('guantes')
+        token = sync.current_token()
+        item_id = item.pk
+
+        item.delete()
+
+        self.assertTrue(ItemTombstone.objects.filter(item_id=item_id, slug='guantes').exists())
+        data = self._changes(token)
+        self.assertEqual((data['changed'], data['deleted'], data['more']), ([], [item_id], False))
+        self.assertEqual(self._changes(data['token'])['deleted'], [])
+
+    def test_label_deletes_and_bulk_updates_are_changes(self):
+        label = Label.objects.create(title='Oferta', css_class='danger')
+        self._item('guantes', label=label)
+        self._item('vendas')
+        token = sync.current_token()
+
+        label.delete()
+        data = self._changes(token)
+        self.assertEqual([(p['slug'], p['label']) for p in data['changed']], [('guantes', None)])
+
+        Item.objects.filter(slug='vendas').update(price=80)
+        data = self._changes(data['token'])
+        self.assertEqual([(p['slug'], p['price']) for p in data['changed']], [('vendas', 80)])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_large_deltas_are_paginated(self):
+        token = sync.current_token()
+        for i in range(5):
+            self._item(f'producto-{i}')
+        removed = Item.objects.get(slug='producto-0')
+        removed_id = removed.pk
+        removed.delete()
+
+        pages = []
+        while True:
+            data = self._changes(token)
+            pages.append(data)
+            token = data['token']
+            if not data['more']:
+                break
+
+        self.assertEqual([len(page['changed']) for page in pages], [2, 2])
+        self.assertEqual(
+            sorted(p['slug'] for page in pages for p in page['changed']),
+            [f'producto-{i}' for i in range(1, 5)],
+        )
+        self.assertEqual([i for page in pages for i in page['deleted']], [removed_id])
+        # Un alta durante la paginación llega en el próximo delta
+        self._item('nuevo')
+        self.assertEqual([p['slug'] for p in self._changes(token)['changed']], ['nuevo'])
+
+    def test_old_tombstones_are_pruned(self):
+        for slug in ('viejo', 'nuevo'):
+            self._item(slug).delete()
+        ItemTombstone.objects.filter(slug='viejo').update(deleted_at=timezone.now() - timedelta(days=40))
+
+        call_command('prune_sync_tombstones', stdout=open(os.devnull, 'w'))
+
+        self.assertEqual(list(ItemTombstone.objects.values_list('slug', flat=True)), ['nuevo'])
+
+
+# La caché del catálogo en memoria, así solo se cuentan las consultas del catálogo
+@override_settings(CATALOG_CACHE_ALIAS='default')
+class HomeViewQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        remeras = Category.objects.create(title='Remeras', slug='remeras')
+        guantes = Category.objects.create(title='Guantes', slug='guantes')
+        oferta = Label.objects.create(title='Oferta', css_class='danger')
+        for i in range(3):
+            Item.objects.create(title=f'Remera {i}', slug=f'remera-{i}', price=100, category=remeras,
+                                label=oferta, description='larga', image='products/foto.jpg')
+            Item.objects.create(title=f'Guante {i}', slug=f'guante-{i}', price=200, category=guantes,
+                                image='products/foto.jpg')
+
+    def _get(self, queries, **params):
+        with self.assertNumQueries(queries) as captured:
+            response = self.client.get('/', params)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in captured.captured_queries]
+
+    def _assert_projection(self, statements):
+        # COUNT del paginador, la página con categoría y etiqueta en el mismo SELECT, y las categorías
+        items = [sql for sql in statements if 'core_item' in sql and 'COUNT' not in sql]
+        self.assertEqual(len(items), 1)
+        self.assertIn('core_category', items[0])
+        self.assertIn('core_label', items[0])
+        self.assertNotIn('description', items[0])
+
+    def test_cold_and_warm(self):
+        self._assert_projection(self._get(3))
+        self._get(0)
+
+    def test_cold_and_warm_by_category(self):
+        statements = self._get(3, category='guantes')
+        self._assert_projection(statements)
+        self.assertIn('core_category', next(sql for sql in statements if 'COUNT' in sql))
+        self._get(0, category='guantes')
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        catalog_cache.reset_stats()
+        self.calls = 0
+
+    def _producer(self):
+        self.calls += 1
+        return self.calls
+
+    def test_hits_and_misses_are_recorded(self):
+        self.assertEqual(catalog_cache.cached('items', 'a', self._producer), 1)
+        self.assertEqual(catalog_cache.cached('items', 'a', self._producer), 1)
+        catalog_cache.cached('items', 'b', self._producer)
+
+        stats = catalog_cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 2, 0.3333))
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser('admin', 'admin@test.com', 'clave'))
+        self.assertEqual(client.get('/api/catalog/cache-stats/').json()['misses'], 2)
+
+    def test_writes_invalidate_after_commit(self):
+        catalog_cache.cached('items', 'a', self._producer)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item = Item.objects.create(title='Producto', slug='producto', price=100, image='products/foto.jpg')
+        self.assertEqual(catalog_cache.cached('items', 'a', self._producer), 2)
+
+        for write in (
+            lambda: Category.objects.create(title='Guantes', slug='guantes'),
+            lambda: Label.objects.create(title='Oferta', css_class='danger'),
+            item.delete,
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            before = self.calls
+            catalog_cache.cached('items', 'a', self._producer)
+            self.assertEqual(self.calls, before + 1)
+
+    def test_version_is_shared_between_workers(self):
+        self.assertNotIsInstance(caches[settings.CATALOG_CACHE_ALIAS], LocMemCache)
+        version = catalog_cache.bump_catalog_version()
+
+        # Otro proceso arma sus propias conexiones de caché
+        other_worker = CacheHandler()[settings.CATALOG_CACHE_ALIAS]
+        self.assertEqual(other_worker.get(catalog_cache.VERSION_KEY), version)
+
+
+class CartServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cliente', 'cliente@test.com', 'clave')
+        Item.objects.create(title='Guantes', slug='guantes', price=100, image='products/foto.jpg')
+        Item.objects.create(title='Vendas', slug='vendas', price=50, image='products/foto.jpg')
+
+    def _statements(self, slug):
+        """Consultas de add_item sin los SAVEPOINT del atomic externo del TestCase."""
+        with CaptureQueriesContext(connection) as queries:
+            result = cart.add_item(self.user, slug)
+        sql = [q['sql'] for q in queries.captured_queries]
+        # El primer SAVEPOINT y el último RELEASE son los de @transaction.atomic,
+        # que en producción es la transacción de nivel superior
+        return result, sql[1:-1]
+
+    def test_increment_is_a_single_query(self):
+        cart.add_item(self.user, 'guantes')
+        result, statements = self._statements('guantes')
+        self.assertEqual(result, cart.INCREMENTED)
+        self.assertEqual(len(statements), 1)
+
+    def test_new_line_in_existing_cart(self):
+        cart.add_item(self.user, 'guantes')
+        result, statements = self._statements('vendas')
+        self.assertEqual(result, cart.ADDED)
+        # Upsert de la línea (trae el id del carrito) e INSERT de la relación con la orden
+        self.assertEqual(len(statements), 2)
+
+    def test_unknown_item(self):
+        with self.assertRaises(Item.DoesNotExist):
+            cart.add_item(self.user, 'no-existe')
+        self.assertIsNone(cart.get_active_order(self.user))
+
+    def test_paid_lines_are_not_reused(self):
+        cart.add_item(self.user, 'guantes')
+        order = cart.get_active_order(self.user)
+        # Compra vieja: orden pagada con la línea todavía en ordered=False
+        Order.objects.filter(pk=order.pk).update(ordered=True)
+
+        self.assertEqual(cart.add_item(self.user, 'guantes'), cart.ADDED)
+        self.assertEqual(Order.objects.get(pk=order.pk).items.get().quantity, 1)
+        self.assertEqual(cart.get_active_order(self.user).items.get().quantity, 1)
+
+    def test_line_created_by_a_concurrent_request_is_incremented(self):
+        cart.add_item(self.user, 'guantes')
+        # La línea la creó otro request cuya relación con la orden el upsert
+        # todavía no veía, así que no la incrementó
+        original = cart._upsert_line
+        missed = [None]
+        with mock.patch.object(cart, '_upsert_line',
+                               side_effect=lambda user, slug: missed.pop() if missed else original(user, slug)):
+            self.assertEqual(cart.add_item(self.user, 'guantes'), cart.INCREMENTED)
+
+        order = cart.get_active_order(self.user)
+        self.assertEqual([line.quantity for line in order.items.all()], [2])
+
+
+class ConcurrentAddToCartTests(TransactionTestCase):
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_simultaneous_adds_keep_one_line(self):
+        user = User.objects.create_user('cliente', 'cliente@test.com', 'clave')
+        Item.objects.create(title='Guantes', slug='guantes', price=100, image='products/foto.jpg')
+        barrier = threading.Barrier(2)
+
+        def add():
+            barrier.wait()
+            try:
+                cart.add_item(user, 'guantes')
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=add) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        order = cart.get_active_order(user)
+        self.assertEqual([line.quantity for line in order.items.all()], [2])
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cliente', 'cliente@test.com', 'clave')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for slug in ('guantes', 'vendas', 'bucal'):
+            Item.objects.create(title=slug, slug=slug, price=100, image='products/foto.jpg')
+        cart.add_item(self.user, 'guantes')
+        cart.add_item(self.user, 'vendas')
+
+    def test_batch_applies_all_changes_and_returns_totals(self):
+        response = self.client.post('/api/cart/batch/', {'items': [
+            {'slug': 'guantes', 'delta': 1},
+            {'slug': 'guantes', 'delta': 2},
+            {'slug': 'vendas', 'delta': -1},
+            {'slug': 'bucal', 'delta': 2},
+            {'slug': 'no-existe', 'delta': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual(data['results'], {
+            'guantes': cart.INCREMENTED,
+            'vendas': cart.REMOVED,
+            'bucal': cart.ADDED,
+            'no-existe': cart.UNKNOWN_ITEM,
+        })
+        quantities = {line['item']['slug']: line['quantity'] for line in data['order_items']}
+        self.assertEqual(quantities, {'guantes': 4, 'bucal': 2})
+        self.assertEqual(data['total'], 600)
+        self.assertEqual(cart.get_cart_item_count(self.user), 2)
+
+    def test_invalid_batch_is_rejected(self):
+        response = self.client.post('/api/cart/batch/', {'items': [{'slug': 'guantes'}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CartCountContextProcessorTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cliente', 'cliente@test.com', 'clave')
+        Item.objects.create(title='Guantes', slug='guantes', price=100, image='products/foto.jpg')
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def _render(self, source):
+        return Template(source).render(RequestContext(self.request))
+
+    def test_no_query_when_template_does_not_use_the_count(self):
+        with self.assertNumQueries(0):
+            self._render('hola')
+
+    def test_count_is_shared_and_invalidated_on_add(self):
+        self.assertEqual(self._render('{{ cart_item_count }}'), '0')
+        key = cart._cart_count_key(self.user.pk)
+        self.assertEqual(caches[settings.CART_COUNT_CACHE_ALIAS].get(key), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cart.add_item(self.user, 'guantes')
+
+        # Cualquier worker lee la misma entrada, que ya no está
+        self.assertIsNone(caches[settings.CART_COUNT_CACHE_ALIAS].get(key))
+        self.assertEqual(self._render('{{ cart_item_count }}'), '1')
+
+
+class MergeDuplicateCartsMigrationTests(TransactionTestCase):
+    before = [('core', '0015_itemtombstone')]
+    after = [('core', '0017_active_cart_constraints')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self._migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_paid_lines_are_not_merged_into_the_cart(self):
+        apps = self._migrate(self.before)
+        User = apps.get_model('auth', 'User')
+        Item = apps.get_model('core', 'Item')
+        Order = apps.get_model('core', 'Order')
+        OrderItem = apps.get_model('core', 'OrderItem')
+
+        user = User.objects.create(username='cliente')
+        item = Item.objects.create(title='Guantes', slug='guantes', price=100, image='products/foto.jpg')
+        # Compra vieja: el webhook anterior no marcaba las líneas como pedidas
+        paid_line = OrderItem.objects.create(user=user, item=item, quantity=2, ordered=False)
+        paid_order = Order.objects.create(user=user, ordered=True)
+        paid_order.items.add(paid_line)
+        # Carrito actual con la línea repetida
+        cart_lines = [OrderItem.objects.create(user=user, item=item, quantity=1, ordered=False) for _ in range(2)]
+        cart_order = Order.objects.create(user=user, ordered=False)
+        cart_order.items.add(*cart_lines)
+
+        apps = self._migrate(self.after)
+        OrderItem = apps.get_model('core', 'OrderItem')
+        Order = apps.get_model('core', 'Order')
+
+        paid_line = OrderItem.objects.get(pk=paid_line.pk)
+        self.assertTrue(paid_line.ordered)
+        self.assertEqual(paid_line.quantity, 2)
+        self.assertEqual(list(Order.objects.get(pk=paid_order.pk).items.all()), [paid_line])
+
+        cart_items = list(Order.objects.get(pk=cart_order.pk).items.all())
+        self.assertEqual(len(cart_items), 1)
+        self.assertFalse(cart_items[0].ordered)
+        self.assertEqual(cart_items[0].quantity, 2)
+
+    def test_line_shared_with_a_paid_order_is_split(self):
+        apps = self._migrate(self.before)
+        User = apps.get_model('auth', 'User')
+        Item = apps.get_model('core', 'Item')
+        Order = apps.get_model('core', 'Order')
+        OrderItem = apps.get_model('core', 'OrderItem')
+
+        user = User.objects.create(username='cliente')
+        item = Item.objects.create(title='Guantes', slug='guantes', price=100, image='products/foto.jpg')
+        # El add-to-cart anterior metió la línea de la compra pagada en el carrito nuevo
+        shared = OrderItem.objects.create(user=user, item=item, quantity=3, ordered=False)
+        paid_order = Order.objects.create(user=user, ordered=True)
+        paid_order.items.add(shared)
+        cart_order = Order.objects.create(user=user, ordered=False)
+        cart_order.items.add(shared)
+
+        apps = self._migrate(self.after)
+        OrderItem = apps.get_model('core', 'OrderItem')
+        Order = apps.get_model('core', 'Order')
+
+        shared = OrderItem.objects.get(pk=shared.pk)
+        self.assertTrue(shared.ordered)
+        self.assertEqual(list(Order.objects.get(pk=paid_order.pk).items.all()), [shared])
+
+        cart_items = list(Order.objects.get(pk=cart_order.pk).items.all())
+        self.assertEqual(len(cart_items), 1)
+        self.assertNotEqual(cart_items[0].pk, shared.pk)
+        self.assertFalse(cart_items[0].ordered)
+        self.assertEqual((cart_items[0].item_id, cart_items[0].quantity), (item.pk, 1))
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cliente', 'cliente@test.com', 'clave')
+        for slug in ('producto-a', 'producto-b'):
+            Item.objects.create(title=slug, slug=slug, price=100, image='products/foto.jpg')
+        cart.add_item(self.user, 'producto-a')
+        self.service = FakeMercadoPagoClient()
+
+    def _checkout(self):
+        order = cart.get_active_order(self.user, with_lines=True)
+        return checkout.start_checkout(self.user, order, self.service)
+
+    def test_unchanged_cart_reuses_preference(self):
+        first = self._checkout()
+        second = self._checkout()
+
+        self.assertEqual(first['init_point'], second['init_point'])
+        self.assertEqual(len(self.service.preferences), 1)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_changed_cart_creates_new_preference(self):
+        first = self._checkout()
+        cart.add_item(self.user, 'producto-b')
+        second = self._checkout()
+
+        self.assertNotEqual(first['preference_id'], second['preference_id'])
+        self.assertEqual(second['amount'], 200)
+        self.assertEqual(cart.get_active_order(self.user).payment.mercadopago_id, second['preference_id'])
+
+
+class CheckoutLockTests(TransactionTestCase):
+    def test_preference_is_created_without_holding_the_order_lock(self):
+        user = User.objects.create_user('cliente', 'cliente@test.com', 'clave')
+        for slug in ('producto-a', 'producto-b'):
+            Item.objects.create(title=slug, slug=slug, price=100, image='products/foto.jpg')
+        cart.add_item(user, 'producto-a')
+        test = self
+
+        class EditingClient(FakeMercadoPagoClient):
+            def create_preference(self, order, payer_email):
+                test.assertFalse(connection.in_atomic_block)
+                if not self.preferences:
+                    # El usuario agrega un producto mientras MercadoPago responde
+                    cart.add_item(user, 'producto-b')
+                return super().create_preference(order, payer_email)
+
+        service = EditingClient()
+        data = checkout.start_checkout(user, cart.get_active_order(user, with_lines=True), service)
+
+        # La primera preferencia quedó vieja; se guardó la del carrito actual
+        self.assertEqual(len(service.preferences), 2)
+        self.assertEqual(data['amount'], 200)
+        order = cart.get_active_order(user, with_lines=True)
+        self.assertEqual(order.payment.mercadopago_id, data['preference_id'])
+        self.assertEqual(order.payment.fingerprint, checkout.order_fingerprint(order))
+
+
+class WebhookInboxTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cliente', 'cliente@test.com', 'clave')
+        item = Item.objects.create(title='Producto', slug='producto', price=100, image='products/foto.jpg')
+        cart.add_item(self.user, item.slug)
+        self.order = cart.get_active_order(self.user)
+        self.payment = Payment.objects.create(mercadopago_id='pref-1', user=self.user, amount=100)
+        self.order.payment = self.payment
+        self.order.save()
+
+    def _notify(self, payment_id):
+        return self.client.post(
+            '/mercadopago/webhook/',
+            data={'type': 'payment', 'data': {'id': payment_id}},
+            content_type='application/json',
+        )
+
+    def test_webhook_only_stores_the_notification(self):
+        response = self._notify('999')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WebhookNotification.objects.get().payment_id, '999')
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.ordered)
+
+    def test_duplicate_notifications_apply_once(self):
+        client = FakeMercadoPagoClient({
+            '999': {'id': 999, 'status': 'approved', 'transaction_amount': 100,
+                    'external_reference': str(self.order.pk)},
+        })
+        self._notify('999')
+        self._notify('999')
+
+        stats = webhooks.process_pending(client)
+        self.assertEqual(stats['notifications'], 2)
+        self.assertEqual(stats['approved'], 1)
+        self.assertEqual(client.calls, ['999'])
+
+        self._notify('999')
+        stats = webhooks.process_pending(client)
+        self.assertEqual(stats['approved'], 0)
+
+        self.order.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.assertTrue(self.order.ordered)
+        self.assertEqual(self.payment.status, Payment.APPROVED)
+        self.assertFalse(self.order.items.filter(ordered=False).exists())
+        self.assertFalse(WebhookNotification.objects.filter(status=WebhookNotification.PENDING).exists())
+        self.assertIsNone(cart.get_active_order(self.user))
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+
+    def test_unknown_payment_is_retried_then_failed(self):
+        client = FakeMercadoPagoClient()
+        self._notify('404')
+
+        for _ in range(webhooks.MAX_ATTEMPTS):
+            webhooks.process_pending(client)
+
+        notification = WebhookNotification.objects.get()
+        self.assertEqual(notification.status, WebhookNotification.FAILED)
+        self.assertEqual(notification.attempts, webhooks.MAX_ATTEMPTS)
+
+    def test_mercadopago_is_called_outside_transactions(self):
+        test = self
+
+        class CheckingClient(FakeMercadoPagoClient):
+            def get_payment_info(self, payment_id):
+                test.assertFalse(connection.in_atomic_block)
+                notification = WebhookNotification.objects.get()
+                test.assertIsNotNone(notification.locked_until)
+                # Otro worker no puede tomar la misma notificación mientras tanto
+                test.assertEqual(webhooks.claim_batch(), [])
+                return super().get_payment_info(payment_id)
+
+        self._notify('999')
+        stats = webhooks.process_pending(CheckingClient({
+            '999': {'id': 999, 'status': 'approved', 'external_reference': str(self.order.pk)},
+        }))
+        self.assertEqual(stats['payments'], 1)
+        self.assertEqual(WebhookNotification.objects.get().status, WebhookNotification.PROCESSED)
+
+    def test_unavailable_mercadopago_does_not_spend_attempts(self):
+        class DownClient:
+            def get_payment_info(self, payment_id):
+                raise MercadoPagoUnavailable('circuito abierto')
+
+        self._notify('999')
+        self._notify('998')
+        stats = webhooks.process_pending(DownClient())
+
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(
+            list(WebhookNotification.objects.values_list('status', 'attempts', 'locked_until')),
+            [(WebhookNotification.PENDING, 0, None)] * 2,
+        )
+
+
+class ReconcilePaymentsTests(TestCase):
+    def test_pending_payments_are_resolved_once(self):
+        orders = []
+        for i, status in enumerate(('approved', 'rejected', 'in_process')):
+            user = User.objects.create_user(f'cliente{i}', f'cliente{i}@test.com', 'clave')
+            payment = Payment.objects.create(user=user, amount=100)
+            orders.append(Order.objects.create(user=user, payment=payment))
+        client = FakeMercadoPagoClient({
+            f'mp-{order.pk}': {'status': status, 'external_reference': str(order.pk), 'transaction_amount': 90}
+            for order, status in zip(orders, ('approved', 'rejected', 'in_process'))
+        })
+
+        stats = reconciliation.reconcile_pending(client, chunk_size=2, workers=2, min_age=timedelta(0))
+
+        self.assertEqual((stats['scanned'], stats['approved'], stats['updated']), (3, 1, 2))
+        self.assertEqual(
+            [Payment.objects.get(order=order).status for order in orders],
+            ['approved', 'rejected', 'in_process'],
+        )
+        self.assertTrue(Order.objects.get(pk=orders[0].pk).ordered)
+        self.assertEqual(Payment.objects.get(order=orders[0]).amount, 90)
+
+        stats = reconciliation.reconcile_pending(client, min_age=timedelta(0))
+        self.assertEqual((stats['scanned'], stats['approved']), (1, 0))
+
+
+class FakeSession:
+    """Session que devuelve (o lanza) las respuestas en orden y registra las llamadas."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, kwargs['timeout']))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response._content = b'{"id": 1}'
+        return response
+
+
+class PooledHttpClientTests(TestCase):
+    def _client(self, *outcomes, **kwargs):
+        client = PooledHttpClient(connect_timeout=1, read_timeout=2, max_retries=2, backoff=0, **kwargs)
+        client.session = FakeSession(*outcomes)
+        return client
+
+    def test_get_retries_server_errors_with_own_timeouts(self):
+        client = self._client(503, requests.ReadTimeout(), 200)
+
+        response = client.request('GET', 'https://api.mercadopago.com/v1/payments/1', timeout=60)
+
+        self.assertEqual(response, {'status': 200, 'response': {'id': 1}})
+        self.assertEqual(client.session.calls, [('GET', (1, 2))] * 3)
+
+    def test_post_is_not_retried_after_sending(self):
+        client = self._client(requests.ReadTimeout(), 200)
+
+        with self.assertRaises(MercadoPagoUnavailable):
+            client.request('POST', 'https://api.mercadopago.com/checkout/preferences')
+        self.assertEqual(len(client.session.calls), 1)
+
+    def test_open_circuit_fails_fast(self):
+        client = self._client(
+            requests.ConnectTimeout(), requests.ConnectTimeout(), requests.ConnectTimeout(),
+            breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60),
+        )
+
+        with self.assertRaises(MercadoPagoUnavailable):
+            client.request('POST', 'https://api.mercadopago.com/checkout/preferences')
+        self.assertEqual(len(client.session.calls), 3)
+
+        with self.assertRaises(MercadoPagoUnavailable):
+            client.request('GET', 'https://api.mercadopago.com/v1/payments/1')
+        self.assertEqual(len(client.session.calls), 3)
+
+
+# Los proveedores lentos guardan su respuesta desde otro thread: caché en memoria
+@override_settings(SHIPPING_QUOTE_CACHE_ALIAS='default')
+class QuoteAggregatorTests(TestCase):
+    destination = (-64.18, -31.42)
+
+    def setUp(self):
+        cache.clear()
+        quote_cache.clear_local_cache()
+
+    def test_slow_and_failing_providers_do_not_delay_quotes(self):
+        cheap = FakeShippingProvider('lento', base_cost=100, latency=1.0)
+        fast = FakeShippingProvider('rapido', base_cost=500, latency=0.05)
+        broken = FakeShippingProvider('caido', fail=True)
+        aggregator = QuoteAggregator([cheap, fast, broken], budget=0.3)
+        stored = threading.Event()
+        store_late = aggregator._store_late
+        aggregator._store_late = lambda *args: (store_late(*args), stored.set())
+
+        started = time.monotonic()
+        quotes = aggregator.get_quotes(1.2, 0, self.destination)
+
+        self.assertLess(time.monotonic() - started, 0.8)
+        self.assertEqual([quote.provider for quote in quotes], ['rapido'])
+        # Cotizado con el peso máximo del rango (2 kg)
+        self.assertEqual(quotes[0].cost, 700)
+
+        # La respuesta que llegó tarde queda en caché para la próxima consulta
+        self.assertTrue(stored.wait(timeout=5))
+        quotes = aggregator.get_quotes(1.2, 0, self.destination)
+        self.assertEqual([quote.provider for quote in quotes], ['lento', 'rapido'])
+        self.assertEqual(cheap.calls, 1)
+
+    def test_quotes_are_cached_by_zone_and_weight_bracket(self):
+        provider = FakeShippingProvider('rapido')
+        aggregator = QuoteAggregator([provider], budget=1)
+
+        aggregator.get_quotes(1.2, 0, self.destination)
+        # Misma celda de geohash y mismo rango
+        aggregator.get_quotes(1.8, 0, (-64.1805, -31.4205))
+        self.assertEqual(provider.calls, 1)
+
+        aggregator.get_quotes(3, 0, self.destination)
+        # Celda vecina
+        aggregator.get_quotes(1.2, 0, (-64.19, -31.41))
+        self.assertEqual(provider.calls, 3)
+
+    def test_heavy_packages_are_not_quoted_as_the_last_bracket(self):
+        self.assertEqual(weight_bracket(30), 30)
+        self.assertEqual(weight_bracket(30.5), 40)
+        self.assertEqual(weight_bracket(45), 50)
+
+        provider = FakeShippingProvider('rapido', base_cost=0, cost_per_kg=10)
+        aggregator = QuoteAggregator([provider], budget=1)
+        self.assertEqual(aggregator.get_quotes(25, 0, self.destination)[0].cost, 300)
+        self.assertEqual(aggregator.get_quotes(45, 0, self.destination)[0].cost, 500)
+        self.assertEqual(provider.calls, 2)
+
+
+class ShippingQuotesViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        quote_cache.clear_local_cache()
+        call_command('load_shipping_zones', stdout=open(os.devnull, 'w'))
+        self.client = APIClient()
+        self.providers = [
+            FakeShippingProvider('caro', base_cost=900),
+            FakeShippingProvider('barato', base_cost=100),
+        ]
+        patcher = mock.patch('core.quotes.get_providers', return_value=self.providers)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        zones.reset_zone_table()
+
+    def test_quotes_for_zip_code_cheapest_first(self):
+        response = self.client.get('/api/shipping/quotes/', {'zip_code': 'X5000ABC', 'weight': 1.5})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['zip_code'], '5000')
+        self.assertEqual(response.data['shipping_cost'], ShippingZone.objects.get(zip_code='5000').shipping_cost)
+        self.assertEqual([q['provider'] for q in response.data['quotes']], ['barato', 'caro'])
+        # Cotizado con el peso máximo del rango (2 kg)
+        self.assertEqual(response.data['quotes'][0]['cost'], 300)
+
+    def test_uses_profile_zip_code(self):
+        user = User.objects.create_user('cliente', 'cliente@test.com', 'clave')
+        UserProfile.objects.filter(user=user).update(zip_code='5000')
+        self.client.force_authenticate(user)
+
+        response = self.client.get('/api/shipping/quotes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['zip_code'], '5000')
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get('/api/shipping/quotes/', {'zip_code': '9999'}).status_code, 404)
+        self.assertEqual(
+            self.client.get('/api/shipping/quotes/', {'zip_code': '5000', 'weight': 'x'}).status_code, 400
+        )
+        self.assertEqual(
+            self.client.get('/api/shipping/quotes/', {'zip_code': '5000', 'weight': 0}).status_code, 400
+        )
+
+
+class ShippingQuoteCacheTests(TestCase):
+    def setUp(self):
+        quote_cache.clear_local_cache()
+        self.provider = FakeShippingProvider('rapido')
+        self.aggregator = QuoteAggregator([self.provider], budget=1)
+
+    def test_geohash(self):
+        self.assertEqual(quote_cache.geohash_encode(-5.6, 42.6, precision=5), 'ezs42')
+        lon, lat = quote_cache.geohash_center('ezs42')
+        self.assertAlmostEqual(lon, -5.6, delta=0.03)
+        self.assertAlmostEqual(lat, 42.6, delta=0.03)
+
+    def test_same_cell_is_quoted_once(self):
+        quote = self.aggregator.best_quote(1.2, 0, (-58.3816, -34.6037))
+        self.assertEqual(self.aggregator.best_quote(1.5, 0, (-58.3817, -34.6038)), quote)
+        self.assertEqual(self.provider.calls, 1)
+
+        # La cotización está en la caché compartida, con la clave de la celda y el rango
+        key = quote_cache.quote_key('rapido', '69y7pk', 2)
+        self.assertEqual(caches[settings.SHIPPING_QUOTE_CACHE_ALIAS].get(key), quote)
+
+        # Sin L1 (otro worker) sale de la caché compartida...
+        quote_cache.clear_local_cache()
+        self.aggregator.get_quotes(1.2, 0, (-58.3816, -34.6037))
+        self.assertEqual(self.provider.calls, 1)
+
+        # ...y con L1 no hace falta la compartida
+        caches[settings.SHIPPING_QUOTE_CACHE_ALIAS].delete(key)
+        self.aggregator.get_quotes(1.2, 0, (-58.3816, -34.6037))
+        self.assertEqual(self.provider.calls, 1)
+
+        # Otra celda se cotiza aparte
+        self.aggregator.get_quotes(1.2, 0, (-64.18, -31.42))
+        self.assertEqual(self.provider.calls, 2)
+
+    def test_warm_command_stores_one_entry_per_zone_and_bracket(self):
+        with mock.patch('core.quotes.get_providers', return_value=[self.provider]):
+            call_command('warm_shipping_quotes', '--top', '3', '--weights', '1', '5', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.provider.calls, 6)
+        self.assertEqual(len(quote_cache._local), 6)
+
+    def test_lru_evicts_least_recently_used(self):
+        lru = quote_cache.LRUCache(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+
+class ShippingCostTests(TestCase):
+    def test_bulk_quote_matches_scalar_functions(self):
+        addresses = [(-64.18, -31.42), (-68.84, -32.89), shipping.Coordinate(-57.95, -34.92)]
+
+        distances, costs, _ = shipping.bulk_quote(addresses)
+
+        for address, distance, cost in zip(addresses, distances, costs):
+            self.assertEqual(shipping.calculate_distance(address), distance)
+            self.assertEqual(shipping.calculate_shipping_cost(distance), cost)
+
+    @override_settings(WAREHOUSES=[
+        {'code': 'CABA', 'lon': -58.3816, 'lat': -34.6037},
+        {'code': 'COR', 'lon': -64.1888, 'lat': -31.4201},
+        {'code': 'MZA', 'lon': -68.8272, 'lat': -32.8895},
+    ])
+    def test_bulk_distances_default_to_nearest_warehouse(self):
+        warehouses.reset_index()
+        self.addCleanup(warehouses.reset_index)
+        # Cerca de Córdoba y de Mendoza, lejos del depósito central
+        addresses = [(-64.18, -31.42), (-68.84, -32.89), (-64.30, -31.50), (-58.40, -34.60)]
+
+        distances = shipping.bulk_distances(addresses)
+
+        self.assertEqual(distances.shape, (4,))
+        for address, distance in zip(addresses, distances):
+            self.assertEqual(shipping.calculate_distance(address), distance)
+        self.assertLess(distances.max(), 20)
+        self.assertEqual(list(shipping.bulk_quote(addresses)[0]), list(distances))
+
+    def test_locations_do_not_need_geos(self):
+        class PointLike:
+            x, y = -58.3816, -34.6037
+
+        self.assertEqual(shipping.as_coordinate(PointLike()), shipping.WAREHOUSE_LOCATION)
+        self.assertEqual(shipping.calculate_distance(PointLike()), 0)
+        self.assertIsNone(shipping.calculate_distance(None))
+
+
+class ShippingZoneTests(TestCase):
+    def setUp(self):
+        call_command('load_shipping_zones', stdout=open(os.devnull, 'w'))
+
+    def tearDown(self):
+        zones.reset_zone_table()
+
+    def test_zones_are_priced_from_the_nearest_warehouse(self):
+        zone = ShippingZone.objects.get(zip_code='5000')
+        self.assertEqual(zone.shipping_cost, shipping.calculate_shipping_cost(zone.distance_km))
+        self.assertEqual(ShippingZone.objects.get(zip_code='1000').distance_km, 0)
+
+    def test_lookup_accepts_full_cpa(self):
+        self.assertEqual(zones.get_zone('X5000ABC').city, 'Córdoba')
+        self.assertIsNone(zones.get_zone('no sé'))
+
+    def test_checkout_uses_profile_zip_code(self):
+        user = User.objects.create_user('cliente', 'cliente@test.com', 'clave')
+        UserProfile.objects.filter(user=user).update(zip_code='5000')
+        Item.objects.create(title='Producto', slug='producto', price=100, image='products/foto.jpg')
+        cart.add_item(user, 'producto')
+        order = cart.get_active_order(user, with_lines=True)
+        data = checkout.start_checkout(user, order, FakeMercadoPagoClient())
+
+        expected = ShippingZone.objects.get(zip_code='5000').shipping_cost
+        self.assertEqual(data['amount'], 100 + expected)
+        self.assertEqual(Order.objects.get(pk=order.pk).shipping_cost, expected)
+
+
+class ItemThumbnailTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 900), 'red').save(buffer, format='JPEG')
+        name = default_storage.save('products/foto.jpg', ContentFile(buffer.getvalue()))
+        self.item = Item.objects.create(title='Producto', slug='producto', price=100, image=name)
+        self.client = APIClient()
+
+    def test_thumbnail_is_scaled_to_allowed_width(self):
+        url = self.client.get('/api/products/producto/').json()['thumbnail_url']
+        response = self.client.get(url.replace('w=320', 'w=300'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+        image = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(image.size, (320, 240))
+
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_item_without_image_has_no_thumbnail(self):
+        Item.objects.create(title='Sin foto', slug='sin-foto', price=100)
+        self.assertEqual(self.client.get('/api/products/sin-foto/thumbnail/').status_code, 404)
+
+
+class CategoryListTests(TestCase):
+    def test_lists_active_categories_with_etag(self):
+        Category.objects.create(title='Guantes', slug='guantes')
+        Category.objects.create(title='Viejas', slug='viejas', is_active=False)
+        client = APIClient()
+
+        response = client.get('/api/categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['slug'] for c in response.json()], ['guantes'])
+
+        cached = client.get('/api/categories/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        Category.objects.filter(slug='guantes').update(title='Guantes de box')
+        changed = client.get('/api/categories/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
@@ -0,0 +1,63 @@
+"""
+Miniaturas de las imágenes de productos.
+
+Se generan la primera vez que se piden y quedan guardadas en el storage
+(`thumbnails/<ancho>/...`), así cada tamaño se decodifica y reescala una
+sola vez por imagen. Los anchos están acotados a THUMBNAIL_WIDTHS para que
+no se pueda llenar el disco pidiendo tamaños arbitrarios.
+"""
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+THUMBNAIL_WIDTHS = (160, 320, 640)
+DEFAULT_WIDTH = 320
+JPEG_QUALITY = 80
+
+
+def snap_width(width):
+    """Ancho permitido más chico que sea >= al pedido (o el más grande)."""
+    try:
+        width = int(width)
+    except (TypeError, ValueError):
+        return DEFAULT_WIDTH
+    for allowed in THUMBNAIL_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def thumbnail_name(source_name, width):
+    base, _ = os.path.splitext(source_name)
+    return f"thumbnails/{width}/{base}.jpg"
+
+
+def get_thumbnail(source_name, width):
+    """
+    Nombre en el storage de la miniatura de `source_name`, generándola si no existe.
+
+    Args:
+        source_name: Nombre del archivo original en el storage (ej: item.image.name)
+        width: Uno de THUMBNAIL_WIDTHS
+    """
+    name = thumbnail_name(source_name, width)
+    if default_storage.exists(name):
+        return name
+
+    with default_storage.open(source_name, 'rb') as source:
+        image = Image.open(source)
+        # Con JPEG, draft() decodifica directamente a una escala reducida
+        image.draft('RGB', (width, width * 4))
+        image = image.convert('RGB')
+        image.thumbnail((width, width * 4))
+
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+    if default_storage.exists(name):
+        # Otro request la generó mientras tanto
+        return name
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
@@ -2,44 +2,78 @@ import json
 
 from django.urls import reverse
 from django.conf import settings
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
-from django.utils import timezone
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.paginator import Paginator
 
-from .models import Item, OrderItem, Order, Payment, Category
-
-# =========================
-# HELPERS
-# =========================
-def get_active_order(user):
-    try:
-        return Order.objects.get(user=user, ordered=False)
-    except Order.DoesNotExist:
-        return None
+from . import cart, catalog_cache, checkout, webhooks
+from .cart import get_active_order
+from .models import Item, Category
 
 # =========================
 # HOME / PRODUCT
 # =========================
+HOME_PAGE_SIZE = 12
+
+# Columnas que usa cada card de home.html; el resto (descripción, video...) no se trae
+HOME_ITEM_FIELDS = (
+    'title', 'slug', 'price', 'discount_price', 'image', 'preview_image',
+    'category__title', 'label__title', 'label__css_class',
+)
+
+
+def _home_page(category_slug, page_number):
+    """
+    Página del catálogo de home ya evaluada, lista para guardar en caché.
+
+    `page_obj` se arma como dict porque el Page de Django arrastra al
+    Paginator con el queryset completo y no se puede serializar barato.
+    """
+    items = (
+        Item.objects
+        .select_related('category', 'label')
+        .only(*HOME_ITEM_FIELDS)
+        .order_by('id')
+    )
+    if category_slug:
+        items = items.filter(category__slug=category_slug)
+
+    page = Paginator(items, HOME_PAGE_SIZE).get_page(page_number)
+    return {
+        'object_list': list(page.object_list),
+        'page_obj': {
+            'number': page.number,
+            'has_previous': page.has_previous(),
+            'has_next': page.has_next(),
+            'previous_page_number': page.number - 1,
+            'next_page_number': page.number + 1,
+        },
+        'is_paginated': page.has_other_pages(),
+    }
+
+
 class HomeView(View):
     def get(self, request, *args, **kwargs):
         category_slug = request.GET.get('category')
+        page_number = request.GET.get('page')
         
-        if category_slug:
-            items = Item.objects.filter(category__slug=category_slug)
-        else:
-            items = Item.objects.all()
+        page = catalog_cache.cached(
+            'home',
+            (category_slug, page_number),
+            lambda: _home_page(category_slug, page_number),
+        )
+        categories = catalog_cache.cached(
+            'categories',
+            'active',
+            lambda: list(Category.objects.filter(is_active=True)),
+        )
         
-        categories = Category.objects.filter(is_active=True)
-        
-        return render(request, 'home.html', {
-            'object_list': items,
-            'categories': categories
-        })
+        return render(request, 'home.html', {**page, 'categories': categories})
 
 
 class LoginView(View):
@@ -52,7 +86,13 @@ class LoginView(View):
 
 class ProductDetailView(View):
     def get(self, request, slug, *args, **kwargs):
-        item = get_object_or_404(Item, slug=slug)
+        item = catalog_cache.cached(
+            'product',
+            slug,
+            lambda: Item.objects.select_related('category').filter(slug=slug).first(),
+        )
+        if item is None:
+            raise Http404("Producto no encontrado")
         return render(request, 'product.html', {'object': item})
 
 
@@ -61,7 +101,7 @@ class ProductDetailView(View):
 # =========================
 class OrderSummaryView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
-        order = get_active_order(request.user)
+        order = get_active_order(request.user, with_lines=True)
         return render(request, 'order_summary.html', {'order': order})
 
 # =========================
@@ -69,29 +109,20 @@ class OrderSummaryView(LoginRequiredMixin, View):
 # =========================
 class PaymentView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
-        order = get_active_order(request.user)
+        order = get_active_order(request.user, with_lines=True)
         if not order or order.items.count() == 0:
             messages.error(request, "No tenés un pedido activo.")
             return redirect('core:order-summary')
 
+        from .services import MercadoPagoUnavailable, get_mercadopago_service
         try:
-            from .services import MercadoPagoService
-            service = MercadoPagoService()
-            payer_email = request.user.email or "test_user@test.com"
-            
-            payment_data = service.create_preference(order, payer_email)
-            
-            # Registrar Payment localmente
-            payment = Payment.objects.create(
-                mercadopago_id=payment_data["preference_id"],
-                user=request.user,
-                amount=payment_data["amount"],
-            )
-            order.payment = payment
-            order.save()
-
+            service = get_mercadopago_service()
+            payment_data = checkout.start_checkout(request.user, order, service)
             return redirect(payment_data["init_point"])
 
+        except MercadoPagoUnavailable:
+            messages.error(request, "MercadoPago no está respondiendo. Probá de nuevo en unos minutos.")
+            return redirect('core:order-summary')
         except Exception as e:
             messages.error(request, f"Error procesando el pago: {str(e)}")
             return redirect('core:order-summary')
@@ -105,35 +136,21 @@ class MercadoPagoWebhookView(View):
         return super().dispatch(*args, **kwargs)
 
     def post(self, request, *args, **kwargs):
+        # Solo se guarda la notificación; el worker `process_webhooks` consulta
+        # a MercadoPago y cierra la orden. Así se responde al instante y los
+        # reintentos de MercadoPago no ocupan workers de gunicorn.
         try:
-            data = json.loads(request.body)
-            from .services import MercadoPagoService
-            service = MercadoPagoService()
-
-            payment_id = data.get('data', {}).get('id') or data.get('id')
-            if not payment_id:
-                return JsonResponse({"error": "Missing payment id"}, status=400)
-
-            info = service.get_payment_info(payment_id)
-            payment = Payment.objects.filter(mercadopago_id=str(payment_id)).first()
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
 
-            if not payment:
-                return JsonResponse({"error": "Payment not found"}, status=404)
+        if not webhooks.extract_payment_id(data, request.GET):
+            return JsonResponse({"error": "Missing payment id"}, status=400)
 
-            if info.get("status") == "approved":
-                payment.amount = info.get("transaction_amount", payment.amount)
-                payment.save()
-
-                order = Order.objects.filter(payment=payment).first()
-                if order:
-                    order.ordered = True
-                    order.ordered_date = timezone.now()
-                    order.save()
-
-            return JsonResponse({"status": "ok"})
-
-        except Exception as e:
-            return JsonResponse({"error": str(e)}, status=500)
+        webhooks.enqueue_notification(data, request.GET)
+        return JsonResponse({"status": "ok"})
 
 # =========================
 # RESULT VIEWS
@@ -158,32 +175,17 @@ class PaymentFailureView(View):
 # =========================
 @login_required
 def add_to_cart(request, slug):
-    item = get_object_or_404(Item, slug=slug)
-    order_item, _ = OrderItem.objects.get_or_create(item=item, user=request.user, ordered=False)
-    order = Order.objects.filter(user=request.user, ordered=False).first()
-
-    if order:
-        if order.items.filter(item__slug=item.slug).exists():
-            order_item.quantity += 1
-            order_item.save()
-        else:
-            order.items.add(order_item)
-    else:
-        order = Order.objects.create(user=request.user)
-        order.items.add(order_item)
+    try:
+        cart.add_item(request.user, slug)
+    except Item.DoesNotExist:
+        raise Http404("Producto no encontrado")
 
     messages.success(request, "Producto agregado.")
     return redirect('core:order-summary')
 
 @login_required
 def remove_from_cart(request, slug):
-    item = get_object_or_404(Item, slug=slug)
-    order = Order.objects.filter(user=request.user, ordered=False).first()
-
-    if order and order.items.filter(item__slug=item.slug).exists():
-        oi = OrderItem.objects.filter(item=item, user=request.user, ordered=False).first()
-        order.items.remove(oi)
-        oi.delete()
+    if cart.remove_item(request.user, slug) == cart.REMOVED:
         messages.info(request, "Producto eliminado.")
     else:
         messages.warning(request, "No está en el carrito.")
@@ -192,19 +194,9 @@ def remove_from_cart(request, slug):
 
 @login_required
 def remove_single_item_from_cart(request, slug):
-    item = get_object_or_404(Item, slug=slug)
-    order = Order.objects.filter(user=request.user, ordered=False).first()
-
-    if order and order.items.filter(item__slug=item.slug).exists():
-        oi = OrderItem.objects.filter(item=item, user=request.user, ordered=False).first()
-        if oi.quantity > 1:
-            oi.quantity -= 1
-            oi.save()
-        else:
-            order.items.remove(oi)
-            oi.delete()
-        messages.info(request, "Carrito actualizado.")
-    else:
+    if cart.remove_single_item(request.user, slug) == cart.NOT_IN_CART:
         messages.warning(request, "No está en el carrito.")
+    else:
+        messages.info(request, "Carrito actualizado.")
 
     return redirect('core:order-summary')
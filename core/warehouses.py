@@ -0,0 +1,112 @@
+"""
+Registro de depósitos y búsqueda del más cercano.
+
+Los depósitos se leen una vez de `settings.WAREHOUSES` y se indexan en un
+KD-tree (scipy.spatial.cKDTree) sobre sus coordenadas en la esfera unitaria
+(x, y, z). En 3D la distancia euclídea (cuerda) crece igual que la distancia
+sobre la superficie, así que el vecino más cercano del árbol es también el
+más cercano en km, sin los problemas de lon/lat cerca del antimeridiano.
+Cada consulta es O(log M) en lugar de recorrer los M depósitos.
+"""
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+
+EARTH_RADIUS_KM = 6371
+
+
+@dataclass(frozen=True)
+class Warehouse:
+    code: str
+    name: str
+    lon: float
+    lat: float
+
+
+def to_unit_sphere(lons, lats):
+    """Convierte arrays de lon/lat en grados a puntos (N, 3) sobre la esfera unitaria."""
+    lons = np.radians(np.asarray(lons, dtype=float))
+    lats = np.radians(np.asarray(lats, dtype=float))
+    cos_lat = np.cos(lats)
+    return np.column_stack((cos_lat * np.cos(lons), cos_lat * np.sin(lons), np.sin(lats)))
+
+
+def chord_to_km(chord):
+    """Distancia sobre la superficie que corresponde a una cuerda de la esfera unitaria."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+class WarehouseIndex:
+    """
+    Índice espacial de depósitos.
+
+    Args:
+        warehouses: Secuencia de Warehouse (al menos uno)
+    """
+
+    def __init__(self, warehouses):
+        self.warehouses = list(warehouses)
+        if not self.warehouses:
+            raise ValueError("Se necesita al menos un depósito.")
+        self.lons = np.array([w.lon for w in self.warehouses], dtype=float)
+        self.lats = np.array([w.lat for w in self.warehouses], dtype=float)
+        # scipy tarda en importarse; se carga recién cuando hace falta el índice
+        from scipy.spatial import cKDTree
+
+        self._tree = cKDTree(to_unit_sphere(self.lons, self.lats))
+
+    def __len__(self):
+        return len(self.warehouses)
+
+    def nearest(self, lon, lat):
+        """Devuelve (Warehouse, km) del depósito más cercano al punto."""
+        chord, index = self._tree.query(to_unit_sphere([lon], [lat])[0])
+        return self.warehouses[index], float(chord_to_km(chord))
+
+    def k_nearest(self, lon, lat, k):
+        """Lista de (Warehouse, km) de los `k` depósitos más cercanos, del más cercano al más lejano."""
+        k = min(k, len(self))
+        chords, indexes = self._tree.query(to_unit_sphere([lon], [lat])[0], k=k)
+        chords, indexes = np.atleast_1d(chords), np.atleast_1d(indexes)
+        return [(self.warehouses[i], float(km)) for i, km in zip(indexes, chord_to_km(chords))]
+
+    def nearest_many(self, lons, lats):
+        """
+        Depósito más cercano para N puntos en una sola llamada.
+
+        Returns:
+            (índices en `warehouses`, distancias en km), arrays (N,)
+        """
+        chords, indexes = self._tree.query(to_unit_sphere(lons, lats))
+        return indexes, chord_to_km(chords)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def load_warehouses():
+    """Depósitos configurados en `settings.WAREHOUSES`."""
+    return [
+        Warehouse(code=w['code'], name=w.get('name', w['code']), lon=float(w['lon']), lat=float(w['lat']))
+        for w in settings.WAREHOUSES
+    ]
+
+
+def get_index():
+    """Índice de los depósitos configurados; se arma en la primera llamada de cada proceso."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = WarehouseIndex(load_warehouses())
+    return _index
+
+
+def reset_index():
+    """Descarta el índice para que se vuelva a leer la configuración."""
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,221 @@
+"""
+Bandeja de entrada de notificaciones de MercadoPago.
+
+El webhook solo guarda la notificación y responde 200; la consulta a
+MercadoPago y el cambio de estado de la orden los hace el worker
+(`manage.py process_webhooks`) llamando a `process_pending()`.
+
+El worker toma un lote en una transacción corta (`claim_batch`) y consulta
+MercadoPago sin locks ni transacciones abiertas; cada resultado se aplica
+en su propia transacción.
+
+MercadoPago reintenta y duplica notificaciones, así que todo es idempotente:
+dentro de un lote se consulta una sola vez cada pago, y la transición a
+aprobado es un UPDATE condicional sobre `Payment.status` que solo puede
+afectar una fila una vez. Una notificación repetida que llega después
+encuentra el pago ya aprobado y no cambia nada.
+"""
+import logging
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import cart
+from .models import Order, Payment, WebhookNotification
+from .services import MercadoPagoUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Después de estos intentos la notificación queda como fallida para revisarla a mano
+MAX_ATTEMPTS = 5
+# Tiempo que un worker tiene una notificación tomada; alcanza para el lote
+# completo con los timeouts y reintentos del cliente de MercadoPago
+LEASE = timedelta(minutes=10)
+
+
+def extract_payment_id(payload, params=None):
+    """ID del pago según los formatos que usa MercadoPago (cuerpo JSON o query string)."""
+    params = params or {}
+    data = payload.get('data') if isinstance(payload.get('data'), dict) else {}
+    payment_id = data.get('id') or payload.get('id') or params.get('data.id') or params.get('id')
+    return str(payment_id) if payment_id else ''
+
+
+def enqueue_notification(payload, params=None):
+    """Guarda la notificación tal como llegó. Es lo único que hace el webhook."""
+    params = params or {}
+    topic = payload.get('type') or payload.get('topic') or params.get('type') or params.get('topic') or ''
+    return WebhookNotification.objects.create(
+        topic=str(topic)[:50],
+        payment_id=extract_payment_id(payload, params),
+        payload=payload,
+    )
+
+
+def apply_payment_info(payment_id, info):
+    """
+    Aplica el estado informado por MercadoPago al Payment y a su orden.
+
+    Args:
+        payment_id: ID del pago en MercadoPago
+        info: Respuesta de `get_payment_info`
+
+    Returns:
+        True si esta llamada aprobó el pago (solo una vez por pago)
+
+    Raises:
+        Payment.DoesNotExist: si el pago no corresponde a ninguna orden nuestra
+    """
+    payment, order = _find_payment(payment_id, info)
+    status = info.get('status') or Payment.PENDING
+
+    with transaction.atomic():
+        pending = Payment.objects.filter(pk=payment.pk).exclude(status=Payment.APPROVED)
+
+        if status != Payment.APPROVED:
+            pending.update(status=status[:20])
+            return False
+
+        approved = pending.update(
+            status=Payment.APPROVED,
+            amount=info.get('transaction_amount', payment.amount),
+        )
+        if not approved:
+            return False
+
+        if order is None:
+            order = Order.objects.filter(payment=payment).first()
+        if order is not None and Order.objects.filter(pk=order.pk, ordered=False).update(
+            ordered=True, ordered_date=timezone.now(), payment=payment,
+        ):
+            # Cerrar también las líneas, si no seguirían contando como carrito abierto
+            order.items.update(ordered=True)
+            cart.invalidate_cart_item_count(order.user_id)
+    return True
+
+
+def _find_payment(payment_id, info):
+    """
+    Busca el Payment local por el ID de MercadoPago o, si no, por la orden
+    que viaja en `external_reference`.
+    """
+    payment = Payment.objects.filter(mercadopago_id=str(payment_id)).first()
+    if payment is not None:
+        return payment, None
+
+    reference = info.get('external_reference')
+    if reference and str(reference).isdigit():
+        order = Order.objects.select_related('payment').filter(pk=int(reference)).first()
+        if order is not None and order.payment is not None:
+            return order.payment, order
+
+    raise Payment.DoesNotExist(f"No hay un pago local para {payment_id}")
+
+
+def claim_batch(batch_size=50, lease=LEASE):
+    """
+    Toma hasta `batch_size` notificaciones pendientes y sin tomar.
+
+    Es una transacción corta: `select_for_update(skip_locked=True)` para que
+    dos workers no tomen las mismas filas, y un UPDATE que las marca como
+    tomadas por `lease` y cuenta el intento. Al volver ya no hay locks, así
+    que las consultas a MercadoPago no retienen filas ni transacciones.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            WebhookNotification.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=WebhookNotification.PENDING)
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+            .order_by('id')[:batch_size]
+        )
+        WebhookNotification.objects.filter(pk__in=[n.pk for n in batch]).update(
+            locked_until=now + lease, attempts=F('attempts') + 1,
+        )
+    for notification in batch:
+        notification.attempts += 1
+        notification.locked_until = now + lease
+    return batch
+
+
+def process_pending(client, batch_size=50):
+    """
+    Procesa un lote de notificaciones pendientes.
+
+    Las notificaciones se toman con `claim_batch`; cada pago se consulta a
+    MercadoPago fuera de toda transacción y su resultado se aplica en una
+    transacción propia (`apply_payment_info`).
+
+    Args:
+        client: Objeto con `get_payment_info(payment_id)` (MercadoPagoService o un fake)
+        batch_size: Máximo de notificaciones por lote
+
+    Returns:
+        dict con la cantidad de notificaciones, pagos consultados, aprobados y errores
+    """
+    stats = {'notifications': 0, 'payments': 0, 'approved': 0, 'errors': 0}
+
+    batch = claim_batch(batch_size)
+    stats['notifications'] = len(batch)
+
+    by_payment = {}
+    for notification in batch:
+        by_payment.setdefault(notification.payment_id, []).append(notification)
+
+    groups = list(by_payment.items())
+    for position, (payment_id, notifications) in enumerate(groups):
+        ids = [n.pk for n in notifications]
+        if not payment_id:
+            _finish(ids, WebhookNotification.PROCESSED, 'Sin ID de pago')
+            continue
+
+        stats['payments'] += 1
+        try:
+            info = client.get_payment_info(payment_id)
+            if apply_payment_info(payment_id, info):
+                stats['approved'] += 1
+        except MercadoPagoUnavailable as e:
+            # No es culpa de la notificación: se devuelven sin gastar el
+            # intento y el resto del lote espera al próximo ciclo
+            stats['errors'] += 1
+            logger.warning("MercadoPago no disponible, se corta el lote: %s", e)
+            _release([n.pk for _, pending in groups[position:] for n in pending])
+            break
+        except Exception as e:
+            stats['errors'] += 1
+            logger.warning("Error procesando el pago %s: %s", payment_id, e)
+            _retry_later(notifications, str(e))
+        else:
+            _finish(ids, WebhookNotification.PROCESSED)
+
+    return stats
+
+
+def _finish(ids, status, error=''):
+    WebhookNotification.objects.filter(pk__in=ids).update(
+        status=status, processed_at=timezone.now(), last_error=error, locked_until=None,
+    )
+
+
+def _release(ids):
+    WebhookNotification.objects.filter(pk__in=ids).update(
+        attempts=F('attempts') - 1, locked_until=None,
+    )
+
+
+def _retry_later(notifications, error):
+    """El intento ya se contó al tomarlas; se liberan, o se marcan fallidas si no quedan intentos."""
+    now = timezone.now()
+    for notification in notifications:
+        notification.last_error = error
+        notification.locked_until = None
+        if notification.attempts >= MAX_ATTEMPTS:
+            notification.status = WebhookNotification.FAILED
+            notification.processed_at = now
+    WebhookNotification.objects.bulk_update(
+        notifications, ['last_error', 'locked_until', 'status', 'processed_at']
+    )
@@ -0,0 +1,66 @@
+"""
+Tabla de zonas de envío en memoria.
+
+Cada worker carga la tabla ShippingZone completa en un dict (código postal
+-> zona) la primera vez que la necesita, así cotizar un envío en el checkout
+es un acceso a un dict, sin geocodificar ni usar GIS. La tabla es chica (un
+registro por código postal) y cambia poco: se vuelve a leer cada
+SHIPPING_ZONES_RELOAD segundos.
+"""
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from .models import ShippingZone, UserProfile
+
+# El CPA argentino (ej: C1425ABC) contiene el código postal de 4 dígitos
+_ZIP_DIGITS = re.compile(r'\d{4}')
+
+_table = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def normalize_zip(zip_code):
+    """Código postal de 4 dígitos a partir de lo que cargó el usuario, o None."""
+    if not zip_code:
+        return None
+    match = _ZIP_DIGITS.search(str(zip_code))
+    return match.group(0) if match else None
+
+
+def get_zone_table():
+    """Dict {código postal: ShippingZone} de este proceso."""
+    global _table, _loaded_at
+    reload_after = getattr(settings, 'SHIPPING_ZONES_RELOAD', 600)
+    if _table is None or time.monotonic() - _loaded_at > reload_after:
+        with _lock:
+            if _table is None or time.monotonic() - _loaded_at > reload_after:
+                _table = {zone.zip_code: zone for zone in ShippingZone.objects.all()}
+                _loaded_at = time.monotonic()
+    return _table
+
+
+def reset_zone_table():
+    global _table
+    with _lock:
+        _table = None
+
+
+def get_zone(zip_code):
+    zip_code = normalize_zip(zip_code)
+    return get_zone_table().get(zip_code) if zip_code else None
+
+
+def shipping_cost_for_zip(zip_code):
+    """Costo de envío precalculado para el código postal, o None si no está en la tabla."""
+    zone = get_zone(zip_code)
+    return zone.shipping_cost if zone else None
+
+
+def shipping_cost_for_user(user):
+    """Costo de envío según el código postal del perfil del usuario, o None."""
+    zip_code = UserProfile.objects.filter(user=user).values_list('zip_code', flat=True).first()
+    return shipping_cost_for_zip(zip_code)
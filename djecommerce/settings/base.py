@@ -95,6 +95,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.cart',
             ],
         },
     },
@@ -122,9 +123,30 @@ CACHES = {
         'OPTIONS': {
             'MAX_ENTRIES': 1000,
         }
-    }
+    },
+    # Compartida entre todos los workers (y el worker de webhooks): lo que
+    # se invalida en un proceso tiene que verse en los demás. La tabla se
+    # crea con `manage.py createcachetable` (build.sh / entrypoint.sh)
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'core_shared_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        }
+    },
 }
 
+# Caché del catálogo (ver core/catalog_cache.py)
+CATALOG_CACHE_ALIAS = 'shared'
+CATALOG_CACHE_TIMEOUT = 60 * 5
+
+# Sincronización incremental del catálogo (ver core/sync.py)
+SYNC_PAGE_SIZE = 500
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Contador del carrito de la navbar (ver core/cart.py)
+CART_COUNT_CACHE_ALIAS = 'shared'
+
 # Cachear consultas de SocialApp para OAuth más rápido
 SOCIALACCOUNT_STORE_TOKENS = False  # No guardar tokens innecesarios
 
@@ -168,8 +190,46 @@ CRISPY_TEMPLATE_PACK = 'bootstrap5'
 
 DEFAULT_CURRENCY = 'ARS'
 
+# Depósitos desde los que se despacha (ver core/warehouses.py). El envío se
+# cotiza desde el más cercano a la dirección del cliente.
+WAREHOUSES = [
+    {'code': 'CABA', 'name': 'Depósito central', 'lon': -58.3816, 'lat': -34.6037},
+]
+
+# Cotizaciones de envío (ver core/quotes.py)
+SHIPPING_PROVIDERS = [
+    'core.shipping.AndreaniProvider',
+    'core.shipping.CorreoArgentinoProvider',
+]
+SHIPPING_PROVIDER_TIMEOUT = 2.0  # Plazo por proveedor, en segundos
+SHIPPING_QUOTE_BUDGET = 2.5  # Tiempo total máximo para juntar cotizaciones
+SHIPPING_QUOTE_WORKERS = 8
+SHIPPING_QUOTE_CACHE_TIMEOUT = 60 * 60
+
+# Caché de cotizaciones por zona y rango de peso (ver core/quote_cache.py)
+SHIPPING_QUOTE_CACHE_ALIAS = 'shared'
+SHIPPING_GEOHASH_PRECISION = 6  # ~1,2 x 0,6 km
+SHIPPING_QUOTE_L1_SIZE = 10_000
+SHIPPING_QUOTE_L1_TTL = 60 * 5
+
+# Segundos entre relecturas de la tabla de zonas de envío (ver core/zones.py)
+SHIPPING_ZONES_RELOAD = 60 * 10
+
 MERCADOPAGO_PUBLIC_KEY = config('MERCADOPAGO_PUBLIC_KEY', default='')
 MERCADOPAGO_ACCESS_TOKEN = config('MERCADOPAGO_ACCESS_TOKEN', default='')
 MERCADOPAGO_SANDBOX = config('MERCADOPAGO_SANDBOX', default='True') == 'True'
 
+# Cliente HTTP de MercadoPago (ver core/services.py). Los timeouts acotan
+# cuánto puede quedar bloqueado un worker de gunicorn si MercadoPago anda lento.
+MERCADOPAGO_CONNECT_TIMEOUT = 3.05
+MERCADOPAGO_READ_TIMEOUT = 10.0
+MERCADOPAGO_MAX_RETRIES = 2
+MERCADOPAGO_RETRY_BACKOFF = 0.3
+MERCADOPAGO_POOL_SIZE = 10
+# Fallas seguidas para abrir el circuito y segundos hasta volver a probar
+MERCADOPAGO_CIRCUIT_FAILURES = 5
+MERCADOPAGO_CIRCUIT_RESET = 30.0
+# Segundos durante los que se reutiliza una preferencia si el carrito no cambió
+MERCADOPAGO_PREFERENCE_TTL = 60 * 30
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -5,6 +5,9 @@ set -o errexit
 echo "Running migrations..."
 python manage.py migrate --no-input
 
+echo "Creating cache table..."
+python manage.py createcachetable
+
 echo "Collecting static files..."
 python manage.py collectstatic --no-input
 
@@ -1,22 +1,141 @@
 import requests
 import json
-from typing import Optional, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable, List
+
+
+def _schedule_on_main_thread(func: Callable[[], None]):
+    """Ejecutar `func` en el próximo frame de Kivy (thread principal)."""
+    # Import local: el servicio se puede usar (y testear) sin Kivy
+    from kivy.clock import Clock
+    Clock.schedule_once(lambda dt: func())
+
+
+class PendingCall:
+    """
+    Pedido hecho con `APIService.submit`.
+    
+    Varios PendingCall pueden compartir el mismo future si se coalescieron.
+    """
+    
+    def __init__(self, callback, key):
+        self.callback = callback
+        self.key = key
+        self.cancelled = False
+        self.future = None
+    
+    def cancel(self):
+        """Descartar el resultado (y no ejecutar el pedido si todavía no empezó)."""
+        self.cancelled = True
+        if self.future is not None and all(call.cancelled for call in self.future.calls):
+            self.future.cancel()
 
 
 class APIService:
     """Servicio centralizado para todas las llamadas a la API del backend."""
     
     BASE_URL = "http://127.0.0.1:8000/api"
+    MAX_WORKERS = 4
     
-    def __init__(self, auth_manager=None):
+    def __init__(self, auth_manager=None, session=None, dispatch=None):
         """
         Inicializar el servicio de API.
         
         Args:
             auth_manager: Instancia de AuthManager para manejar tokens
+            session: Sesión HTTP (por defecto requests.Session)
+            dispatch: Función que ejecuta los callbacks de `submit`; por
+                defecto los pasa al thread principal con Clock
         """
         self.auth_manager = auth_manager
-        self.session = requests.Session()
+        self.session = session or requests.Session()
+        # Respuestas GET con ETag: clave de la petición -> (etag, last_modified, payload)
+        self._validators = {}
+        
+        self._dispatch = dispatch or _schedule_on_main_thread
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix='api')
+        self._lock = threading.RLock()
+        # Pedidos coalescibles en curso: (func, args, kwargs) -> future
+        self._in_flight = {}
+        # Último pedido de cada `key`
+        self._latest = {}
+    
+    # === EJECUCIÓN EN SEGUNDO PLANO ===
+    
+    def submit(self, func: Callable, *args, callback: Optional[Callable] = None,
+               key: Optional[str] = None, coalesce: bool = False, **kwargs) -> PendingCall:
+        """
+        Ejecutar `func(*args, **kwargs)` en el pool del servicio.
+        
+        Args:
+            func: Método de este servicio (u otra función bloqueante)
+            callback: Recibe el resultado en el thread principal. Si `func`
+                lanza una excepción recibe un dict con `error`.
+            key: Si se indica, un pedido nuevo con la misma key reemplaza al
+                anterior: el anterior no se ejecuta si todavía estaba en cola,
+                y si ya estaba en curso su resultado se descarta.
+            coalesce: Si ya hay en curso una llamada idéntica (misma función y
+                argumentos), esperar esa en lugar de repetirla. Solo para GETs.
+            
+        Returns:
+            PendingCall, que se puede cancelar
+        """
+        call = PendingCall(callback, key)
+        call_key = (func, args, tuple(sorted(kwargs.items()))) if coalesce else None
+        
+        with self._lock:
+            if key is not None:
+                previous = self._latest.get(key)
+                if previous is not None:
+                    previous.cancel()
+                self._latest[key] = call
+            
+            future = self._in_flight.get(call_key) if coalesce else None
+            is_new = future is None
+            if is_new:
+                future = self._executor.submit(func, *args, **kwargs)
+                future.calls = []
+                future.call_key = call_key
+                if coalesce:
+                    self._in_flight[call_key] = future
+            future.calls.append(call)
+            call.future = future
+        
+        if is_new:
+            future.add_done_callback(self._finish)
+        return call
+    
+    def cancel(self, key: str):
+        """Cancelar el último pedido hecho con `key`, si sigue pendiente."""
+        with self._lock:
+            call = self._latest.pop(key, None)
+            if call is not None:
+                call.cancel()
+    
+    def close(self):
+        """Esperar los pedidos en curso y liberar los threads."""
+        self._executor.shutdown(wait=True)
+    
+    def _finish(self, future):
+        with self._lock:
+            if future.call_key is not None and self._in_flight.get(future.call_key) is future:
+                del self._in_flight[future.call_key]
+            calls = list(future.calls)
+            for call in calls:
+                if call.key is not None and self._latest.get(call.key) is call:
+                    del self._latest[call.key]
+        
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"error": f"Error inesperado: {str(e)}"}
+        
+        for call in calls:
+            if call.callback is not None and not call.cancelled:
+                self._dispatch(lambda call=call: call.cancelled or call.callback(result))
     
     def _get_headers(self, authenticated: bool = False) -> Dict[str, str]:
         """
@@ -38,7 +157,7 @@ class APIService:
         return headers
     
     def _make_request(self, method: str, endpoint: str, authenticated: bool = False, 
-                     data: Optional[Dict] = None) -> Dict[str, Any]:
+                     data: Optional[Dict] = None, params: Optional[Dict] = None) -> Dict[str, Any]:
         """
         Realizar una petición HTTP.
         
@@ -47,16 +166,29 @@ class APIService:
             endpoint: Endpoint de la API
             authenticated: Si requiere autenticación
             data: Datos a enviar (para POST/PUT)
+            params: Parámetros de query string (para GET)
             
         Returns:
             Dict con la respuesta JSON o error
         """
         url = f"{self.BASE_URL}/{endpoint}"
         headers = self._get_headers(authenticated)
+        cache_key = None
         
         try:
             if method == "GET":
-                response = self.session.get(url, headers=headers)
+                # Revalidar con el ETag / Last-Modified de la última respuesta
+                cache_key = (url, tuple(sorted((params or {}).items())), authenticated)
+                cached = self._validators.get(cache_key)
+                if cached:
+                    etag, last_modified, _ = cached
+                    if etag:
+                        headers["If-None-Match"] = etag
+                    if last_modified:
+                        headers["If-Modified-Since"] = last_modified
+                response = self.session.get(url, headers=headers, params=params)
+                if response.status_code == 304 and cached:
+                    return cached[2]
             elif method == "POST":
                 response = self.session.post(url, headers=headers, json=data)
             elif method == "PUT":
@@ -68,7 +200,10 @@ class APIService:
             
             # Intentar parsear JSON
             try:
-                return response.json()
+                payload = response.json()
+                if cache_key and response.status_code == 200:
+                    self._store_validators(cache_key, response, payload)
+                return payload
             except:
                 # Si no es JSON, devolver el texto
                 return {"status_code": response.status_code, "text": response.text}
@@ -80,6 +215,15 @@ class APIService:
         except Exception as e:
             return {"error": f"Error inesperado: {str(e)}"}
     
+    def _store_validators(self, cache_key, response, payload):
+        """Guardar los validadores de una respuesta GET para el próximo pedido condicional."""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._validators[cache_key] = (etag, last_modified, payload)
+        else:
+            self._validators.pop(cache_key, None)
+    
     # === AUTENTICACIÓN ===
     
     def login(self, username: str, password: str) -> Dict[str, Any]:
@@ -126,14 +270,35 @@ class APIService:
     
     # === PRODUCTOS ===
     
-    def get_products(self) -> Dict[str, Any]:
+    def get_products(self, cursor: Optional[str] = None, **filters) -> Dict[str, Any]:
+        """
+        Obtener una página del catálogo de productos.
+        
+        Args:
+            cursor: Token `next_cursor` de la página anterior (None para la primera)
+            **filters: Filtros opcionales (category, label, min_price, max_price,
+                on_discount, page_size)
+            
+        Returns:
+            Dict con `results` y `next_cursor`, o error
+        """
+        params = {k: v for k, v in filters.items() if v is not None}
+        if cursor:
+            params["cursor"] = cursor
+        return self._make_request("GET", "products/", params=params)
+    
+    def get_product_changes(self, since: str) -> Dict[str, Any]:
         """
-        Obtener lista de todos los productos.
+        Obtener los cambios del catálogo desde un token de sincronización.
         
+        Args:
+            since: `sync_token` de la primera página del catálogo, o el
+                `token` del último delta aplicado
+            
         Returns:
-            Lista de productos o error
+            Dict con `changed`, `deleted` y el nuevo `token`, o error
         """
-        return self._make_request("GET", "products/")
+        return self._make_request("GET", "products/changes/", params={"since": since})
     
     def get_product_detail(self, slug: str) -> Dict[str, Any]:
         """
@@ -147,6 +312,15 @@ class APIService:
         """
         return self._make_request("GET", f"products/{slug}/")
     
+    def get_categories(self) -> Any:
+        """
+        Obtener las categorías activas.
+        
+        Returns:
+            Lista de categorías, o dict con error
+        """
+        return self._make_request("GET", "categories/")
+    
     # === USUARIO ===
     
     def get_user_profile(self) -> Dict[str, Any]:
@@ -220,6 +394,19 @@ class APIService:
         return self._make_request("POST", "remove-item/", authenticated=True, 
                                  data={"slug": slug})
     
+    def apply_cart_batch(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Aplicar varios cambios de cantidad al carrito en un solo request.
+        
+        Args:
+            items: Lista de {"slug": ..., "delta": ...}
+            
+        Returns:
+            Carrito resultante (mismo formato que get_cart_summary) con el
+            resultado de cada producto en `results`, o error
+        """
+        return self._make_request("POST", "cart/batch/", authenticated=True, data={"items": items})
+    
     # === CHECKOUT ===
     
     def checkout(self) -> Dict[str, Any]:
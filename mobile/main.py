@@ -1,7 +1,10 @@
+import os
+
 from kivymd.app import MDApp
 from kivy.uix.screenmanager import ScreenManager
 from api.api_service import APIService
 from utils.auth_manager import AuthManager
+from utils.catalog_store import CatalogStore
 from screens.login_screen import LoginScreen
 from screens.products_screen import ProductsScreen
 from screens.product_detail_screen import ProductDetailScreen
@@ -17,6 +20,8 @@ class ECommerceApp(MDApp):
         # Servicios
         self.api_service = APIService()
         self.auth_manager = AuthManager()
+        # Catálogo guardado en disco: la lista se muestra sin esperar a la red
+        self.catalog_store = CatalogStore(os.path.join(self.user_data_dir, 'catalog.sqlite3'))
         
         # Screen Manager
         sm = ScreenManager()
@@ -31,7 +36,8 @@ class ECommerceApp(MDApp):
         products_screen = ProductsScreen(
             name='products',
             api_service=self.api_service,
-            auth_manager=self.auth_manager
+            auth_manager=self.auth_manager,
+            catalog_store=self.catalog_store
         )
         
         product_detail_screen = ProductDetailScreen(
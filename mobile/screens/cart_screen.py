@@ -8,17 +8,23 @@ from kivymd.uix.gridlayout import MDGridLayout
 from kivymd.uix.card import MDCard
 from kivy.clock import Clock
 from kivy.metrics import dp
-import threading
 import webbrowser
 
 class CartScreen(MDScreen):
     """Pantalla que muestra el carrito de compras."""
     
+    # Segundos que se juntan toques antes de mandarlos en un solo request
+    BATCH_WINDOW = 0.4
+    
     def __init__(self, api_service, auth_manager, **kwargs):
         super().__init__(**kwargs)
         self.api_service = api_service
         self.auth_manager = auth_manager
         self.cart_data = None
+        # Cambios de cantidad todavía no enviados: slug -> delta
+        self._pending = {}
+        self._batch_in_flight = False
+        self._flush_trigger = Clock.create_trigger(self._flush, self.BATCH_WINDOW)
         
         # Layout principal
         self.main_layout = MDBoxLayout(
@@ -130,26 +136,34 @@ class CartScreen(MDScreen):
         )
         self.cart_list.add_widget(loading)
         
-        threading.Thread(target=self._fetch_cart).start()
-    
-    def _fetch_cart(self):
-        """Thread para obtener carrito."""
-        result = self.api_service.get_cart_summary()
-        Clock.schedule_once(lambda dt: self._display_cart(result))
+        # Una recarga nueva reemplaza a la que esté en curso
+        self.api_service.submit(
+            self.api_service.get_cart_summary,
+            callback=self._display_cart, key='cart-summary', coalesce=True
+        )
     
     def _display_cart(self, result):
-        """Mostrar carrito en la UI."""
-        self.cart_list.clear_widgets()
-        
-        if 'error' in result:
+        """Mostrar el carrito que devolvió la API."""
+        if result is None or 'error' in result:
+            self.cart_list.clear_widgets()
             error_label = MDLabel(
-                text=f"Error: {result['error']}",
+                text=f"Error: {(result or {}).get('error')}",
                 halign="center",
                 theme_text_color="Error"
             )
             self.cart_list.add_widget(error_label)
             return
         
+        self.cart_data = result
+        for slug, delta in self._pending.items():
+            self._apply_locally(slug, delta)
+        self._render_cart()
+    
+    def _render_cart(self):
+        """Dibujar `cart_data` (del servidor o con cambios locales aplicados)."""
+        self.cart_list.clear_widgets()
+        result = self.cart_data
+        
         if result is None or not result.get('order_items'):
             empty_label = MDLabel(
                 text='Tu carrito está vacío\n\n¡Agrega algunos productos!',
@@ -158,10 +172,9 @@ class CartScreen(MDScreen):
             )
             self.cart_list.add_widget(empty_label)
             self.total_label.text = 'Total: $0'
+            self.checkout_button.disabled = True
             return
         
-        self.cart_data = result
-        
         for item_data in result.get('order_items', []):
             card = self._create_cart_item_card(item_data)
             self.cart_list.add_widget(card)
@@ -169,8 +182,8 @@ class CartScreen(MDScreen):
         total = result.get('total', 0)
         self.total_label.text = f'Total: ${total}'
         
-        if result.get('order_items'):
-            self.checkout_button.disabled = False
+        # No pagar un carrito con cambios que el servidor todavía no confirmó
+        self.checkout_button.disabled = bool(self._pending or self._batch_in_flight)
     
     def _create_cart_item_card(self, item_data):
         """Crear card para un item del carrito."""
@@ -262,46 +275,95 @@ class CartScreen(MDScreen):
         
         return card
     
+    # === CAMBIOS OPTIMISTAS ===
+    # Cada toque se muestra enseguida y se acumula en `_pending`. A los
+    # BATCH_WINDOW segundos del primero se manda todo junto a /cart/batch/
+    # (de a un lote por vez); el carrito que devuelve el servidor reemplaza
+    # al local, con los toques que llegaron mientras tanto aplicados encima.
+    
     def add_item(self, slug):
         """Agregar una unidad."""
-        self.status_label.text = 'Actualizando...'
-        threading.Thread(target=self._add_item_thread, args=(slug,)).start()
-    
-    def _add_item_thread(self, slug):
-        """Thread para agregar item."""
-        result = self.api_service.add_to_cart(slug)
-        Clock.schedule_once(lambda dt: self._handle_modify_result(result))
+        self._change_quantity(slug, 1)
     
     def remove_single_item(self, slug):
         """Quitar una unidad."""
-        self.status_label.text = 'Actualizando...'
-        threading.Thread(target=self._remove_single_thread, args=(slug,)).start()
-    
-    def _remove_single_thread(self, slug):
-        """Thread para quitar una unidad."""
-        result = self.api_service.remove_single_item_from_cart(slug)
-        Clock.schedule_once(lambda dt: self._handle_modify_result(result))
+        self._change_quantity(slug, -1)
     
     def remove_item(self, slug):
         """Eliminar item."""
-        self.status_label.text = 'Eliminando...'
-        threading.Thread(target=self._remove_item_thread, args=(slug,)).start()
+        line = self._find_line(slug)
+        if line:
+            self._change_quantity(slug, -line.get('quantity', 0))
     
-    def _remove_item_thread(self, slug):
-        """Thread para eliminar item."""
-        result = self.api_service.remove_from_cart(slug)
-        Clock.schedule_once(lambda dt: self._handle_modify_result(result))
+    def _find_line(self, slug):
+        for line in (self.cart_data or {}).get('order_items', []):
+            if line.get('item', {}).get('slug') == slug:
+                return line
+        return None
     
-    def _handle_modify_result(self, result):
-        """Manejar resultado de modificar carrito."""
-        if 'error' in result:
-            self.status_label.text = f"Error: {result['error']}"
+    def _change_quantity(self, slug, delta):
+        """Aplicar el cambio en pantalla y encolarlo para el próximo lote."""
+        if not delta or not self._apply_locally(slug, delta):
+            return
+        self._pending[slug] = self._pending.get(slug, 0) + delta
+        self.status_label.text = 'Actualizando...'
+        self.status_label.theme_text_color = 'Secondary'
+        self._render_cart()
+        self._flush_trigger()
+    
+    def _apply_locally(self, slug, delta):
+        """Actualizar cantidad, precio de la línea y total en `cart_data`."""
+        line = self._find_line(slug)
+        if line is None:
+            return False
+        
+        item = line.get('item', {})
+        unit_price = float(item.get('discount_price') or item.get('price') or 0)
+        quantity = max(line.get('quantity', 0) + delta, 0)
+        change = quantity - line.get('quantity', 0)
+        
+        if quantity:
+            line['quantity'] = quantity
+            line['final_price'] = unit_price * quantity
+        else:
+            self.cart_data['order_items'].remove(line)
+        self.cart_data['total'] = float(self.cart_data.get('total') or 0) + unit_price * change
+        return True
+    
+    def _flush(self, *args):
+        """Mandar los cambios acumulados, salvo que ya haya un lote en camino."""
+        if self._batch_in_flight or not self._pending:
+            return
+        items = [{'slug': slug, 'delta': delta} for slug, delta in self._pending.items() if delta]
+        self._pending = {}
+        if not items:
+            return
+        self._batch_in_flight = True
+        self.api_service.submit(self.api_service.apply_cart_batch, items, callback=self._handle_batch_result)
+    
+    def _handle_batch_result(self, result):
+        """Reemplazar el carrito local por el del servidor."""
+        self._batch_in_flight = False
+        
+        if 'error' in result or 'order_items' not in result:
+            # Se descartan los cambios optimistas y se vuelve a lo que tiene el servidor
+            self._pending = {}
+            self.load_cart()
+            self.status_label.text = f"Error: {result.get('error') or result.get('detail') or 'no se pudo actualizar'}"
             self.status_label.theme_text_color = 'Error'
+            return
+        
+        self.cart_data = result
+        for slug, delta in self._pending.items():
+            self._apply_locally(slug, delta)
+        self._render_cart()
+        
+        if self._pending:
+            self._flush_trigger()
         else:
             self.status_label.text = 'Carrito actualizado'
             self.status_label.theme_text_color = 'Custom'
             self.status_label.text_color = (0, 1, 0, 1)
-            Clock.schedule_once(lambda dt: self.load_cart(), 0.5)
     
     def process_checkout(self, instance):
         """Procesar el checkout."""
@@ -309,12 +371,7 @@ class CartScreen(MDScreen):
         self.status_label.theme_text_color = 'Primary'
         self.checkout_button.disabled = True
         
-        threading.Thread(target=self._checkout_thread).start()
-    
-    def _checkout_thread(self):
-        """Thread para checkout."""
-        result = self.api_service.checkout()
-        Clock.schedule_once(lambda dt: self._handle_checkout_result(result))
+        self.api_service.submit(self.api_service.checkout, callback=self._handle_checkout_result, key='checkout')
     
     def _handle_checkout_result(self, result):
         """Manejar resultado del checkout."""
@@ -7,7 +7,6 @@ from kivymd.uix.button import MDRaisedButton, MDRectangleFlatButton, MDIconButto
 from kivymd.uix.card import MDCard
 from kivy.clock import Clock
 from kivy.uix.image import Image
-import threading
 import webbrowser
 
 class LoginScreen(MDScreen):
@@ -170,13 +169,11 @@ class LoginScreen(MDScreen):
         self.status_label.theme_text_color = 'Primary'
         self.login_button.disabled = True
         
-        # Hacer login en un hilo separado
-        threading.Thread(target=self._login_thread, args=(username, password)).start()
-    
-    def _login_thread(self, username, password):
-        """Thread para hacer login."""
-        result = self.api_service.login(username, password)
-        Clock.schedule_once(lambda dt: self._handle_login_result(result, username))
+        # Hacer login en el pool del servicio
+        self.api_service.submit(
+            self.api_service.login, username, password,
+            callback=lambda result: self._handle_login_result(result, username), key='login'
+        )
     
     def _handle_login_result(self, result, username):
         """Manejar resultado del login."""
@@ -5,11 +5,11 @@ from kivymd.uix.label import MDLabel
 from kivymd.uix.button import MDRaisedButton, MDIconButton, MDRectangleFlatButton
 from kivymd.uix.scrollview import MDScrollView
 from kivymd.uix.card import MDCard
-from kivy.clock import Clock
 from kivy.metrics import dp
-from kivy.uix.image import AsyncImage
 from kivy.uix.video import Video
-import threading
+
+from utils.image_cache import CachedImage, absolute_url
+
 
 class ProductDetailScreen(MDScreen):
     """Pantalla que muestra el detalle de un producto."""
@@ -107,8 +107,7 @@ class ProductDetailScreen(MDScreen):
         media_url = p.get('video_url') or p.get('image_url')
         if media_url:
             # Construir URL completa si es relativa
-            if media_url.startswith('/'):
-                media_url = f"http://127.0.0.1:8000{media_url}"
+            media_url = absolute_url(media_url)
             
             if p.get('video_url'):
                 # Si hay video, usar Video widget con loop
@@ -125,20 +124,17 @@ class ProductDetailScreen(MDScreen):
                 except Exception as e:
                     # Si falla el video, mostrar imagen de fallback
                     if p.get('image_url'):
-                        fallback_url = p.get('image_url')
-                        if fallback_url.startswith('/'):
-                            fallback_url = f"http://127.0.0.1:8000{fallback_url}"
-                        image = AsyncImage(
-                            source=fallback_url,
+                        image = CachedImage(
+                            url=absolute_url(p.get('image_url')),
                             size_hint=(1, None),
                             height=dp(250),
                             allow_stretch=True
                         )
                         self.content_layout.add_widget(image)
             else:
-                # Solo imagen
-                image = AsyncImage(
-                    source=media_url,
+                # Solo imagen: se decodifica al tamaño en que se muestra
+                image = CachedImage(
+                    url=media_url,
                     size_hint=(1, None),
                     height=dp(250),
                     allow_stretch=True
@@ -281,20 +277,11 @@ class ProductDetailScreen(MDScreen):
             self.status_label.theme_text_color = 'Primary'
             self.add_to_cart_btn.disabled = True
             
-            threading.Thread(target=self._add_to_cart_thread, args=(slug,), daemon=True).start()
+            self.api_service.submit(self.api_service.add_to_cart, slug, callback=self._handle_cart_result)
         else:
             self.status_label.text = 'Error: Botón no disponible'
             self.status_label.theme_text_color = 'Error'
     
-    def _add_to_cart_thread(self, slug):
-        """Thread para agregar al carrito."""
-        try:
-            result = self.api_service.add_to_cart(slug)
-            Clock.schedule_once(lambda dt: self._handle_cart_result(result))
-        except Exception as e:
-            error_result = {"error": f"Error de conexión: {str(e)}"}
-            Clock.schedule_once(lambda dt: self._handle_cart_result(error_result))
-    
     def _handle_cart_result(self, result):
         """Manejar resultado de agregar al carrito."""
         # Asegurar que el botón se reactive siempre
@@ -4,23 +4,143 @@ from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.label import MDLabel
 from kivymd.uix.button import MDRaisedButton, MDIconButton, MDRectangleFlatButton
 from kivymd.uix.card import MDCard
-from kivymd.uix.scrollview import MDScrollView
-from kivymd.uix.gridlayout import MDGridLayout
 from kivymd.uix.dialog import MDDialog
-from kivy.clock import Clock
 from kivy.metrics import dp
-from kivy.uix.image import AsyncImage
-from kivy.uix.video import Video
-import threading
+from kivy.properties import ObjectProperty
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+
+from utils.image_cache import CachedImage, absolute_url
+
+CARD_HEIGHT = dp(320)
+
+# Tamaño de página de la carga completa: la primera página de una lista vacía
+# se pide chica para mostrar algo enseguida; el resto, del máximo que acepta
+# la API, para hacer menos requests
+FIRST_PAGE_SIZE = 20
+BULK_PAGE_SIZE = 100
+
+
+class ProductCard(RecycleDataViewBehavior, MDCard):
+    """
+    Fila reutilizable de la lista de productos.
+    
+    La RecycleView crea solo las cards que entran en pantalla (más unas
+    pocas de margen) y al hacer scroll les cambia los datos con
+    `refresh_view_attrs`, en lugar de crear una card por producto.
+    En la lista se muestra la miniatura que genera el servidor (nunca la
+    foto completa), a través de la caché de imágenes; el video se reproduce
+    en la pantalla de detalle.
+    """
+    product = ObjectProperty(None, allownone=True)
+    view_callback = ObjectProperty(None, allownone=True)
+    
+    def __init__(self, **kwargs):
+        super().__init__(
+            orientation='vertical',
+            size_hint=(1, None),
+            height=CARD_HEIGHT,
+            padding=dp(10),
+            spacing=dp(5),
+            radius=[15],
+            elevation=4,
+            md_bg_color=(0.2, 0.2, 0.2, 1),
+            **kwargs
+        )
+        
+        self.image = CachedImage(
+            size_hint=(1, None),
+            height=dp(150),
+            allow_stretch=True
+        )
+        self.add_widget(self.image)
+        
+        self.title = MDLabel(
+            bold=True,
+            theme_text_color='Custom',
+            text_color=(1, 1, 1, 1),
+            font_style='H6',
+            size_hint_y=None,
+            height=dp(30)
+        )
+        self.add_widget(self.title)
+        
+        self.description = MDLabel(
+            theme_text_color='Secondary',
+            font_style='Body2',
+            size_hint_y=None,
+            height=dp(40)
+        )
+        self.add_widget(self.description)
+        
+        # Espacio flexible
+        self.add_widget(MDLabel(size_hint_y=1))
+        
+        # Precio y botón
+        bottom = MDBoxLayout(
+            size_hint_y=None,
+            height=dp(50),
+            spacing=dp(10)
+        )
+        self.price = MDLabel(
+            theme_text_color='Custom',
+            text_color=(0, 1, 0, 1), # Verde para precio
+            bold=True,
+            font_style='H5',
+            halign='left'
+        )
+        bottom.add_widget(self.price)
+        
+        view_btn = MDRaisedButton(
+            text='VER DETALLE',
+            md_bg_color=(0.8, 0, 0, 1), # Rojo
+            on_press=lambda x: self.view_callback and self.product and self.view_callback(self.product)
+        )
+        bottom.add_widget(view_btn)
+        self.add_widget(bottom)
+    
+    def refresh_view_attrs(self, rv, index, data):
+        """Cargar en la card los datos del producto de la fila `index`."""
+        product = data['product']
+        self.product = product
+        self.view_callback = data.get('view_callback')
+        
+        self.title.text = product.get('title', 'Sin título')
+        
+        desc_text = product.get('description', '')
+        if len(desc_text) > 60:
+            desc_text = desc_text[:60] + '...'
+        self.description.text = desc_text
+        
+        price_text = f"${product.get('price', 0)}"
+        if product.get('discount_price'):
+            price_text = f"${product.get('discount_price')}"
+        self.price.text = price_text
+        
+        media_url = absolute_url(product.get('thumbnail_url') or product.get('preview_image_url'))
+        self.image.url = media_url
+        self.image.opacity = 1 if media_url else 0
+        
+        return super().refresh_view_attrs(rv, index, {})
+
 
 class ProductsScreen(MDScreen):
     """Pantalla que muestra la lista de productos."""
     
-    def __init__(self, api_service, auth_manager, **kwargs):
+    def __init__(self, api_service, auth_manager, catalog_store=None, **kwargs):
         super().__init__(**kwargs)
         self.api_service = api_service
         self.auth_manager = auth_manager
-        self.products = []
+        # CatalogStore donde se persiste el catálogo (opcional)
+        self.catalog_store = catalog_store
+        # Catálogo local (id -> producto), en el orden en que se muestra
+        self.catalog = {}
+        self.sync_token = None
+        # Carga completa en curso: páginas recibidas y su token
+        self._incoming = {}
+        self._incoming_token = None
+        self._live_load = True
         self.dialog = None
         
         # Layout principal
@@ -42,17 +162,30 @@ class ProductsScreen(MDScreen):
         # Botón de recargar (temporal, luego será parte del header o refresh layout)
         # Por ahora lo ponemos como un botón flotante o en el header si cabe
         
-        # Área de productos (ScrollView)
-        self.scroll_view = MDScrollView(size_hint=(1, 1))
-        self.product_list = MDGridLayout(
-            cols=1,
-            spacing=dp(15),
+        # Mensajes de estado (cargando, error, sin productos)
+        self.status_label = MDLabel(
+            halign="center",
+            theme_text_color="Secondary",
             size_hint_y=None,
-            padding=dp(10),
-            adaptive_height=True
+            height=0,
+            opacity=0
         )
-        self.scroll_view.add_widget(self.product_list)
-        self.main_layout.add_widget(self.scroll_view)
+        self.main_layout.add_widget(self.status_label)
+        
+        # Lista de productos: RecycleView con un pool de ProductCard
+        self.product_list = RecycleView(size_hint=(1, 1))
+        self.product_list.viewclass = ProductCard
+        layout = RecycleBoxLayout(
+            orientation='vertical',
+            default_size=(None, CARD_HEIGHT),
+            default_size_hint=(1, None),
+            size_hint_y=None,
+            spacing=dp(15),
+            padding=dp(10)
+        )
+        layout.bind(minimum_height=layout.setter('height'))
+        self.product_list.add_widget(layout)
+        self.main_layout.add_widget(self.product_list)
         
         self.add_widget(self.main_layout)
     
@@ -85,7 +218,7 @@ class ProductsScreen(MDScreen):
             icon="refresh",
             theme_text_color="Custom",
             text_color=(1, 1, 1, 1),
-            on_press=self.load_products
+            on_press=self.refresh_products
         )
         nav_buttons.add_widget(refresh_btn)
         
@@ -163,178 +296,190 @@ class ProductsScreen(MDScreen):
     def on_pre_enter(self):
         """Llamado antes de entrar a la pantalla."""
         self._update_header()
-        self.load_products()
+        if not self.catalog:
+            self._restore_from_disk()
+        self.refresh_products()
     
-    def load_products(self, instance=None):
-        """Cargar productos desde la API."""
-        self.product_list.clear_widgets()
-        
-        # Spinner de carga
-        loading = MDLabel(
-            text="Cargando productos...",
-            halign="center",
-            theme_text_color="Secondary"
-        )
-        self.product_list.add_widget(loading)
+    def _restore_from_disk(self):
+        """
+        Mostrar el catálogo guardado sin esperar a la red.
         
-        threading.Thread(target=self._fetch_products).start()
+        Es una lectura de SQLite en el thread principal (milisegundos para
+        catálogos de cientos de productos); después la sincronización trae
+        solo lo que cambió desde el token guardado.
+        """
+        if not self.catalog_store:
+            return
+        for product in self.catalog_store.load_products():
+            self.catalog[product['id']] = product
+        if self.catalog:
+            self.sync_token = self.catalog_store.get_sync_token()
+            self._refresh_rows()
+            self._show_status(None)
     
-    def _fetch_products(self):
-        """Thread para obtener productos."""
-        result = self.api_service.get_products()
-        Clock.schedule_once(lambda dt: self._display_products(result))
+    def refresh_products(self, instance=None):
+        """Traer solo los cambios si ya hay catálogo; si no, cargarlo completo."""
+        if self.catalog_store:
+            self.api_service.submit(self._sync_categories, key='categories', coalesce=True)
+        
+        if self.sync_token and self.catalog:
+            self.api_service.submit(
+                self._fetch_changes, self.sync_token,
+                callback=self._apply_changes, key='products', coalesce=True
+            )
+        else:
+            self.load_products()
     
-    def _display_products(self, result):
-        """Mostrar productos en la UI."""
-        self.product_list.clear_widgets()
+    def _fetch_changes(self, token):
+        """
+        Corre en el pool de APIService: trae el delta y lo guarda en disco.
         
+        El servidor manda el delta en páginas (`more`); se piden todas y se
+        devuelve un solo resultado con los cambios combinados.
+        """
+        changed = {}
+        deleted = set()
+        while True:
+            result = self.api_service.get_product_changes(token)
+            if 'token' not in result or 'error' in result:
+                return result
+            if self.catalog_store:
+                self.catalog_store.apply_changes(result.get('changed', []), result.get('deleted', []), result['token'])
+            for product_id in result.get('deleted', []):
+                changed.pop(product_id, None)
+                deleted.add(product_id)
+            for product in result.get('changed', []):
+                changed[product['id']] = product
+                deleted.discard(product['id'])
+            token = result['token']
+            if not result.get('more'):
+                return {'changed': list(changed.values()), 'deleted': list(deleted), 'token': token}
+    
+    def _sync_categories(self):
+        """Corre en el pool de APIService: actualiza las categorías guardadas."""
+        categories = self.api_service.get_categories()
+        if isinstance(categories, list):
+            self.catalog_store.replace_categories(categories)
+    
+    def _apply_changes(self, result):
+        """Aplicar un delta al catálogo local; la lista solo vuelve a enlazar las filas visibles."""
         if 'error' in result:
-            error_label = MDLabel(
-                text=f"Error: {result['error']}",
-                halign="center",
-                theme_text_color="Error"
-            )
-            self.product_list.add_widget(error_label)
+            # Sin conexión: se sigue mostrando lo que hay
+            self._show_status("Sin conexión, mostrando el catálogo guardado", error=True)
+            return
+        if 'token' not in result:
+            # Token inválido o vencido: volver a la carga completa
+            self.load_products()
             return
         
-        if isinstance(result, list):
-            self.products = result
-            
-            if not self.products:
-                no_products = MDLabel(
-                    text='No hay productos disponibles',
-                    halign="center",
-                    theme_text_color="Secondary"
-                )
-                self.product_list.add_widget(no_products)
-                return
-            
-            for product in self.products:
-                card = self._create_product_card(product)
-                self.product_list.add_widget(card)
-        else:
-            error_label = MDLabel(
-                text='Error al cargar productos',
-                halign="center",
-                theme_text_color="Error"
-            )
-            self.product_list.add_widget(error_label)
-    
-    def _create_product_card(self, product):
-        """Crear card para un producto."""
-        card = MDCard(
-            orientation='vertical',
-            size_hint=(1, None),
-            height=dp(320),  # Aumentado para incluir imagen
-            padding=dp(10),
-            spacing=dp(5),
-            radius=[15],
-            elevation=4,
-            md_bg_color=(0.2, 0.2, 0.2, 1)
-        )
+        for product_id in result.get('deleted', []):
+            self.catalog.pop(product_id, None)
         
-        # Imagen o Video del producto
-        media_url = product.get('video_url') or product.get('preview_image_url')
-        if media_url:
-            # Construir URL completa si es relativa
-            if media_url.startswith('/'):
-                media_url = f"http://127.0.0.1:8000{media_url}"
-            
-            if product.get('video_url'):
-                # Si hay video, usar Video widget con loop
-                try:
-                    video = Video(
-                        source=media_url,
-                        state='play',
-                        options={'eos': 'loop'},  # Loop infinito
-                        size_hint=(1, None),
-                        height=dp(150),
-                        allow_stretch=True
-                    )
-                    card.add_widget(video)
-                except Exception as e:
-                    # Si falla el video, mostrar imagen de fallback
-                    if product.get('preview_image_url'):
-                        fallback_url = product.get('preview_image_url')
-                        if fallback_url.startswith('/'):
-                            fallback_url = f"http://127.0.0.1:8000{fallback_url}"
-                        image = AsyncImage(
-                            source=fallback_url,
-                            size_hint=(1, None),
-                            height=dp(150),
-                            allow_stretch=True
-                        )
-                        card.add_widget(image)
-            else:
-                # Solo imagen
-                image = AsyncImage(
-                    source=media_url,
-                    size_hint=(1, None),
-                    height=dp(150),
-                    allow_stretch=True
-                )
-                card.add_widget(image)
+        for product in result.get('changed', []):
+            # Un producto editado queda en su lugar; uno nuevo va al final
+            self.catalog[product['id']] = product
         
-        # Título
-        title = MDLabel(
-            text=product.get('title', 'Sin título'),
-            bold=True,
-            theme_text_color='Custom',
-            text_color=(1, 1, 1, 1),
-            font_style='H6',
-            size_hint_y=None,
-            height=dp(30)
-        )
-        card.add_widget(title)
+        self.sync_token = result['token']
+        self._refresh_rows()
+        self._show_status(None if self.catalog else 'No hay productos disponibles')
+    
+    def load_products(self, instance=None):
+        """
+        Cargar el catálogo completo desde la API.
         
-        # Descripción
-        desc_text = product.get('description', '')
-        if len(desc_text) > 60:
-            desc_text = desc_text[:60] + '...'
-            
-        description = MDLabel(
-            text=desc_text,
-            theme_text_color='Secondary',
-            font_style='Body2',
-            size_hint_y=None,
-            height=dp(40)
+        Si la lista está vacía las páginas se muestran a medida que llegan.
+        Si ya se muestra un catálogo (el guardado en disco) se reemplaza
+        recién cuando llegó la última página, para no vaciar la pantalla.
+        """
+        self._incoming = {}
+        self._incoming_token = None
+        self._live_load = not self.catalog
+        if self._live_load:
+            # La lista se llena a medida que llegan las páginas
+            self.catalog = self._incoming
+            self.product_list.data = []
+            self._show_status("Cargando productos...")
+        self._fetch_page(None)
+    
+    def _fetch_page(self, cursor):
+        """
+        Pedir una página del catálogo; al mostrarla se pide la siguiente.
+        
+        Todas usan la key 'products', así que recargar (o pedir un delta)
+        cancela una carga completa que haya quedado a mitad de camino.
+        """
+        page_size = FIRST_PAGE_SIZE if self._live_load and cursor is None else BULK_PAGE_SIZE
+        self.api_service.submit(
+            self.api_service.get_products, cursor=cursor, page_size=page_size,
+            callback=lambda page: self._display_products(page, append=cursor is not None),
+            key='products', coalesce=True
         )
-        card.add_widget(description)
+    
+    def _display_products(self, result, append=False):
+        """
+        Recibir una página de productos.
         
-        # Espacio flexible
-        card.add_widget(MDLabel(size_hint_y=1))
+        Durante una carga en vivo solo se agregan a la lista las filas de la
+        página nueva; la lista completa se arma una sola vez, al terminar.
         
-        # Precio y botón
-        bottom = MDBoxLayout(
-            size_hint_y=None,
-            height=dp(50),
-            spacing=dp(10)
-        )
+        Args:
+            result: Página devuelta por la API
+            append: False para la primera página de la carga, True para las siguientes
+        """
+        if not append:
+            self._incoming_token = result.get('sync_token')
         
-        price_text = f"${product.get('price', 0)}"
-        if product.get('discount_price'):
-            price_text = f"${product.get('discount_price')}"
+        if 'error' in result:
+            if self.catalog and not self._live_load:
+                self._show_status("Sin conexión, mostrando el catálogo guardado", error=True)
+            else:
+                self._show_status(f"Error: {result['error']}", error=True)
+            return
         
-        price = MDLabel(
-            text=price_text,
-            theme_text_color='Custom',
-            text_color=(0, 1, 0, 1), # Verde para precio
-            bold=True,
-            font_style='H5',
-            halign='left'
-        )
-        bottom.add_widget(price)
+        page_products = result.get('results')
+        if not isinstance(page_products, list):
+            self._show_status('Error al cargar productos', error=True)
+            return
         
-        view_btn = MDRaisedButton(
-            text='VER DETALLE',
-            md_bg_color=(0.8, 0, 0, 1), # Rojo
-            on_press=lambda x: self.view_product_detail(product)
-        )
-        bottom.add_widget(view_btn)
+        new_rows = []
+        for product in page_products:
+            if self._live_load and product['id'] not in self._incoming:
+                new_rows.append(self._row(product))
+            self._incoming[product['id']] = product
         
-        card.add_widget(bottom)
+        finished = not result.get('next_cursor')
+        if finished:
+            self.catalog = self._incoming
+            self._refresh_rows()
+            self._show_status(None if self.catalog else 'No hay productos disponibles')
+            self.sync_token = self._incoming_token
+            if self.catalog_store:
+                self.api_service.submit(self.catalog_store.replace_products, list(self.catalog.values()), self.sync_token)
+        else:
+            if new_rows:
+                self.product_list.data.extend(new_rows)
+                self._show_status(None)
+            self._fetch_page(result['next_cursor'])
+    
+    def _row(self, product):
+        return {'product': product, 'view_callback': self.view_product_detail}
+    
+    def _refresh_rows(self):
+        """
+        Pasar el catálogo a la RecycleView.
         
-        return card
+        Solo se arma la lista de datos; la vista vuelve a enlazar las cards
+        visibles y no crea widgets nuevos, así que el costo no depende del
+        tamaño del catálogo.
+        """
+        self.product_list.data = [self._row(product) for product in self.catalog.values()]
+    
+    def _show_status(self, text, error=False):
+        """Mostrar un mensaje arriba de la lista, o esconderlo con text=None."""
+        self.status_label.text = text or ''
+        self.status_label.theme_text_color = 'Error' if error else 'Secondary'
+        self.status_label.height = dp(48) if text else 0
+        self.status_label.opacity = 1 if text else 0
     
     def view_product_detail(self, product):
         """Navegar al detalle del producto."""
@@ -0,0 +1 @@
+# Archivos __init__.py para hacer los directorios paquetes Python
@@ -0,0 +1,99 @@
+"""
+Prueba de carga del pool de APIService contra un backend falso.
+
+Uso (desde mobile/):
+    python -m unittest discover -s tests -t .
+"""
+import threading
+import time
+import unittest
+
+from api.api_service import APIService
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.status_code = 200
+        self.headers = {}
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeBackend:
+    """Sesión falsa: tarda `latency` segundos y cuenta pedidos y concurrencia."""
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _handle(self, url):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.latency)
+        with self._lock:
+            self.active -= 1
+        return FakeResponse({'url': url})
+
+    def get(self, url, headers=None, params=None):
+        return self._handle(url)
+
+    def post(self, url, headers=None, json=None):
+        return self._handle(url)
+
+
+class APIServiceExecutorTests(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakeBackend()
+        self.delivered = []
+        self.lock = threading.Lock()
+        # Sin Kivy: los callbacks se ejecutan en el thread que termina el pedido
+        self.api = APIService(session=self.backend, dispatch=lambda func: func())
+
+    def _collect(self, result):
+        with self.lock:
+            self.delivered.append(result)
+
+    def test_pool_is_bounded(self):
+        for i in range(300):
+            self.api.submit(self.api.add_to_cart, f'producto-{i}', callback=self._collect)
+        self.api.close()
+
+        self.assertEqual(self.backend.calls, 300)
+        self.assertEqual(len(self.delivered), 300)
+        self.assertLessEqual(self.backend.max_active, APIService.MAX_WORKERS)
+
+    def test_identical_gets_are_coalesced(self):
+        for _ in range(500):
+            self.api.submit(self.api.get_cart_summary, callback=self._collect, coalesce=True)
+        self.api.close()
+
+        self.assertEqual(len(self.delivered), 500)
+        self.assertLess(self.backend.calls, 10)
+
+    def test_superseded_requests_are_dropped(self):
+        for i in range(200):
+            self.api.submit(self.api.get_product_detail, f'producto-{i}', callback=self._collect, key='detail')
+        self.api.close()
+
+        # Los reemplazados en cola no se ejecutan y los que ya estaban en curso no se entregan
+        self.assertEqual(self.delivered, [{'url': f'{APIService.BASE_URL}/products/producto-199/'}])
+        self.assertLessEqual(self.backend.calls, APIService.MAX_WORKERS + 1)
+
+    def test_errors_are_delivered_as_dicts(self):
+        def broken():
+            raise RuntimeError('sin red')
+
+        self.api.submit(broken, callback=self._collect)
+        self.api.close()
+        self.assertEqual(self.delivered, [{'error': 'Error inesperado: sin red'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
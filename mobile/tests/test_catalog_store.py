@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+from utils.catalog_store import CatalogStore
+
+
+def product(pk, title='Producto'):
+    return {'id': pk, 'slug': f'producto-{pk}', 'title': title, 'category': 1,
+            'thumbnail_url': f'/api/products/producto-{pk}/thumbnail/?w=320', 'image_url': None}
+
+
+class CatalogStoreTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'catalog.sqlite3')
+        self.store = CatalogStore(self.path)
+        self.addCleanup(self.store.close)
+
+    def test_catalog_survives_reopening(self):
+        self.store.replace_products([product(2), product(1)], 'token-1')
+        self.store.replace_categories([{'id': 1, 'slug': 'guantes', 'title': 'Guantes'}])
+        self.store.close()
+
+        store = CatalogStore(self.path)
+        self.addCleanup(store.close)
+        self.assertEqual([p['id'] for p in store.load_products()], [1, 2])
+        self.assertEqual(store.load_products()[0]['thumbnail_url'], '/api/products/producto-1/thumbnail/?w=320')
+        self.assertEqual(store.get_sync_token(), 'token-1')
+        self.assertEqual(store.load_categories()[0]['slug'], 'guantes')
+
+    def test_apply_changes(self):
+        self.store.replace_products([product(1), product(2), product(3)], 'token-1')
+        self.store.apply_changes([product(2, 'Editado'), product(4)], [3], 'token-2')
+
+        products = self.store.load_products()
+        self.assertEqual([p['id'] for p in products], [1, 2, 4])
+        self.assertEqual(products[1]['title'], 'Editado')
+        self.assertEqual(self.store.get_sync_token(), 'token-2')
+
+
+if __name__ == '__main__':
+    unittest.main()
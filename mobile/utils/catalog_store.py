@@ -0,0 +1,142 @@
+"""
+Catálogo local en SQLite.
+
+Guarda los productos (con sus URLs de imagen, miniatura y video), las
+categorías y el token de sincronización, para que al abrir la app la lista
+se muestre desde disco y la red solo traiga el delta en segundo plano.
+
+Los productos se guardan como el JSON que devuelve la API, más las columnas
+por las que se busca u ordena. Todas las operaciones toman un lock, así que
+el store se puede usar desde el thread principal y desde el pool de
+APIService.
+"""
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+# Si cambia el esquema se sube el número y el catálogo local se vuelve a bajar
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    slug TEXT NOT NULL,
+    category_id INTEGER,
+    thumbnail_url TEXT,
+    image_url TEXT,
+    video_url TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_category ON products (category_id);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    slug TEXT NOT NULL,
+    title TEXT NOT NULL,
+    image_url TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class CatalogStore:
+    """
+    Catálogo persistido en `path`.
+
+    Args:
+        path: Archivo SQLite (se crea si no existe)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._migrate()
+
+    def _migrate(self):
+        with self._lock, self._db:
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self._db.executescript(
+                    "DROP TABLE IF EXISTS products; DROP TABLE IF EXISTS categories; DROP TABLE IF EXISTS meta;"
+                )
+            self._db.executescript(SCHEMA)
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # === PRODUCTOS ===
+
+    def load_products(self) -> List[Dict[str, Any]]:
+        """Productos guardados, en el mismo orden que la API (por id)."""
+        with self._lock:
+            rows = self._db.execute("SELECT data FROM products ORDER BY id").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def replace_products(self, products: Iterable[Dict[str, Any]], sync_token: Optional[str]):
+        """Reemplazar todo el catálogo (después de una carga completa)."""
+        rows = [self._product_row(p) for p in products]
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM products")
+            self._db.executemany(
+                "INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._set_meta('sync_token', sync_token)
+
+    def apply_changes(self, changed: Iterable[Dict[str, Any]], deleted: Iterable[int], sync_token: str):
+        """Aplicar un delta de /products/changes/ y guardar el token nuevo, en una transacción."""
+        rows = [self._product_row(p) for p in changed]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._db.executemany("DELETE FROM products WHERE id = ?", [(pk,) for pk in deleted])
+            self._set_meta('sync_token', sync_token)
+
+    def _product_row(self, product):
+        return (
+            product['id'],
+            product.get('slug') or '',
+            product.get('category'),
+            product.get('thumbnail_url'),
+            product.get('image_url'),
+            product.get('video_url'),
+            json.dumps(product),
+        )
+
+    def get_sync_token(self) -> Optional[str]:
+        """Token del último estado guardado, para pedir solo los cambios."""
+        return self._get_meta('sync_token')
+
+    # === CATEGORÍAS ===
+
+    def load_categories(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, slug, title, image_url FROM categories ORDER BY id"
+            ).fetchall()
+        return [{'id': pk, 'slug': slug, 'title': title, 'image_url': image_url}
+                for pk, slug, title, image_url in rows]
+
+    def replace_categories(self, categories: Iterable[Dict[str, Any]]):
+        rows = [(c['id'], c.get('slug') or '', c.get('title') or '', c.get('image_url')) for c in categories]
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM categories")
+            self._db.executemany("INSERT INTO categories VALUES (?, ?, ?, ?)", rows)
+
+    # === META ===
+
+    def _get_meta(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        # Se llama con el lock tomado y dentro de la transacción del que llama
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
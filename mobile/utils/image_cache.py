@@ -0,0 +1,328 @@
+"""
+Caché de imágenes del cliente: disco + texturas en memoria.
+
+- En disco: un archivo por URL (nombre = sha1 de la URL) más un `.json` con
+  el ETag y hasta cuándo está fresco. Cuando vence se revalida con
+  If-None-Match, así un 304 no vuelve a bajar la imagen. El total está
+  acotado a `max_bytes`; se borran primero los menos usados (mtime).
+- En memoria: LRU de texturas ya decodificadas, acotado en bytes.
+- La imagen se decodifica en un thread al tamaño en que se va a mostrar
+  (PIL draft + thumbnail) y la textura se crea en el thread principal.
+
+Varias filas que piden la misma imagen al mismo tiempo comparten una sola
+descarga y un solo decode.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from kivy.app import App
+from kivy.clock import Clock
+from kivy.graphics.texture import Texture
+from kivy.properties import StringProperty
+from kivy.uix.image import Image
+from PIL import Image as PILImage
+
+SERVER_URL = "http://127.0.0.1:8000"
+
+# Los tamaños de decode se redondean a múltiplos de esto para que pequeños
+# cambios de layout no generen otra entrada en la caché de texturas
+SIZE_STEP = 64
+
+
+def absolute_url(url):
+    """URL completa para una ruta relativa del backend (ej: /media/...)."""
+    if url and url.startswith('/'):
+        return f"{SERVER_URL}{url}"
+    return url or ''
+
+
+def _round_size(size):
+    return tuple(max(SIZE_STEP, -(-int(v) // SIZE_STEP) * SIZE_STEP) for v in size)
+
+
+def _max_age(response, default):
+    for directive in response.headers.get('Cache-Control', '').split(','):
+        name, _, value = directive.strip().partition('=')
+        if name == 'max-age' and value.isdigit():
+            return int(value)
+    return default
+
+
+class DiskCache:
+    """
+    Archivos de imagen en `directory`, acotados a `max_bytes`.
+
+    Args:
+        directory: Carpeta de la caché (se crea si no existe)
+        max_bytes: Tamaño máximo total de las imágenes guardadas
+        default_max_age: Segundos que una imagen se usa sin revalidar si el
+            servidor no manda Cache-Control
+    """
+
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024, default_max_age=3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_max_age = default_max_age
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total = sum(size for _, _, size in self._entries())
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def _entries(self):
+        """(mtime, ruta, tamaño) de cada imagen guardada."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json') or name.endswith('.tmp'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _read_meta(self, path):
+        try:
+            with open(f"{path}.json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_temp(self, data):
+        """
+        Escribir `data` en un temporal nuevo de la carpeta y devolver su ruta.
+
+        Cada llamada usa un archivo distinto (`.tmp`, que `_entries` ignora),
+        así dos threads que bajan la misma URL no escriben el mismo archivo.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+        return tmp_path
+
+    def _write_meta(self, path, etag, max_age):
+        meta = {'etag': etag, 'expires': time.time() + max_age}
+        os.replace(self._write_temp(json.dumps(meta).encode('utf-8')), f"{path}.json")
+
+    def fetch(self, url):
+        """
+        Ruta local de la imagen de `url`, descargándola o revalidándola si hace falta.
+
+        Returns:
+            Ruta del archivo, o None si no se pudo obtener
+        """
+        path = self._path(url)
+        meta = self._read_meta(path) if os.path.exists(path) else {}
+
+        if meta and meta.get('expires', 0) > time.time():
+            os.utime(path)
+            return path
+
+        headers = {'If-None-Match': meta['etag']} if meta.get('etag') else {}
+        try:
+            response = self.session.get(url, headers=headers, timeout=15)
+        except requests.exceptions.RequestException:
+            # Sin conexión: mejor una imagen vencida que ninguna
+            return path if meta else None
+
+        if response.status_code == 304 and meta:
+            self._write_meta(path, meta.get('etag'), _max_age(response, self.default_max_age))
+            os.utime(path)
+            return path
+        if response.status_code != 200:
+            return path if meta else None
+
+        tmp_path = self._write_temp(response.content)
+        with self._lock:
+            # El tamaño del archivo que se reemplaza se mide con el lock
+            # tomado, así dos descargas de la misma URL no lo descuentan dos veces
+            try:
+                previous = os.path.getsize(path)
+            except OSError:
+                previous = 0
+            os.replace(tmp_path, path)
+            self._total += len(response.content) - previous
+            if self._total > self.max_bytes:
+                self._evict(keep=path)
+        self._write_meta(path, response.headers.get('ETag'), _max_age(response, self.default_max_age))
+        return path
+
+    def _evict(self, keep):
+        """Borrar las imágenes menos usadas hasta quedar por debajo de max_bytes."""
+        for _, path, size in sorted(self._entries()):
+            if self._total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            for name in (path, f"{path}.json"):
+                try:
+                    os.remove(name)
+                except OSError:
+                    pass
+            self._total -= size
+
+    def clear(self):
+        with self._lock:
+            for _, path, _ in self._entries():
+                for name in (path, f"{path}.json"):
+                    try:
+                        os.remove(name)
+                    except OSError:
+                        pass
+            self._total = 0
+
+
+def decode(path, size):
+    """
+    Decodificar una imagen reducida para que entre en `size` (px).
+
+    Returns:
+        (bytes RGBA, (ancho, alto))
+    """
+    with PILImage.open(path) as image:
+        # Con JPEG, draft() decodifica directamente a una escala reducida
+        image.draft('RGB', size)
+        image = image.convert('RGBA')
+        image.thumbnail(size)
+        return image.tobytes(), image.size
+
+
+class ImageCache:
+    """
+    Carga imágenes como texturas de Kivy usando la caché de disco y de memoria.
+
+    Args:
+        disk: DiskCache donde se guardan los archivos
+        max_texture_bytes: Memoria máxima (aprox.) de las texturas retenidas
+        workers: Descargas/decodes simultáneos
+    """
+
+    def __init__(self, disk, max_texture_bytes=64 * 1024 * 1024, workers=4):
+        self.disk = disk
+        self.max_texture_bytes = max_texture_bytes
+        self._textures = OrderedDict()
+        self._texture_bytes = 0
+        # Callbacks esperando cada (url, tamaño) que se está cargando
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-cache')
+
+    def load(self, url, size, callback):
+        """
+        Pedir la textura de `url` decodificada para `size` (px).
+
+        `callback(texture)` se llama en el thread principal: enseguida si ya
+        está en memoria, o cuando termina la carga (con None si falló).
+        """
+        key = (url, _round_size(size))
+        texture = self._textures.get(key)
+        if texture is not None:
+            self._textures.move_to_end(key)
+            callback(texture)
+            return
+
+        waiting = self._pending.get(key)
+        if waiting is not None:
+            waiting.append(callback)
+            return
+        self._pending[key] = [callback]
+        self._executor.submit(self._load, key)
+
+    def _load(self, key):
+        url, size = key
+        try:
+            path = self.disk.fetch(url)
+            result = decode(path, size) if path else None
+        except Exception as e:
+            print(f"Error cargando imagen {url}: {e}")
+            result = None
+        Clock.schedule_once(lambda dt: self._deliver(key, result))
+
+    def _deliver(self, key, result):
+        texture = None
+        if result is not None:
+            data, size = result
+            texture = Texture.create(size=size, colorfmt='rgba')
+            texture.blit_buffer(data, colorfmt='rgba', bufferfmt='ubyte')
+            # PIL empieza por la fila de arriba; las texturas, por la de abajo
+            texture.flip_vertical()
+            self._remember(key, texture, len(data))
+
+        for callback in self._pending.pop(key, []):
+            callback(texture)
+
+    def _remember(self, key, texture, nbytes):
+        self._textures[key] = texture
+        self._texture_bytes += nbytes
+        while self._texture_bytes > self.max_texture_bytes and len(self._textures) > 1:
+            _, old = self._textures.popitem(last=False)
+            self._texture_bytes -= old.width * old.height * 4
+
+    def clear_memory(self):
+        self._textures.clear()
+        self._texture_bytes = 0
+
+
+_cache = None
+
+
+def get_image_cache():
+    """Caché compartida por toda la app, guardada en el directorio de datos del usuario."""
+    global _cache
+    if _cache is None:
+        app = App.get_running_app()
+        base = app.user_data_dir if app else os.getcwd()
+        _cache = ImageCache(DiskCache(os.path.join(base, 'image_cache')))
+    return _cache
+
+
+class CachedImage(Image):
+    """
+    Image que carga `url` a través de la caché, decodificada al tamaño del widget.
+
+    Pensado para filas de RecycleView: si la fila se reutiliza para otro
+    producto antes de que termine la carga, la respuesta vieja se descarta.
+    """
+    url = StringProperty('')
+
+    def __init__(self, **kwargs):
+        self._trigger_load = Clock.create_trigger(self._load)
+        super().__init__(**kwargs)
+        self.bind(url=self._on_url, size=self._trigger_load)
+        if self.url:
+            self._trigger_load()
+
+    def _on_url(self, instance, url):
+        # No mostrar la imagen anterior mientras carga la nueva
+        self.texture = None
+        self._trigger_load()
+
+    def _load(self, *args):
+        url = self.url
+        if not url:
+            return
+        size = (self.width, self.height)
+        key = (url, _round_size(size))
+        if getattr(self, '_requested', None) == key and self.texture is not None:
+            return
+        self._requested = key
+        get_image_cache().load(url, size, lambda texture: self._on_texture(key, texture))
+
+    def _on_texture(self, key, texture):
+        if self._requested != key or texture is None:
+            return
+        self.texture = texture